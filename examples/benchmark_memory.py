@@ -0,0 +1,59 @@
+"""
+Compact Storage Memory Benchmark
+--------------------------------
+
+Reads the test files of each reader with the default float64 storage and
+with the compact float32 and uint16 storage of `DropSizeDistribution.compact`,
+and prints the memory held by the fields once read. The peak memory while
+reading is the same in every mode, readers parse into float64 and convert
+afterwards. Run from the repository root.
+"""
+
+import numpy as np
+
+import pydsd
+
+readers = [
+    ("Parsivel", pydsd.read_parsivel, "testdata/parsivel_telegraph_testfile.mis"),
+    (
+        "ARM JWD",
+        pydsd.read_arm_jwd_b1,
+        "testdata/sgpdisdrometerC1.b1.20110427.000000_test_jwd_b1.cdf",
+    ),
+    ("ARM 2DVD", pydsd.read_arm_vdis_b1, "testdata/arm_vdis_b1.cdf"),
+    (
+        "ARM 2DVD drops",
+        pydsd.read_arm_vdisdrops_netcdf,
+        "testdata/corvdisdropsM1.b1.20181214.020816.cdf",
+    ),
+    ("NASA 2DVD", pydsd.read_2dvd_dsd_nasa_gv, "testdata/nasa_gv_mc3e_2dvd_test.txt"),
+    ("NOAA PIP", pydsd.read_noaa_aoml_netcdf, "testdata/aoml_pip_test.nc"),
+]
+
+
+def megabytes(dsd):
+    return sum(dsd.memory_usage().values()) / 1e6
+
+
+header = ["reader", "float64", "float32", "uint16"]
+print("{:16s} {:>10s} {:>10s} {:>10s}".format(*header))
+for name, read, filename in readers:
+    sizes = []
+    for dtype in [None, "float32", "uint16"]:
+        try:
+            sizes.append("{:9.3f}M".format(megabytes(read(filename, dtype=dtype))))
+        except ValueError:
+            # Readers without integer drop counts can not use uint16 storage.
+            sizes.append("{:>10s}".format("-"))
+    print("{:16s} {} {} {}".format(name, *sizes))
+
+# A year of one minute 32 x 32 Parsivel raw spectra with a full np.ma mask,
+# as float64, and as uint16 counts without a mask.
+numt = 365 * 24 * 60
+spectrum = numt * 32 * 32
+print(
+    "Year of Parsivel spectra: {:.2f} GB float64, {:.2f} GB uint16".format(
+        spectrum * (np.dtype(np.float64).itemsize + 1) / 1e9,
+        spectrum * np.dtype(np.uint16).itemsize / 1e9,
+    )
+)
@@ -0,0 +1,55 @@
+"""
+Truncated Gamma Fit Benchmark
+-----------------------------
+
+Times the truncated method of moments gamma fit on 100000 synthetic spectra
+measured over a Parsivel like diameter range, and compares its accuracy with
+the untruncated fit on the same moments.
+"""
+
+import time
+
+import numpy as np
+
+from pydsd.fit import gamma_moments
+
+num_spectra = 100000
+D_min, D_max = 0.25, 8.5
+
+rng = np.random.default_rng(0)
+mu = rng.uniform(-1, 10, num_spectra)
+D0 = rng.uniform(0.6, 3.0, num_spectra)
+Lambda = (3.67 + mu) / D0
+N0 = np.exp(rng.uniform(5, 10, num_spectra)) * Lambda ** (mu + 1)
+
+orders = (2, 4, 6)
+moments = np.column_stack(
+    [
+        N0 * np.exp(gamma_moments.truncated_log_moment(n, mu, Lambda, D_min, D_max))
+        for n in orders
+    ]
+)
+
+start = time.perf_counter()
+_, untruncated_mu, _ = gamma_moments.fit_moments(moments, orders)
+untruncated_time = time.perf_counter() - start
+
+start = time.perf_counter()
+_, truncated_mu, _ = gamma_moments.fit_truncated_moments(
+    moments, D_min, D_max, orders
+)
+truncated_time = time.perf_counter() - start
+
+print("Spectra: {}".format(num_spectra))
+print(
+    "Untruncated fit: {:.2f} s, median |mu error| {:.3g}".format(
+        untruncated_time, np.ma.median(np.abs(untruncated_mu - mu))
+    )
+)
+print(
+    "Truncated fit:   {:.2f} s, median |mu error| {:.3g}, {} not converged".format(
+        truncated_time,
+        np.ma.median(np.abs(truncated_mu - mu)),
+        np.ma.count_masked(truncated_mu),
+    )
+)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+The DSDNetwork class holds the drop size distributions of a network of
+disdrometers on a common time grid, so network wide products are computed in
+one batched operation instead of a loop over stations.
+"""
+
+import numpy as np
+
+from . import DSR
+from .fit import gamma_moments
+from .scattering import backends
+from .utility import configuration, dielectric, time_alignment
+
+SPEED_OF_LIGHT = 299792458
+
+
+class DSDNetwork(object):
+    """
+    Drop size distributions of several stations stacked on a common time grid.
+
+    Stations whose instruments share the same size bins form an instrument
+    group. The drop size distributions of a group are stacked into one
+    (station, time, bin) array, so the computations of every station in a
+    group are a single batched operation, and scattering tables are built
+    once per group.
+
+    Attributes
+    ----------
+    stations: list
+        Station ids.
+    time: dict
+        Common time grid, in the units of the station times (epoch seconds).
+    numt: int
+        Number of time steps on the grid.
+    groups: list
+        One dictionary per instrument group with 'stations' (indices into
+        stations), 'diameter', 'spread', 'bin_edges', 'velocity' and 'Nd', a
+        masked array of shape (stations in group, numt, bins).
+    missing: array_like
+        Whether each station has no data at each time, shape (stations, numt).
+    fields: dict
+        Computed fields, with data of shape (stations, numt) masked where
+        data is missing.
+    """
+
+    def __init__(self, dsds, stations=None, times=None, tolerance=None):
+        """
+        Parameters
+        ----------
+        dsds: list
+            `DropSizeDistribution` of each station.
+        stations: list, optional
+            Station ids. Defaults to the site_id of each station, or its
+            position in dsds.
+        times: array_like, optional
+            Common time grid. Defaults to the union of the station times.
+        tolerance: float, optional
+            Largest difference between a grid time and the station sample
+            assigned to it [s]. Defaults to half the grid spacing.
+        """
+        self.dsds = list(dsds)
+        if stations is None:
+            stations = [
+                dsd.info.get("site_id", index) for index, dsd in enumerate(self.dsds)
+            ]
+        self.stations = list(stations)
+        station_times = [time_alignment.record_times(dsd) for dsd in self.dsds]
+        if times is None:
+            times = np.unique(np.concatenate(station_times))
+        times = np.asarray(times, dtype=float)
+        if tolerance is None:
+            tolerance = np.median(np.diff(times)) / 2.0 if len(times) > 1 else 0.0
+
+        self.time = dict(self.dsds[0].time)
+        self.time["data"] = times
+        self.numt = len(times)
+        self.config = configuration.Configuration()
+        self.fields = {}
+        self.scattering_params = {}
+        self.set_scattering_temperature_and_frequency()
+        self.set_canting_angle()
+
+        matches = [
+            time_alignment.nearest_indices(times, station, tolerance)
+            for station in station_times
+        ]
+        self.missing = np.array([indices < 0 for indices in matches])
+
+        self.groups = []
+        for index, dsd in enumerate(self.dsds):
+            group = self._find_group(dsd)
+            if group is None:
+                group = {
+                    "stations": [],
+                    "diameter": np.asarray(dsd.diameter["data"], dtype=float),
+                    "spread": np.asarray(dsd._bin_width(), dtype=float),
+                    "bin_edges": np.asarray(dsd.bin_edges["data"], dtype=float),
+                    "velocity": np.asarray(dsd.velocity["data"], dtype=float),
+                    "Nd": [],
+                }
+                self.groups.append(group)
+            Nd = np.ma.zeros((self.numt, len(group["diameter"])))
+            found = ~self.missing[index]
+            Nd[found] = dsd.Nd["data"][matches[index][found]]
+            Nd[~found] = np.ma.masked
+            group["stations"].append(index)
+            group["Nd"].append(Nd)
+        for group in self.groups:
+            group["stations"] = np.array(group["stations"])
+            group["Nd"] = np.ma.stack(group["Nd"])
+
+    def __len__(self):
+        return len(self.stations)
+
+    def _find_group(self, dsd):
+        """ Instrument group with the same size bins as dsd, or None. """
+        for group in self.groups:
+            if np.array_equal(group["bin_edges"], dsd.bin_edges["data"]):
+                return group
+        return None
+
+    def set_scattering_temperature_and_frequency(
+        self, scattering_temp=10, scattering_freq=9.7e9
+    ):
+        """ Change the scattering temperature [C] and frequency [Hz].
+
+        Defaults to 10C X-band, like `DropSizeDistribution`.
+        """
+        self.scattering_params["scattering_freq"] = scattering_freq
+        self.scattering_params["scattering_temp"] = scattering_temp
+        self.scattering_params["m_w"] = dielectric.get_refractivity(
+            scattering_freq, scattering_temp
+        )
+
+    def set_canting_angle(self, canting_angle=20):
+        """ Change the canting angle [deg] for scattering calculations. """
+        self.scattering_params["canting_angle"] = canting_angle
+
+    def _store(self, name, group, values):
+        """ Store a group's (stations in group, numt) values into a network field. """
+        if name not in self.fields:
+            self.fields[name] = self.config.fill_in_metadata(
+                name, np.ma.masked_all((len(self), self.numt))
+            )
+        data = np.ma.asarray(values, dtype=float)
+        data = np.ma.masked_where(np.isnan(np.ma.getdata(data)), data)
+        data[self.missing[group["stations"]]] = np.ma.masked
+        self.fields[name]["data"][group["stations"]] = data
+
+    def _moments(self, group, orders):
+        """ Moments of every spectrum of a group, shape (stations, numt, orders). """
+        return gamma_moments.dsd_moments(
+            np.ma.filled(group["Nd"], 0.0), group["diameter"], group["spread"], orders
+        )
+
+    def calculate_RR(self):
+        """ Calculate the rain rate [mm/h] of every station, see
+        `DropSizeDistribution.calculate_RR`. """
+        for group in self.groups:
+            weights = (
+                0.6e-3
+                * np.pi
+                * group["velocity"]
+                * group["spread"]
+                * group["diameter"] ** 3
+            )
+            self._store("rain_rate", group, np.ma.filled(group["Nd"], 0.0) @ weights)
+
+    def calculate_dsd_parameterization(self):
+        """ Calculate Nt, W, Dm, Nw, D0 and Dmax of every station.
+
+        These match `DropSizeDistribution.calculate_dsd_parameterization`.
+        Its per spectrum least squares shape fit is not batched, use
+        `fit_gamma` for mu, Lambda and N0.
+        """
+        rho_w = 1e-03  # grams per mm cubed Density of Water
+        for group in self.groups:
+            Nd = np.ma.filled(group["Nd"], 0.0)
+            diameter = group["diameter"]
+            M0, M3, M4 = np.moveaxis(self._moments(group, (0, 3, 4)), -1, 0)
+            W = np.pi / 6.0 * rho_w * M3
+            with np.errstate(invalid="ignore", divide="ignore"):
+                Dm = M4 / M3
+                Nw = np.where(M3 > 0, 256.0 / (np.pi * rho_w) * W / Dm ** 4, 0.0)
+
+            nonzero = Nd != 0
+            last = len(diameter) - 1 - np.argmax(nonzero[..., ::-1], axis=-1)
+            Dmax = np.where(nonzero.any(axis=-1), diameter[last], 0.0)
+
+            for name, values in [
+                ("Nt", M0),
+                ("W", W),
+                ("Dm", Dm),
+                ("Nw", Nw),
+                ("D0", self._median_diameter(Nd, group)),
+                ("Dmax", Dmax),
+            ]:
+                self._store(name, group, values)
+
+    def _median_diameter(self, Nd, group):
+        """ Median volume diameter, interpolated between the bins where the
+        cumulative water content crosses half of the total. """
+        diameter = group["diameter"]
+        cum_W = np.cumsum(Nd * group["spread"] * diameter ** 3, axis=-1)
+        half = cum_W[..., -1:] / 2.0
+        cross = np.argmax(cum_W >= half, axis=-1)
+        below = np.maximum(cross - 1, 0)
+        W_below = np.take_along_axis(cum_W, below[..., np.newaxis], axis=-1)[..., 0]
+        W_cross = np.take_along_axis(cum_W, cross[..., np.newaxis], axis=-1)[..., 0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = (W_cross - W_below) / (diameter[cross] - diameter[below])
+            D0 = diameter[below] + (half[..., 0] - W_below) / slope
+        D0 = np.where(cross == 0, diameter[0], D0)
+        single = np.count_nonzero(Nd, axis=-1) == 1
+        D0 = np.where(single, diameter[np.argmax(Nd, axis=-1)], D0)
+        return np.where(cum_W[..., -1] > 0, D0, 0.0)
+
+    def fit_gamma(self, moments=(2, 4, 6)):
+        """ Fit a gamma distribution to every spectrum of every station with the
+        method of moments, see `DropSizeDistribution.fit_gamma`. Sets mu,
+        Lambda and N0. """
+        for group in self.groups:
+            M = self._moments(group, moments)
+            N0, mu, Lambda = gamma_moments.fit_moments(M.reshape(-1, 3), moments)
+            for name, values in [("mu", mu), ("Lambda", Lambda), ("N0", N0)]:
+                self._store(
+                    name,
+                    group,
+                    np.ma.filled(values.astype(float), np.nan).reshape(M.shape[:2]),
+                )
+
+    def calculate_radar_parameters(
+        self, dsr_func=DSR.bc, max_diameter=9.0, backend="tmatrix"
+    ):
+        """ Calculate the radar parameters of every station.
+
+        One scattering table is built per instrument group and every spectrum
+        of the group is evaluated against it at once. Sets the same fields as
+        `DropSizeDistribution.calculate_radar_parameters`.
+
+        Parameters
+        ----------
+        dsr_func: function, optional
+            Drop Shape Relationship function, see the `DSR` module.
+        max_diameter: float, optional
+            Maximum drop diameter [mm].
+        backend: str, optional
+            Scattering backend, 'tmatrix' or 'rayleigh_spheroid'.
+        """
+        wavelength = (
+            SPEED_OF_LIGHT / self.scattering_params["scattering_freq"] * 1000.0
+        )
+        for group in self.groups:
+            table, _ = backends.build_table(
+                backend,
+                group["bin_edges"],
+                wavelength,
+                self.scattering_params["m_w"],
+                dsr_func,
+                canting_angle=self.scattering_params["canting_angle"],
+                max_diameter=max_diameter,
+            )
+            group["scattering_table"] = table
+            Nd = np.ma.filled(group["Nd"], 0.0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                params = table.radar_parameters(Nd.reshape(-1, Nd.shape[-1]))
+            for name, values in params.items():
+                self._store(name, group, values.reshape(Nd.shape[:2]))
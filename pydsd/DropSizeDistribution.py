@@ -6,6 +6,7 @@ readers in the io module. The class knows how to perform scattering
 simulations on itself.
 """
 
+import copy
 import numpy as np
 import pytmatrix
 import scipy
@@ -15,13 +16,29 @@ from math import gamma
 from pytmatrix.tmatrix import Scatterer
 from pytmatrix.psd import PSDIntegrator
 from pytmatrix import orientation, radar, tmatrix_aux, refractive
-from datetime import date
-from .utility.expfit import expfit, expfit2
+from datetime import date, datetime
+from netCDF4 import date2num
+from .utility.expfit import (
+    bootstrap_powerlaw_fit,
+    expfit,
+    expfit2,
+    grouped_powerlaw_fit,
+    powerlaw_fit,
+)
 
 from . import DSR
+from .fit import gamma_moments, poisson_gamma, ua98
 from .utility import dielectric
 from .utility import configuration
+from .utility import compact
+from .utility import events
+from .utility.field_store import FieldStore
 from .utility import filter
+from .utility import time_alignment
+from .scattering import backends, ensemble
+from .scattering.doppler import DopplerSpectrumSimulator
+from .scattering.elevation import build_elevation_tables, elevation_geometries
+from .scattering.temperature import TemperatureScatteringTable
 
 SPEED_OF_LIGHT = 299792458
 
@@ -58,10 +75,24 @@ class DropSizeDistribution(object):
             for instance, there will be 31 different bin boundaries.
         diameter: array_like
             The center size for each dsd bin.
+        dtype: numpy dtype or None
+            Storage dtype of the drop counts when compact, see `compact`.
+        packed_masks: dictionary
+            Masks of compact fields, packed along their last axis.
 
     """
 
-    def __init__(self, reader, time_start=None, location=None):
+    # Fields holding numbers of drops, summed rather than averaged over time.
+    _count_fields = (
+        "number_measured_drops",
+        "total_measured_drops",
+        "drop_spectrum",
+        "num_particles",
+    )
+    # Fields holding one value per size bin, not per time step.
+    _bin_fields = ("velocity", "terminal_velocity")
+
+    def __init__(self, reader, time_start=None, location=None, dtype=None):
         """Initializer for the DropSizeDistribution class.
 
         The DropSizeDistribution class holds dsd's returned from the various
@@ -75,6 +106,11 @@ class DropSizeDistribution(object):
             Recording Start time.
         location: tuple
             (Latitude, Longitude) pair in decimal format.
+        dtype: numpy dtype, optional
+            Store the spectra compactly, as float32 or, for drop counts,
+            as uint16. See `compact`. Readers still parse into full
+            precision arrays and convert them afterwards, so this reduces
+            the memory held by the DSD, not the peak memory while reading.
 
         Returns
         -------
@@ -86,18 +122,20 @@ class DropSizeDistribution(object):
         self.config = configuration.Configuration()
 
         self.time = reader.time
-        self.Nd = reader.fields["Nd"]
+        self.numt = len(reader.time["data"])
+        self.fields = FieldStore(self.numt, reader.fields)
+        self.Nd = self.fields["Nd"]
         self.spread = reader.spread
         try:
-            self.rain_rate = reader.fields["rain_rate"]
+            self.rain_rate = self.fields["rain_rate"]
         except:
             self.rain_rate = None
         try:
-            self.Z = reader.fields["reflectivity"]
+            self.Z = self.fields["reflectivity"]
         except:
             self.Z = None
         try:
-            self.num_particles = reader.fields["num_particles"]
+            self.num_particles = self.fields["num_particles"]
         except:
             self.num_particles = None
         try:
@@ -108,7 +146,6 @@ class DropSizeDistribution(object):
             self.diameter = reader.diameter
         except:
             self.diameter = None
-        self.fields = reader.fields
         self.time_start = time_start
 
         try:
@@ -116,7 +153,6 @@ class DropSizeDistribution(object):
         except:
             self.info = {}
 
-        self.numt = len(reader.time["data"])
         location = {}
 
         if location:
@@ -124,12 +160,13 @@ class DropSizeDistribution(object):
 
         self.scattering_table_consistent = False
         self.scattering_params = {}
+        self.events = None
 
         self.set_scattering_temperature_and_frequency()
         self.set_canting_angle()
 
         try:  # We need to make sure this is a dictionary
-            self.velocity = reader.fields["terminal_velocity"]
+            self.velocity = self.fields["terminal_velocity"]
         except:
             self.velocity = None
         if self.velocity is None:
@@ -150,6 +187,11 @@ class DropSizeDistribution(object):
         except:
             self.effective_sampling_area = None
 
+        self.dtype = None
+        self.packed_masks = {}
+        if dtype is not None:
+            self.compact(dtype)
+
     def set_scattering_temperature_and_frequency(
         self, scattering_temp=10, scattering_freq=9.7e9
     ):
@@ -182,6 +224,9 @@ class DropSizeDistribution(object):
         scatter_time_range=None,
         max_diameter=9.0,
         scatter_table_filename=None,
+        backend="tmatrix",
+        temperature_field=None,
+        temperature_grid=None,
     ):
         """ Calculates radar parameters for the Drop Size Distribution.
 
@@ -189,7 +234,7 @@ class DropSizeDistribution(object):
         Defaults to X-Band,Beard and Chuang 10C setup.
 
         Sets the dictionary parameters in fields dictionary:
-            Zh, Zdr, Kdp, Ai(Attenuation)
+            Zh, Zv, Zdr, delta_co, rho_hv, LDR_h, LDR_v, Kdp, Ai, Av and Adr(Attenuation)
 
         Parameters:
         ----------
@@ -201,13 +246,60 @@ class DropSizeDistribution(object):
             scatter_time_range: optional, tuple
                 Parameter to restrict the scattering to a time interval. The first element is the start time,
                 while the second is the end time.
+            scatter_table_filename: optional, str
+                Saved pytmatrix scattering table to load. Only the 'tmatrix' backend without
+                a temperature field can use it, otherwise a ValueError is raised.
+            backend: optional, str
+                Scattering backend. 'tmatrix' (default) uses pytmatrix T-Matrix tables.
+                'rayleigh_spheroid' uses analytic Rayleigh scattering by spheroids, which
+                is much faster and accurate enough at S and C band.
+            temperature_field: optional, str
+                Name of a field holding the temperature [C] of each time step. When given, scattering
+                tables are built on a temperature grid and interpolated to the temperature of each time
+                step. Missing temperatures use the scattering temperature.
+            temperature_grid: optional, array_like
+                Temperatures [C] to build the scattering tables at. Defaults to a 10C spaced grid covering
+                the temperature field.
         """
-        if self.scattering_table_consistent is False:
+        if backend not in backends.SCATTERING_BACKENDS:
+            raise ValueError(
+                "Unknown scattering backend {}, use one of {}".format(
+                    backend, backends.SCATTERING_BACKENDS
+                )
+            )
+        if scatter_table_filename is not None and (
+            backend != "tmatrix" or temperature_field is not None
+        ):
+            raise ValueError(
+                "scatter_table_filename is a single pytmatrix table, only usable with "
+                "the tmatrix backend and no temperature field"
+            )
+        temperature = None
+        if temperature_field is not None:
+            temperature = np.ma.filled(
+                np.ma.masked_invalid(self.fields[temperature_field]["data"]),
+                self.scattering_params["scattering_temp"],
+            )
+            if temperature_grid is None:
+                temperature_grid = np.arange(
+                    np.floor(np.min(temperature) / 10.0) * 10,
+                    np.ceil(np.max(temperature) / 10.0) * 10 + 10,
+                    10.0,
+                )
+            temperature_grid = tuple(float(T) for T in np.sort(temperature_grid))
+
+        if (
+            self.scattering_table_consistent is False
+            or self.scattering_table.backend != backend
+            or getattr(self.scattering_table, "temperatures", None) != temperature_grid
+        ):
             self._setup_scattering(
                 SPEED_OF_LIGHT / self.scattering_params["scattering_freq"] * 1000.0,
                 dsr_func,
                 max_diameter,
                 scatter_table_filename=scatter_table_filename,
+                backend=backend,
+                temperatures=temperature_grid,
             )
         self._setup_empty_fields()
 
@@ -228,40 +320,256 @@ class DropSizeDistribution(object):
                 )
                 self.scatter_end_time = self.numt
 
-        self.scatterer.set_geometry(
-            tmatrix_aux.geom_horiz_back
-        )  # We break up scattering to avoid regenerating table.
-
-        for t in range(self.scatter_start_time, self.scatter_end_time):
-            if np.sum(self.Nd["data"][t]) is 0:
-                continue
-            BinnedDSD = pytmatrix.psd.BinnedPSD(
-                self.bin_edges["data"], self.Nd["data"][t]
+        # Every time step is integrated at once against the per bin scattering table.
+        scatter_range = slice(self.scatter_start_time, self.scatter_end_time)
+        if temperature is None:
+            radar_params = self.scattering_table.radar_parameters(
+                self.Nd["data"][scatter_range]
             )
-            self.scatterer.psd = BinnedDSD
-            self.fields["Zh"]["data"][t] = 10 * np.log10(radar.refl(self.scatterer))
-            self.fields["Zdr"]["data"][t] = 10 * np.log10(radar.Zdr(self.scatterer))
-            self.fields["delta_co"]["data"][t] = (
-                radar.delta_hv(self.scatterer) * 180.0 / np.pi
+        else:
+            radar_params = self.scattering_table.radar_parameters(
+                self.Nd["data"][scatter_range], temperature[scatter_range]
             )
+        for param, values in radar_params.items():
+            self.fields[param]["data"][scatter_range] = values
+        self._mask_missing_times(radar_params)
+
+    def calculate_radar_parameters_at_elevations(
+        self,
+        elevations,
+        dsr_func=DSR.bc,
+        max_diameter=9.0,
+        backend="tmatrix",
+        n_jobs=None,
+        cache_dir=None,
+    ):
+        """ Calculates radar parameters seen by a radar at several elevation angles.
+
+        Builds one scattering table per elevation (in parallel, and loaded from
+        `cache_dir` when cached there) and evaluates the whole record against
+        them. Sets the fields `<param>_el<elevation>` for each radar parameter
+        of `calculate_radar_parameters`, for instance `Zdr_el2.5`. The combined
+        table is kept as `elevation_scattering_table`.
+
+        Parameters
+        ----------
+        elevations: sequence
+            Elevation angles [deg].
+        dsr_func: function, optional
+            Drop Shape Relationship function, see the `DSR` module.
+        max_diameter: float, optional
+            Maximum drop diameter [mm].
+        backend: str, optional
+            Scattering backend, 'tmatrix' or 'rayleigh_spheroid'.
+        n_jobs: int, optional
+            Number of processes building the tables. Defaults to the number of CPUs.
+        cache_dir: str, optional
+            Directory to load tables from and save new tables to.
+        """
+        self.elevation_scattering_table = build_elevation_tables(
+            elevations,
+            self.bin_edges["data"],
+            SPEED_OF_LIGHT / self.scattering_params["scattering_freq"] * 1000.0,
+            self.scattering_params["m_w"],
+            dsr_func,
+            canting_angle=self.scattering_params["canting_angle"],
+            max_diameter=max_diameter,
+            backend=backend,
+            n_jobs=n_jobs,
+            cache_dir=cache_dir,
+        )
+        for elevation in elevations:
+            back, forw = elevation_geometries(elevation)
+            radar_params = self.elevation_scattering_table.radar_parameters(
+                self.Nd["data"], back=back, forw=forw
+            )
+            for param, values in radar_params.items():
+                field = self.config.fill_in_metadata(param, np.ma.masked_invalid(values))
+                field["long_name"] = "{} at {:g} deg Elevation".format(
+                    field["long_name"], elevation
+                )
+                field["elevation_angle"] = elevation
+                self.fields["{}_el{:g}".format(param, elevation)] = field
+
+    def calculate_radar_ensemble(
+        self,
+        num_members=50,
+        canting_angles=ensemble.DEFAULT_CANTING_ANGLES,
+        dsr_funcs=ensemble.DEFAULT_DSR_FUNCS,
+        temperatures=ensemble.DEFAULT_TEMPERATURES,
+        params=("Zh", "Zdr", "Kdp"),
+        percentiles=(5, 50, 95),
+        backend="tmatrix",
+        max_diameter=9.0,
+        n_jobs=None,
+        random_state=None,
+    ):
+        """ Monte Carlo uncertainty of the radar parameters.
+
+        Samples ensemble members from the candidate canting angles, drop shape
+        relationships and temperatures, and stores the per time step ensemble
+        statistics of each radar parameter in the fields dictionary, named
+        `<param>_mean`, `<param>_std` and `<param>_p<percentile>`. The ensemble
+        is kept as `scattering_ensemble`.
+
+        Parameters
+        ----------
+        num_members: int, optional
+            Number of ensemble members.
+        canting_angles: sequence, optional
+            Candidate canting angle standard deviations [deg].
+        dsr_funcs: sequence, optional
+            Candidate Drop Shape Relationship functions from the `DSR` module.
+        temperatures: sequence, optional
+            Candidate scattering temperatures [C].
+        params: sequence, optional
+            Radar parameters to summarize, any of those set by
+            `calculate_radar_parameters`.
+        percentiles: sequence, optional
+            Percentiles to store.
+        backend: str, optional
+            Scattering backend, 'tmatrix' or 'rayleigh_spheroid'.
+        max_diameter: float, optional
+            Maximum drop diameter [mm].
+        n_jobs: int, optional
+            Number of processes building the scattering tables. Defaults to the
+            number of CPUs.
+        random_state: int, optional
+            Seed for reproducible ensembles.
+        """
+        members = ensemble.sample_members(
+            num_members,
+            canting_angles=canting_angles,
+            dsr_funcs=dsr_funcs,
+            temperatures=temperatures,
+            random_state=random_state,
+        )
+        self.scattering_ensemble = ensemble.build_ensemble(
+            members,
+            self.bin_edges["data"],
+            self.scattering_params["scattering_freq"],
+            backend=backend,
+            max_diameter=max_diameter,
+            n_jobs=n_jobs,
+        )
+        statistics = self.scattering_ensemble.radar_statistics(
+            self.Nd["data"], params=params, percentiles=percentiles
+        )
+        for param, param_statistics in statistics.items():
+            for name, values in param_statistics.items():
+                field = self.config.fill_in_metadata(
+                    param, np.ma.masked_invalid(values)
+                )
+                field["long_name"] = "Ensemble {} of {}".format(
+                    name, field["long_name"]
+                )
+                self.fields["{}_{}".format(param, name)] = field
 
-        self.scatterer.set_geometry(tmatrix_aux.geom_horiz_forw)
+    def calculate_doppler_spectrum(
+        self,
+        velocity_resolution=0.19,
+        max_velocity=12.0,
+        use_drop_spectrum=False,
+        dsr_func=DSR.bc,
+        max_diameter=9.0,
+        backend="tmatrix",
+        effective_sampling_area=None,
+    ):
+        """ Simulate the Doppler spectra of a vertically pointing radar.
 
-        for t in range(self.scatter_start_time, self.scatter_end_time):
-            BinnedDSD = pytmatrix.psd.BinnedPSD(
-                self.bin_edges["data"], self.Nd["data"][t]
+        Backscatter is computed at vertical incidence, and the reflectivity of
+        each size bin is spread over the radar velocity bins its drops fall at.
+        Stores the spectra as `doppler_spectrum` [mm^6 m^-3 / (m/s)] with
+        velocity bin centers in `doppler_velocity`, and the spectral moments
+        `Ze_vertical`, `mean_doppler_velocity` and `doppler_spectrum_width`.
+
+        Parameters
+        ----------
+        velocity_resolution: float, optional
+            Radar velocity resolution [m/s].
+        max_velocity: float, optional
+            Largest radar velocity [m/s], e.g. the Nyquist velocity.
+        use_drop_spectrum: bool, optional
+            Use the measured velocities of `drop_spectrum` and
+            `spectrum_fall_velocity` instead of the terminal fall velocity of Nd.
+        dsr_func: function, optional
+            Drop Shape Relationship function, see the `DSR` module.
+        max_diameter: float, optional
+            Maximum drop diameter [mm].
+        backend: str, optional
+            Scattering backend, 'tmatrix' or 'rayleigh_spheroid'.
+        effective_sampling_area: function or array_like, optional
+            Effective sampling area, used with `use_drop_spectrum`. See
+            `calculate_dsd_from_spectrum`.
+        """
+        table, _ = backends.build_table(
+            backend,
+            self.bin_edges["data"],
+            SPEED_OF_LIGHT / self.scattering_params["scattering_freq"] * 1000.0,
+            self.scattering_params["m_w"],
+            dsr_func,
+            canting_angle=self.scattering_params["canting_angle"],
+            max_diameter=max_diameter,
+            geometries=(tmatrix_aux.geom_vert_back,),
+        )
+        self.doppler_simulator = DopplerSpectrumSimulator(
+            table, tmatrix_aux.geom_vert_back, velocity_resolution, max_velocity
+        )
+
+        if use_drop_spectrum:
+            velocity = self.spectrum_fall_velocity["data"]
+            concentration = 1e6 / (
+                velocity[:, np.newaxis]
+                * self._effective_sampling_area(effective_sampling_area)
+                * self.spread["data"]
+                * self._sampling_interval()
+            )
+            spectrum = self.doppler_simulator.from_drop_spectrum(
+                self.fields["drop_spectrum"]["data"], velocity, concentration
+            )
+        else:
+            bin_edge_velocity = np.interp(
+                self.bin_edges["data"], self.diameter["data"], self.velocity["data"]
             )
-            self.scatterer.psd = BinnedDSD
-            self.fields["Kdp"]["data"][t] = radar.Kdp(self.scatterer)
-            self.fields["Ai"]["data"][t] = radar.Ai(self.scatterer)
-            self.fields["Adr"]["data"][t] = radar.Ai(self.scatterer) - radar.Ai(
-                self.scatterer, h_pol=False
+            spectrum = self.doppler_simulator.from_nd(
+                self.Nd["data"], bin_edge_velocity
             )
 
+        Ze, mean_velocity, width = self.doppler_simulator.moments(spectrum)
+        self.doppler_velocity = {
+            "data": self.doppler_simulator.velocity,
+            "units": "m/s",
+            "long_name": "Doppler Velocity, Positive Downwards",
+        }
+        self.fields["doppler_spectrum"] = self.config.fill_in_metadata(
+            "doppler_spectrum", spectrum
+        )
+        self.fields["Ze_vertical"] = self.config.fill_in_metadata(
+            "Ze_vertical", np.ma.masked_invalid(10 * np.log10(Ze))
+        )
+        self.fields["mean_doppler_velocity"] = self.config.fill_in_metadata(
+            "mean_doppler_velocity", np.ma.masked_invalid(mean_velocity)
+        )
+        self.fields["doppler_spectrum_width"] = self.config.fill_in_metadata(
+            "doppler_spectrum_width", np.ma.masked_invalid(width)
+        )
+
     def _setup_empty_fields(self):
         """ Preallocate arrays of zeros for the radar moments
         """
-        params_list = ["Zh", "Zdr", "delta_co", "Kdp", "Ai", "Adr"]
+        params_list = [
+            "Zh",
+            "Zv",
+            "Zdr",
+            "delta_co",
+            "rho_hv",
+            "LDR_h",
+            "LDR_v",
+            "Kdp",
+            "Ai",
+            "Av",
+            "Adr",
+        ]
 
         for param in params_list:
             self.fields[param] = self.config.fill_in_metadata(
@@ -269,7 +577,13 @@ class DropSizeDistribution(object):
             )
 
     def _setup_scattering(
-        self, wavelength, dsr_func, max_diameter, scatter_table_filename=None
+        self,
+        wavelength,
+        dsr_func,
+        max_diameter,
+        scatter_table_filename=None,
+        backend="tmatrix",
+        temperatures=None,
     ):
         """ Internal Function to create scattering tables.
 
@@ -285,30 +599,58 @@ class DropSizeDistribution(object):
                 Drop Shape Relationship function. Several built-in are available in the `DSR` module.
             max_diameter: float
                 Maximum drop diameter to generate scattering table for. 
+            backend: str
+                Scattering backend, 'tmatrix' or 'rayleigh_spheroid'.
+            temperatures: tuple
+                If given, build one table per temperature [C] for temperature interpolation.
 
         """
-        self.scatterer = Scatterer(
-            wavelength=wavelength, m=self.scattering_params["m_w"]
-        )
-        self.scatterer.psd_integrator = PSDIntegrator()
-        self.scatterer.psd_integrator.axis_ratio_func = lambda D: 1.0 / dsr_func(D)
         self.dsr_func = dsr_func
-        self.scatterer.psd_integrator.D_max = max_diameter
-        self.scatterer.psd_integrator.geometries = (
-            tmatrix_aux.geom_horiz_back,
-            tmatrix_aux.geom_horiz_forw,
-        )
-        self.scatterer.or_pdf = orientation.gaussian_pdf(
-            self.scattering_params["canting_angle"]
-        )
-        self.scatterer.orient = orientation.orient_averaged_fixed
-        if scatter_table_filename is None:
-            self.scatterer.psd_integrator.init_scatter_table(self.scatterer)
+        if temperatures is None:
+            self.scattering_table = self._build_scattering_table(
+                wavelength,
+                self.scattering_params["m_w"],
+                dsr_func,
+                max_diameter,
+                scatter_table_filename,
+                backend,
+            )
         else:
-            self.scatterer.psd_integrator.load_scatter_table(scatter_table_filename)
+            tables = [
+                self._build_scattering_table(
+                    wavelength,
+                    dielectric.get_refractivity(
+                        self.scattering_params["scattering_freq"], temperature
+                    ),
+                    dsr_func,
+                    max_diameter,
+                    None,
+                    backend,
+                )
+                for temperature in temperatures
+            ]
+            self.scattering_table = TemperatureScatteringTable(tables, temperatures)
 
         self.scattering_table_consistent = True
 
+    def _build_scattering_table(
+        self, wavelength, m, dsr_func, max_diameter, scatter_table_filename, backend
+    ):
+        """ Build the per bin scattering table for one refractive index. """
+        table, scatterer = backends.build_table(
+            backend,
+            self.bin_edges["data"],
+            wavelength,
+            m,
+            dsr_func,
+            canting_angle=self.scattering_params["canting_angle"],
+            max_diameter=max_diameter,
+            scatter_table_filename=scatter_table_filename,
+        )
+        if scatterer is not None:
+            self.scatterer = scatterer
+        return table
+
     def _calc_mth_moment(self, m):
         """Calculates the mth moment of the drop size distribution.
 
@@ -320,20 +662,127 @@ class DropSizeDistribution(object):
             order of the moment
         """
 
+        return gamma_moments.dsd_moments(
+            self.Nd["data"], self.diameter["data"], self._bin_width(), [m]
+        )[:, 0]
+
+    def _bin_width(self):
+        """ Width of each diameter bin. """
         if len(self.spread["data"]) > 0:
-            bin_width = self.spread["data"]
+            return self.spread["data"]
+        return np.diff(self.bin_edges["data"])
+
+    def fit_gamma(self, method="ua98", moments=(2, 4, 6)):
+        """Fits a gamma distribution N(D) = N0 * D^mu * exp(-Lambda*D) to every spectrum.
+
+        The moments of every spectrum are computed in one matrix product, and
+        the fit is done with masked array operations over the whole record.
+        Sets the fields mu, Lambda, N0, D0 and the Z = aR^b parameters Z_R_a
+        and Z_R_b of the fitted distributions. Spectra without a gamma
+        solution are masked.
+
+        Parameters:
+        -----------
+        method: optional, string
+            Fitting method. 'ua98' is the method of moments of Ulbrich and
+            Atlas (1998), see the `fit.ua98` module. 'truncated_moments'
+            matches the same moments of a gamma distribution truncated to the
+            measured diameter range (the outer bin edges), which avoids the
+            bias of the untruncated moments for narrow or broad spectra.
+        moments: optional, tuple
+            Moment orders (i, j, k) to fit. (2, 4, 6) uses the closed form of
+            Ulbrich and Atlas, other orders a lookup of the moment ratio.
+        """
+        if method not in ("ua98", "truncated_moments"):
+            raise ValueError("Unknown gamma fitting method {}".format(method))
+        if len(moments) != 3:
+            raise ValueError("The {} method needs three moment orders".format(method))
+
+        M = gamma_moments.dsd_moments(
+            self.Nd["data"], self.diameter["data"], self._bin_width(), moments
+        )
+        if method == "truncated_moments":
+            if self.bin_edges is not None:
+                D_min, D_max = self.bin_edges["data"][0], self.bin_edges["data"][-1]
+            else:
+                half_width = self._bin_width() / 2.0
+                D_min = self.diameter["data"][0] - half_width[0]
+                D_max = self.diameter["data"][-1] + half_width[-1]
+            N0, mu, Lambda = gamma_moments.fit_truncated_moments(
+                M, D_min, D_max, moments
+            )
         else:
-            bin_width = [
-                self.bin_edges["data"][i + 1] - self.bin_edges["data"][i]
-                for i in range(0, len(self.bin_edges["data"]) - 1)
-            ]
-        mth_moment = np.ma.zeros(self.numt)
+            N0, mu, Lambda = gamma_moments.fit_moments(M, moments)
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            D0 = ua98.mom_d0(mu, Lambda)
+        self._set_gamma_fields(
+            {"N0": N0, "mu": mu, "Lambda": Lambda, "D0": D0},
+            "Gamma fit, {} method of moments {}".format(method, tuple(moments)),
+        )
 
-        for t in range(0, self.numt):
-            dmth = np.power(self.diameter["data"], m)
-            mth_moment[t] = np.dot(np.multiply(dmth, self.Nd["data"][t]), bin_width)
+    def fit_gamma_mle(self, effective_sampling_area=None, min_drops=10, n_jobs=None):
+        """Maximum likelihood fit of a normalized gamma distribution to the drop counts.
+
+        Fits Nw, D0 and mu of every spectrum to the number of drops counted in
+        each bin, which is Poisson distributed with a mean given by the
+        distribution, the effective sampling area, the fall velocity and the
+        sampling interval. Unlike moment and least squares fits of Nd this is
+        not biased at low counts, see the `fit.poisson_gamma` module. Needs
+        number_measured_drops or drop_spectrum in fields. Sets the fields Nw,
+        D0, mu, Lambda, N0 and the Z = aR^b parameters Z_R_a and Z_R_b.
+
+        Parameters:
+        -----------
+        effective_sampling_area: optional, function or array_like
+            Effective sampling area [mm^2] as a function of diameter or for
+            each bin, see `calculate_dsd_from_spectrum`.
+        min_drops: optional, int
+            Spectra with fewer drops are masked.
+        n_jobs: optional, int
+            Number of processes refitting spectra the vectorized fit did not
+            converge on.
+        """
+        if "number_measured_drops" in self.fields:
+            counts = self.fields["number_measured_drops"]["data"]
+        elif "drop_spectrum" in self.fields:
+            counts = np.ma.sum(self.fields["drop_spectrum"]["data"], axis=1)
+        else:
+            raise ValueError(
+                "Maximum likelihood fits need number_measured_drops or drop_spectrum"
+            )
 
-        return mth_moment
+        bin_exposure = poisson_gamma.exposure(
+            self._effective_sampling_area(effective_sampling_area),
+            self.velocity["data"],
+            self._sampling_interval(),
+            self._bin_width(),
+        )
+        Nw, D0, mu = poisson_gamma.poisson_gamma_fit(
+            counts,
+            self.diameter["data"],
+            self._bin_width(),
+            bin_exposure,
+            min_drops=min_drops,
+            n_jobs=n_jobs,
+        )
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            Lambda = (3.67 + mu) / D0
+            N0 = Nw * np.ma.exp(poisson_gamma.log_f(mu)) * D0 ** (-mu)
+        self._set_gamma_fields(
+            {"Nw": Nw, "N0": N0, "mu": mu, "Lambda": Lambda, "D0": D0},
+            "Gamma fit, Poisson maximum likelihood on drop counts",
+        )
+
+    def _set_gamma_fields(self, fits, source):
+        """ Store fitted gamma parameters and their Z-R relationship as fields. """
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            fits["Z_R_a"] = ua98.zr_a(fits["mu"], fits["N0"])
+            fits["Z_R_b"] = ua98.zr_b(fits["mu"])
+        for param, values in fits.items():
+            self.fields[param] = self.config.fill_in_metadata(
+                param, np.ma.masked_invalid(values)
+            )
+            self.fields[param]["source"] = source
 
     def calculate_dsd_parameterization(self, method="bringi"):
         """Calculates DSD Parameterization.
@@ -393,6 +842,7 @@ class DropSizeDistribution(object):
         Lambda, N0 = self._calculate_exponential_params()
         self.fields["Lambda"]["data"] = Lambda
         self.fields["N0"]["data"] = N0
+        self._mask_missing_times(params_list)
 
     def __get_last_nonzero(self, N):
         """ Gets last nonzero entry in an array. Gets last non-zero entry in an array.
@@ -552,6 +1002,7 @@ class DropSizeDistribution(object):
                     )
                 )
             )
+        self._mask_missing_times(["rain_rate"])
 
     def calculate_R_Kdp_relationship(self):
         """
@@ -680,6 +1131,498 @@ class DropSizeDistribution(object):
         )
         return popt, pcov
 
+    def calculate_relationship(
+        self,
+        predictors,
+        target="rain_rate",
+        n_boot=0,
+        confidence=95,
+        n_jobs=None,
+        random_state=None,
+    ):
+        """
+        calculate_relationship calculates a power law fit of a field against
+        one or more other fields, target = a * x1**b1 * x2**b2 ..., for instance
+        R-Zh, R-Kdp or R-Zh-Zdr. Fields in dB or dBZ are fit in linear units.
+        Only time steps where the target and every predictor are positive and
+        finite are used. Optionally computes bootstrap confidence intervals.
+
+        Parameters:
+        -----------
+        predictors: sequence
+            Names of the independent fields, e.g. ["Zh", "Zdr"].
+        target: str, optional
+            Name of the dependent field.
+        n_boot: int, optional
+            Number of bootstrap replicates. No confidence intervals when 0.
+        confidence: float, optional
+            Confidence level of the intervals [%].
+        n_jobs: int, optional
+            Number of threads solving bootstrap replicates.
+        random_state: int, optional
+            Seed for reproducible bootstrap resampling.
+
+        Returns:
+        --------
+        popt: array
+            Scale parameter a followed by the exponents of each predictor.
+        pcov: array
+            Covariance matrix of fits.
+        ci: array
+            Lower and upper confidence limits of each parameter, shape (2, p),
+            or None when n_boot is 0.
+        """
+        x, y, _ = self._relationship_data(predictors, target)
+        if n_boot == 0:
+            popt, pcov = powerlaw_fit(x, y)
+            return popt, pcov, None
+        popt, pcov, ci, _ = bootstrap_powerlaw_fit(
+            x,
+            y,
+            n_boot=n_boot,
+            confidence=confidence,
+            n_jobs=n_jobs,
+            random_state=random_state,
+        )
+        return popt, pcov, ci
+
+    def calculate_grouped_relationship(
+        self, labels, predictors, target="rain_rate", n_jobs=None
+    ):
+        """
+        calculate_grouped_relationship calculates a power law fit like
+        `calculate_relationship` separately for each group of time steps
+        sharing a label, such as a convective/stratiform class, an event id or
+        a month. Every group is fit in one batched pass.
+
+        Parameters:
+        -----------
+        labels: array_like or str
+            Group label of each time step, or the name of a field holding them.
+            Masked labels are left out.
+        predictors: sequence
+            Names of the independent fields, e.g. ["Zh", "Zdr"].
+        target: str, optional
+            Name of the dependent field.
+        n_jobs: int, optional
+            Number of threads fitting groups.
+
+        Returns:
+        --------
+        groups: dict
+            'label' (G,), 'popt' (G, p) scale parameter followed by the
+            exponents, 'pcov' (G, p, p) covariance matrices and 'count' (G,)
+            number of time steps fit in each group.
+        """
+        if isinstance(labels, str):
+            labels = self.fields[labels]["data"]
+        labels = np.ma.asarray(labels)
+        x, y, usable = self._relationship_data(predictors, target)
+        labels = labels[usable]
+        labelled = ~np.ma.getmaskarray(labels)
+        return grouped_powerlaw_fit(
+            [values[labelled] for values in x],
+            y[labelled],
+            np.ma.getdata(labels)[labelled],
+            n_jobs=n_jobs,
+        )
+
+    def _relationship_data(self, predictors, target):
+        """ Linear predictor and target values usable in a power law fit, and
+        the mask of the time steps they come from. """
+        values = []
+        for name in list(predictors) + [target]:
+            field = self.fields[name]
+            data = np.ma.filled(np.ma.asarray(field["data"], dtype=float), np.nan)
+            if field.get("units") in ("dB", "dBZ"):
+                data = self._idb(data)
+            values.append(data)
+        with np.errstate(invalid="ignore"):
+            usable = np.all([np.isfinite(v) & (v > 0) for v in values], axis=0)
+        return [v[usable] for v in values[:-1]], values[-1][usable], usable
+
+    def find_rain_events(
+        self, min_gap=1800, rain_rate_thresh=0.1, nt_thresh=None, min_duration=0
+    ):
+        """Segments the record into rain events separated by dry gaps.
+
+        Samples are wet when the rain rate and, if nt_thresh is given, the
+        total concentration Nt reach their thresholds. The events are stored
+        as an `EventIndex` in self.events, see `event_statistics` for per
+        event reductions. Requires rain_rate in fields (see calculate_RR),
+        and Nt (see calculate_dsd_parameterization) when nt_thresh is used.
+
+        Parameters:
+        -----------
+        min_gap: optional, float
+            Wet samples more than min_gap seconds apart are in different events.
+        rain_rate_thresh: optional, float
+            Smallest rain rate of wet samples [mm/h].
+        nt_thresh: optional, float
+            Smallest total concentration of wet samples [m^-3].
+        min_duration: optional, float
+            Shorter events, in seconds from first to last wet sample, are dropped.
+
+        Returns:
+        --------
+        events: `EventIndex`
+            Start and stop index of each event.
+        """
+        if "rain_rate" not in self.fields:
+            raise ValueError("Rain events need rain_rate, run calculate_RR first")
+        with np.errstate(invalid="ignore"):
+            rain_rate = self.fields["rain_rate"]["data"]
+            wet = np.ma.filled(rain_rate >= rain_rate_thresh, False)
+            if nt_thresh is not None:
+                wet &= np.ma.filled(self.fields["Nt"]["data"] >= nt_thresh, False)
+        self.events = events.find_events(
+            wet, self.time["data"], min_gap, min_duration=min_duration
+        )
+        return self.events
+
+    def event_statistics(self, event_index=None):
+        """Per event statistics, each computed in one pass over the record.
+
+        Parameters:
+        -----------
+        event_index: optional, `EventIndex`
+            Events to summarize. Defaults to the events of find_rain_events.
+
+        Returns:
+        --------
+        statistics: dict
+            Arrays with one value per event: start_time and stop_time of the
+            first and last sample, duration [s], num_samples, accumulation
+            [mm], peak_rain_rate [mm/h], and the mean of D0, Nw and Dm when
+            those fields exist.
+        """
+        if event_index is None:
+            event_index = self.events
+        if event_index is None:
+            raise ValueError("No events, run find_rain_events first")
+
+        times = np.asarray(self.time["data"])
+        rain_rate = self.fields["rain_rate"]["data"]
+        statistics = {
+            "start_time": times[event_index.start],
+            "stop_time": times[event_index.stop - 1],
+            "duration": times[event_index.stop - 1] - times[event_index.start],
+            "num_samples": event_index.num_samples,
+            "accumulation": event_index.reduce(rain_rate, "sum")
+            * self._sampling_interval()
+            / 3600.0,
+            "peak_rain_rate": event_index.reduce(rain_rate, "max"),
+        }
+        for param in ["D0", "Nw", "Dm"]:
+            if param in self.fields:
+                statistics[param] = event_index.reduce(
+                    self.fields[param]["data"], "mean"
+                )
+        return statistics
+
+    def isel(self, indices):
+        """Selects time steps by position.
+
+        Every per time field, the time and the attributes aliasing fields
+        (Nd, rain_rate...) are indexed consistently, all other state is
+        shared with this instance. Slices give views of the data, so Nd and
+        drop_spectrum are not copied, other indices give copies. Per time
+        scalar fields are copied into the field store of the selection.
+
+        Parameters:
+        -----------
+        indices: int, slice, array_like
+            Positions or boolean mask of the time steps to keep.
+
+        Returns:
+        --------
+        dsd: `DropSizeDistribution`
+            Drop size distribution of the selected time steps.
+        """
+        if isinstance(indices, (int, np.integer)):
+            indices = [indices]
+        selected = copy.copy(self)
+        selected.numt = len(np.arange(self.numt)[indices])
+        selected.fields = FieldStore(
+            selected.numt,
+            {
+                name: self._select_time(name, field, indices)
+                for name, field in self.fields.items()
+            },
+        )
+        selected.time = self._select_time("time", self.time, indices)
+        for attribute in ["Nd", "rain_rate", "Z", "num_particles"]:
+            value = getattr(self, attribute)
+            aliases = [name for name, field in self.fields.items() if field is value]
+            if aliases:
+                setattr(selected, attribute, selected.fields[aliases[0]])
+            elif value is not None:
+                setattr(
+                    selected, attribute, self._select_time(attribute, value, indices)
+                )
+        selected.packed_masks = {
+            name: packed_mask[indices]
+            for name, packed_mask in self.packed_masks.items()
+        }
+        selected.scattering_params = dict(self.scattering_params)
+        selected.events = None
+        return selected
+
+    def sel(self, start=None, end=None):
+        """Selects the time steps between start and end, inclusive.
+
+        The positions are found by binary search on the sorted time, and the
+        selection is a contiguous slice, so the data is not copied, see isel.
+
+        Parameters:
+        -----------
+        start: optional, float, datetime or numpy.datetime64
+            First time to keep, in the units of time (epoch seconds) or as a
+            UTC date. Defaults to the start of the record.
+        end: optional, float, datetime or numpy.datetime64
+            Last time to keep. Defaults to the end of the record.
+
+        Returns:
+        --------
+        dsd: `DropSizeDistribution`
+            Drop size distribution of the selected time steps.
+        """
+        times = np.ma.getdata(self.time["data"])[: self.numt]
+        first = 0 if start is None else np.searchsorted(times, self._to_time(start))
+        last = (
+            self.numt
+            if end is None
+            else np.searchsorted(times, self._to_time(end), side="right")
+        )
+        return self.isel(slice(first, max(first, last)))
+
+    def time_join(self, *others, tolerance=None, direction="nearest"):
+        """Pairs the time steps of this record with those of collocated records.
+
+        Parameters:
+        -----------
+        others: `DropSizeDistribution`
+            Records to pair with this one.
+        tolerance: optional, float
+            Largest time difference of a pair [s].
+        direction: optional, string
+            'nearest' time, 'backward' for the last time at or before (an
+            as-of join), or 'forward' for the first time at or after.
+
+        Returns:
+        --------
+        indices: array_like
+            Time steps of this record paired in every other record.
+        other_indices: list
+            Paired time steps of each other record, aligned with indices.
+        """
+        return time_alignment.join(
+            self, *others, tolerance=tolerance, direction=direction
+        )
+
+    def aggregate_to(self, times, window=None, label="left", min_samples=1):
+        """Aggregates the record over the sampling windows of another instrument.
+
+        Pairs a finer instrument with a coarser one: each per time field is
+        averaged over the samples falling in each window, except drop counts
+        (number_measured_drops, total_measured_drops, drop_spectrum and
+        num_particles) which are summed. Derived parameters such as D0 are
+        averaged too; recompute them from the aggregated Nd for consistency.
+        See `utility.time_alignment`.
+
+        Parameters:
+        -----------
+        times: array_like or `DropSizeDistribution`
+            Window times, or the record whose time steps give them.
+        window: optional, float
+            Window duration in seconds. Defaults to the median spacing of times.
+        label: optional, string
+            'left' if times mark the start of their window, 'right' if the end.
+        min_samples: optional, int
+            Windows with fewer samples are masked.
+
+        Returns:
+        --------
+        dsd: `DropSizeDistribution`
+            Drop size distribution on the window times.
+        """
+        if isinstance(times, DropSizeDistribution):
+            time = dict(times.time)
+            time["data"] = time_alignment.record_times(times)
+        else:
+            time = dict(self.time)
+            time["data"] = np.ma.getdata(np.asarray(times))
+        if window is None:
+            window = np.median(np.diff(time["data"]))
+        start, stop = time_alignment.window_indices(
+            time["data"], time_alignment.record_times(self), window, label
+        )
+        empty = stop - start < min_samples
+
+        aggregated = copy.copy(self)
+        aggregated.numt = len(time["data"])
+        aggregated.fields = FieldStore(aggregated.numt)
+        for name, field in self.fields.items():
+            aggregated.fields[name] = self._aggregate_field(
+                name, field, start, stop, empty
+            )
+        for attribute in ["Nd", "rain_rate", "Z", "num_particles"]:
+            value = getattr(self, attribute)
+            aliases = [name for name, field in self.fields.items() if field is value]
+            if aliases:
+                setattr(aggregated, attribute, aggregated.fields[aliases[0]])
+            elif value is not None:
+                setattr(
+                    aggregated,
+                    attribute,
+                    self._aggregate_field(attribute, value, start, stop, empty),
+                )
+        aggregated.time = time
+        aggregated.packed_masks = {}
+        aggregated.scattering_params = dict(self.scattering_params)
+        aggregated.events = None
+        return aggregated
+
+    def _aggregate_field(self, name, field, start, stop, empty):
+        """ Copy of a field dictionary with its per time data aggregated over windows. """
+        data = field["data"]
+        if not self._is_time_field(name, data):
+            return field
+        how = "sum" if name in self._count_fields else "mean"
+        values = time_alignment.aggregate(data, start, stop, how)
+        mask = np.broadcast_to(
+            empty.reshape((-1,) + (1,) * (values.ndim - 1)), values.shape
+        )
+        aggregated = dict(field)
+        aggregated["data"] = np.ma.masked_where(mask | np.isnan(values), values)
+        return aggregated
+
+    def _to_time(self, value):
+        """ Converts a date to the units of time. Numbers are returned as is. """
+        if isinstance(value, np.datetime64):
+            value = value.astype("datetime64[us]").astype(datetime)
+        if isinstance(value, datetime):
+            units = self.time.get("units", "seconds since 1970-1-1 00:00:00+0:00")
+            return date2num(value.replace(tzinfo=None), units)
+        return value
+
+    def _select_time(self, name, field, indices):
+        """ Copy of a field dictionary with its per time data indexed. """
+        data = field["data"]
+        if not self._is_time_field(name, data):
+            return field
+        selected = dict(field)
+        selected["data"] = np.asanyarray(data)[indices]
+        return selected
+
+    def _is_time_field(self, name, data):
+        """ Whether the data of a field has a leading time dimension.
+
+        Per bin fields are recognised by name, so they are not mistaken for
+        per time fields when numt equals the number of bins.
+        """
+        return (
+            name not in self._bin_fields
+            and np.ndim(data) > 0
+            and np.shape(data)[0] == self.numt
+        )
+
+    def compact(self, dtype="float32"):
+        """Stores the spectra of the DSD compactly to save memory.
+
+        Per time fields with a bin dimension (Nd, drop_spectrum...) are
+        converted to float32, and drop count fields to dtype. Masked values
+        are stored as 0, so sums over bins skip them as they do for masked
+        arrays, with a packed bitmap of the mask in packed_masks, see
+        `field_mask`. Rain rate, DSD and radar parameters are masked at time
+        steps whose spectrum is missing in every bin. Per time scalar fields
+        stay float64 in the field store. Calculations on compact fields
+        accumulate in float64.
+
+        Parameters:
+        -----------
+        dtype: optional, numpy dtype
+            float32, or uint16 to store drop counts as integers.
+        """
+        dtype = compact.check_dtype(dtype)
+        for name, field in self.fields.items():
+            data = field["data"]
+            if not self._is_time_field(name, data):
+                continue
+            if name in self._count_fields:
+                target = dtype
+            elif np.ndim(data) >= 2:
+                target = np.float32
+            else:
+                continue
+            field["data"], packed_mask = compact.compact_array(data, target)
+            if packed_mask is not None:
+                self.packed_masks[name] = packed_mask
+        self.dtype = dtype
+
+    def field_mask(self, name):
+        """Boolean mask of a field, including the masks of compact fields.
+
+        Parameters:
+        -----------
+        name: string
+            Field name.
+
+        Returns:
+        --------
+        mask: np.ndarray
+            True where the field is masked, NaN or missing in a compact field.
+        """
+        data = self.fields[name]["data"]
+        if name in self.packed_masks:
+            return compact.unpack_mask(self.packed_masks[name], np.shape(data))
+        mask = np.ma.getmaskarray(data)
+        if np.issubdtype(np.asarray(np.ma.getdata(data)).dtype, np.floating):
+            mask = mask | np.isnan(np.ma.getdata(data))
+        return mask
+
+    def _missing_times(self):
+        """ Time steps whose compact Nd or drop spectrum is missing in every bin. """
+        missing = np.zeros(self.numt, dtype=bool)
+        for name in ("Nd", "drop_spectrum"):
+            if name in self.packed_masks:
+                mask = self.field_mask(name)
+                missing |= mask.reshape(self.numt, -1).all(axis=-1)
+        return missing
+
+    def _mask_missing_times(self, names):
+        """Masks per time fields at the time steps missing from compact spectra.
+
+        Compact fields store missing values as 0, which the calculations
+        read as a dry spectrum. See `compact`.
+
+        Parameters:
+        -----------
+        names: list
+            Names of the per time fields to mask.
+        """
+        missing = self._missing_times()
+        if not missing.any():
+            return
+        for name in names:
+            self.fields[name]["data"] = np.ma.masked_where(
+                missing, self.fields[name]["data"]
+            )
+
+    def memory_usage(self):
+        """Bytes held by the data and masks of each field.
+
+        Returns:
+        --------
+        usage: dict
+            Bytes of each field, with packed masks of compact fields.
+        """
+        return {
+            name: compact.nbytes(field["data"])
+            + compact.nbytes(self.packed_masks.get(name))
+            for name, field in self.fields.items()
+        }
+
     def calculate_dsd_from_spectrum(self, effective_sampling_area=None, replace=True):
         """ Calculate N(D) from the drop spectrum based on the effective sampling area.
         Updates the entry for ND in fields.
@@ -694,27 +1637,13 @@ class DropSizeDistribution(object):
             Whether to replace Nd with the newly calculated one. If true, no return value to save memory.
         """
 
-        D = self.diameter["data"]
-
-        if effective_sampling_area is not None:
-            if callable(effective_sampling_area):
-                A = effective_sampling_area(D)
-            else:
-                A = np.array(effective_sampling_area)
-        elif self.effective_sampling_area is not None:
-            A = self.effective_sampling_area["data"]
-        else:
-            print(
-                "Defaulting to Parsivel Sampling Area. This is probably wrong. Make sure effective_sampling_area variable is set"
-            )
-            A = filter.parsivel_sampling_area(D)
-
-        delta_t = np.mean(np.diff(self.time["data"][0:4]))  # Sampling time in seconds
+        A = self._effective_sampling_area(effective_sampling_area)
+        delta_t = self._sampling_interval()
         velocity = self.spectrum_fall_velocity["data"]
         spread = self.spread["data"]
 
         if replace:
-            self.fields["Nd"]["data"] = (
+            Nd = (
                 1e6
                 * np.dot(
                     np.swapaxes(self.fields["drop_spectrum"]["data"], 1, 2),
@@ -722,6 +1651,10 @@ class DropSizeDistribution(object):
                 )
                 / (A * spread * delta_t)
             )
+            if self.dtype is not None:
+                Nd = Nd.astype(np.float32)
+            self.fields["Nd"]["data"] = Nd
+            self.packed_masks.pop("Nd", None)
             self.fields["Nd"]["source"] = "Calculated from spectrum."
         else:
             return (
@@ -733,6 +1666,25 @@ class DropSizeDistribution(object):
                 / (A * spread * delta_t)
             )
 
+    def _effective_sampling_area(self, effective_sampling_area=None):
+        """ Effective sampling area of each diameter bin, see `calculate_dsd_from_spectrum`. """
+        D = self.diameter["data"]
+
+        if effective_sampling_area is not None:
+            if callable(effective_sampling_area):
+                return effective_sampling_area(D)
+            return np.array(effective_sampling_area)
+        if self.effective_sampling_area is not None:
+            return self.effective_sampling_area["data"]
+        print(
+            "Defaulting to Parsivel Sampling Area. This is probably wrong. Make sure effective_sampling_area variable is set"
+        )
+        return filter.parsivel_sampling_area(D)
+
+    def _sampling_interval(self):
+        """ Sampling time in seconds. """
+        return np.mean(np.diff(self.time["data"][0:4]))
+
     def save_scattering_table(self, scattering_filename):
         """ Save scattering table used by PyDSD to be reloaded later. Note this should only be used on disdrometers
         with the same setup for scattering (frequency, bins, max size, etc).
@@ -740,13 +1692,77 @@ class DropSizeDistribution(object):
         or to cause issues. 
         
         """
-        if hasattr(self.scatterer, "psd_integrator"):
+        if hasattr(self, "scatterer") and hasattr(self.scatterer, "psd_integrator"):
             self.scatterer.psd_integrator.save_scatter_table(scattering_filename)
         else:
             raise AttributeError(
                 "ERROR: No scattering object has been generated. Please calculate scattering table first."
             )
 
+    def to_xarray(self, masked="mask", chunks=None):
+        """ Convert the DropSizeDistribution to an xarray Dataset.
+
+        The Dataset wraps the existing arrays without copying them. See
+        `pydsd.io.XarrayConverter.dsd_to_xarray` for details.
+
+        Parameters
+        ----------
+        masked: str, optional
+            'mask' to store masks as separate `<field>_mask` variables, or 'nan'
+            to fill masked values with NaN.
+        chunks: dict, optional
+            Dask chunk sizes to chunk the Dataset with.
+
+        Returns
+        -------
+        ds: `xarray.Dataset`
+            Dataset holding the drop size distribution and its fields.
+        """
+        from .io.XarrayConverter import dsd_to_xarray
+
+        return dsd_to_xarray(self, masked=masked, chunks=chunks)
+
+    @classmethod
+    def from_xarray(cls, ds):
+        """ Create a DropSizeDistribution from an xarray Dataset.
+
+        The inverse of `to_xarray`. NumPy backed variables are wrapped without
+        copying them.
+
+        Parameters
+        ----------
+        ds: `xarray.Dataset`
+            Dataset created by `to_xarray`.
+
+        Returns
+        -------
+        dsd: `DropSizeDistribution`
+            Drop Size Distribution instance.
+        """
+        from .io.XarrayConverter import XarrayReader
+
+        return cls(XarrayReader(ds))
+
+    def to_parquet(self, filename, station=None, location=None, **kwargs):
+        """ Write the per time fields to a Parquet file.
+
+        Writes every one dimensional time field (D0, Nw, mu, Dm, Zh, Zdr, Kdp,
+        rain rate...) with the station id and location. See
+        `pydsd.io.ParquetWriter.write_parquet` for the remaining options.
+
+        Parameters
+        ----------
+        filename: str
+            Parquet file to write.
+        station: str, optional
+            Station id. Defaults to the `site_id` in info.
+        location: tuple, optional
+            (Latitude, Longitude) of the station in decimal degrees.
+        """
+        from .io.ParquetWriter import write_parquet
+
+        write_parquet(self, filename, station=station, location=location, **kwargs)
+
     def _idb(self, db):
         """
         Converts dB to linear scale.
@@ -13,6 +13,8 @@ from .aux_readers.read_hvps import read_hvps
 from .aux_readers.ARM_JWD_Reader import read_arm_jwd_b1
 from .aux_readers.ARM_Vdis_Reader import read_arm_vdis_b1
 
+from .DSDNetwork import DSDNetwork
+
 from . import partition
 from . import utility
 from . import fit
@@ -13,7 +13,7 @@ from ..DropSizeDistribution import DropSizeDistribution
 from ..io import common
 
 
-def read_parsivel_arm_netcdf(filename):
+def read_parsivel_arm_netcdf(filename, dtype=None):
     """
     Takes a filename pointing to an ARM Parsivel netcdf file and returns
     a drop size distribution object.
@@ -21,6 +21,9 @@ def read_parsivel_arm_netcdf(filename):
     Usage:
     dsd = read_parsivel_parsivel_netcdf(filename)
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
@@ -29,7 +32,7 @@ def read_parsivel_arm_netcdf(filename):
     reader = ARM_APU_reader(filename)
 
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
     else:
         return None
 
@@ -13,7 +13,7 @@ from ..io import common
 import os
 
 
-def read_arm_jwd_b1(filename):
+def read_arm_jwd_b1(filename, dtype=None):
     """
     Takes a filename pointing to an ARM Parsivel netcdf file and returns
     a drop size distribution object.
@@ -21,6 +21,9 @@ def read_arm_jwd_b1(filename):
     Usage:
     dsd = read_parsivel_parsivel_netcdf(filename)
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
@@ -29,7 +32,7 @@ def read_arm_jwd_b1(filename):
     reader = ArmJwdReader(filename)
 
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
     else:
         return None
 
@@ -11,7 +11,7 @@ from ..io import common
 from ..utility.configuration import Configuration
 
 
-def read_arm_vdis_b1(filename):
+def read_arm_vdis_b1(filename, dtype=None):
     """
     Takes a filename pointing to an ARM vdis netcdf file and returns
     a drop size distribution object. Tested on MC3E data. 
@@ -19,6 +19,9 @@ def read_arm_vdis_b1(filename):
     Usage:
     dsd = read_parsivel_parsivel_netcdf(filename)
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
@@ -27,7 +30,7 @@ def read_arm_vdis_b1(filename):
     reader = ArmVdisReader(filename)
 
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
     else:
         return None
 
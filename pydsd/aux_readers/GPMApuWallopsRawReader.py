@@ -7,7 +7,7 @@ from ..DropSizeDistribution import DropSizeDistribution
 from ..io import common
 
 
-def read_gpm_nasa_apu_raw_wallops(filename):
+def read_gpm_nasa_apu_raw_wallops(filename, dtype=None):
     """
     Takes a filename pointing to a parsivel NASA Field Campaign file with RAW Data and returns
     a drop size distribution object.
@@ -16,6 +16,9 @@ def read_gpm_nasa_apu_raw_wallops(filename):
     dsd = read_gpm_nasa_apu_raw_wallops(filename)
 
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
@@ -26,7 +29,7 @@ def read_gpm_nasa_apu_raw_wallops(filename):
     reader = GPMApuWallopsRawReader(filename)
     # return reader
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
     else:
         return None
 
@@ -7,10 +7,11 @@ from netCDF4 import num2date, date2num
 
 from ..DropSizeDistribution import DropSizeDistribution
 from ..io import common
+from ..io.cache import cached_parse
 from ..utility.configuration import Configuration
 
 
-def read_2dvd_sav_nasa_gv(filename, campaign="ifloods"):
+def read_2dvd_sav_nasa_gv(filename, campaign="ifloods", dtype=None):
     """
     Takes a filename pointing to a 2D-Video Disdrometer NASA Field Campaign
     file and returns a drop size distribution object.
@@ -24,6 +25,9 @@ def read_2dvd_sav_nasa_gv(filename, campaign="ifloods"):
 
     'ifloods'
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
@@ -31,12 +35,12 @@ def read_2dvd_sav_nasa_gv(filename, campaign="ifloods"):
     reader = NASA_2DVD_sav_reader(filename, campaign)
 
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
     else:
         return None
 
 
-def read_2dvd_dsd_nasa_gv(filename, skip_header=None):
+def read_2dvd_dsd_nasa_gv(filename, skip_header=None, dtype=None):
     """
     Takes a filename pointing to a 2D-Video Disdrometer NASA Field Campaign
      _dsd file and returns a drop size distribution object.
@@ -46,6 +50,9 @@ def read_2dvd_dsd_nasa_gv(filename, skip_header=None):
     Usage:
     dsd = read_2dvd_dsd_nasa_gv(filename)
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
@@ -53,7 +60,7 @@ def read_2dvd_dsd_nasa_gv(filename, skip_header=None):
     reader = NASA_2DVD_dsd_reader(filename, skip_header)
 
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
     else:
         return None
 
@@ -164,43 +171,26 @@ class NASA_2DVD_dsd_reader(object):
     Use the read_2dvd_dsd_nasa_gv() function to interface with this.
     """
 
+    _cache_version = 1
+    _cache_attributes = ("time", "Nd")
+
     def __init__(self, filename, skip_header):
         """
         Handles setting up a NASA 2DVD Reader  Reader
         """
         self.config = Configuration()
 
-        num_samples = self._get_number_of_samples(filename, skip_header)
-
-        self.Nd = np.ma.zeros((num_samples, 50))
         self.notes = []
         self.fields = {}
 
-        # This part is troubling because time strings change in nasa files. So we'll go with what our e
-        # example files have.
-        dt = []
-        with open(filename) as input:
-            if skip_header is not None:
-                for num in range(0, skip_header):
-                    input.readline()
-            for idx, line in enumerate(input):
-                data_array = line.split()
-                year = int(data_array[0])
-                DOY = int(data_array[1])
-                hour = int(data_array[2])
-                minute = float(data_array[3])
-
-                # TODO: Make this match time handling(units) from other readers.
-                dt.append(
-                    datetime.datetime(year, 1, 1)
-                    + datetime.timedelta(DOY - 1, hours=hour, minutes=minute)
-                )
-                self.Nd[idx, :] = [float(value) for value in data_array[4:]]
+        cached_parse(
+            self,
+            filename,
+            lambda: self._read_file(filename, skip_header),
+            options=(skip_header,),
+        )
         self.Nd = np.ma.array(self.Nd)
 
-        epoch = datetime.datetime(1970, 1, 1, 0, 0, 0)
-
-        self.time = [(x - epoch).total_seconds() for x in dt]
         velocity = [
             0.248,
             1.144,
@@ -265,6 +255,37 @@ class NASA_2DVD_dsd_reader(object):
         self.fields["Nd"] = self.config.fill_in_metadata("Nd", self.Nd)
         self.time = self.config.fill_in_metadata("time", np.ma.array(self.time))
 
+    def _read_file(self, filename, skip_header):
+        """ Parse the text file into the Nd array and epoch times."""
+        num_samples = self._get_number_of_samples(filename, skip_header)
+
+        self.Nd = np.zeros((num_samples, 50))
+
+        # This part is troubling because time strings change in nasa files. So we'll go with what our e
+        # example files have.
+        dt = []
+        with open(filename) as input:
+            if skip_header is not None:
+                for num in range(0, skip_header):
+                    input.readline()
+            for idx, line in enumerate(input):
+                data_array = line.split()
+                year = int(data_array[0])
+                DOY = int(data_array[1])
+                hour = int(data_array[2])
+                minute = float(data_array[3])
+
+                # TODO: Make this match time handling(units) from other readers.
+                dt.append(
+                    datetime.datetime(year, 1, 1)
+                    + datetime.timedelta(DOY - 1, hours=hour, minutes=minute)
+                )
+                self.Nd[idx, :] = [float(value) for value in data_array[4:]]
+
+        epoch = datetime.datetime(1970, 1, 1, 0, 0, 0)
+
+        self.time = [(x - epoch).total_seconds() for x in dt]
+
     def _get_number_of_samples(self, filename, skip_header):
         """ Loop through file counting number of lines to calculate number of samples."""
         num_samples = 0
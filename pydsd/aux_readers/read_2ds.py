@@ -3,6 +3,7 @@
 
 import csv
 import datetime
+import os
 import itertools
 import numpy as np
 import numpy.ma as ma
@@ -11,9 +12,10 @@ import scipy.optimize
 from pytmatrix.psd import GammaPSD
 from ..DropSizeDistribution import DropSizeDistribution
 from ..io import common
+from ..io.cache import cached_parse
 
 
-def read_2ds(filename, campaign="acapex"):
+def read_2ds(filename, campaign="acapex", dtype=None):
     """Read a airborne 2DS Cloud Probe File into a DropSizeDistribution Object.
 
     Takes a filename pointing to a 2DS Horizontal G1 Aircraft file and returns a `DropSizeDistribution` object.
@@ -24,6 +26,9 @@ def read_2ds(filename, campaign="acapex"):
        2DS Cloud Probe Filename
     campaign: optional, string
         Optional campaign setting, currently does nothing. Defaults to acapex
+    dtype: optional, numpy dtype
+        Store the spectra compactly as float32 or uint16, see
+        `DropSizeDistribution.compact`.
 
     Usage:
     ------
@@ -45,7 +50,7 @@ def read_2ds(filename, campaign="acapex"):
     reader = TwoDSReader(filename, campaign)
 
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
     else:
         return None
 
@@ -58,6 +63,9 @@ class TwoDSReader(object):
     This class reads and parses data from 2DS data files. Use the read_2ds() function to interface with this.
     """
 
+    _cache_version = 1
+    _cache_attributes = ("sample_time", "Nd", "bin_edge_values")
+
     def __init__(self, filename, campaign="acapex"):
         """ Initializer for a 2DS Cloud Probe class.
 
@@ -76,44 +84,13 @@ class TwoDSReader(object):
                 TwoDSReader class
         """
         self.fields = {}
+        self.filename = filename
 
-        time = []
-        bins = []
-        Nd = []
-
-        self.f = open(filename, "rU")
-        reader = csv.reader(self.f)
-
-        # Remove Header lines but save them to variables for use later
-        next(self.f)
-        next(self.f)
-        next(self.f)
-        header_l = next(self.f)
-
-        for row in reader:
-            time.append(float(row[0].split()[0]))
-            Nd.append(list(map(float, row[10:71])))
-
-        Nd = np.ma.array(Nd)
-        time = np.ma.array(time)
+        cached_parse(self, filename, lambda: self._read_file(filename))
 
-        header = header_l.split(",")
-        bins = header[10:71]
-
-        # Loop over the bins, split them, remove the C, split again into bin edges
-        bin_edge_str = []
-        for i, sbin in enumerate(bins):
-            s = sbin.split(":")
-            bin_no_clist = s[1]
-            s1 = bin_no_clist.split("-")
-            bin_edge_str.append(s1)
-
-        # Loop over the list of strings containing bin edges, turn them into integers
-
-        bin_edge_int = []
-        bin_edge_int.append(float(bin_edge_str[0][0]))
-        for sbins in bin_edge_str:
-            bin_edge_int.append(float(sbins[1]))
+        Nd = np.ma.array(self.Nd)
+        time = np.ma.array(self.sample_time)
+        bin_edge_int = list(self.bin_edge_values)
 
         bin_edge_int[-1] = 4000
         bin_edges = np.array(bin_edge_int)
@@ -148,6 +125,42 @@ class TwoDSReader(object):
             "Liquid water particle concentration",
         )
 
+    def _read_file(self, filename):
+        """ Parse the csv file into sample times, Nd and bin edges. """
+        self.sample_time = []
+        self.Nd = []
+
+        with open(filename, "r") as f:
+            reader = csv.reader(f)
+
+            # Remove Header lines but save them to variables for use later
+            next(f)
+            next(f)
+            next(f)
+            header_l = next(f)
+
+            for row in reader:
+                self.sample_time.append(float(row[0].split()[0]))
+                self.Nd.append(list(map(float, row[10:71])))
+
+        header = header_l.split(",")
+        bins = header[10:71]
+
+        # Loop over the bins, split them, remove the C, split again into bin edges
+        bin_edge_str = []
+        for i, sbin in enumerate(bins):
+            s = sbin.split(":")
+            bin_no_clist = s[1]
+            s1 = bin_no_clist.split("-")
+            bin_edge_str.append(s1)
+
+        # Loop over the list of strings containing bin edges, turn them into integers
+
+        self.bin_edge_values = []
+        self.bin_edge_values.append(float(bin_edge_str[0][0]))
+        for sbins in bin_edge_str:
+            self.bin_edge_values.append(float(sbins[1]))
+
     def _get_epoch_time(sample_times, t_units):
         """Convert time to epoch time and return a dictionary."""
         # Convert the time array into a datetime instance
@@ -3,6 +3,7 @@
 
 import csv
 import datetime
+import os
 import itertools
 import numpy as np
 import numpy.ma as ma
@@ -11,9 +12,10 @@ import scipy.optimize
 from pytmatrix.psd import GammaPSD
 from ..DropSizeDistribution import DropSizeDistribution
 from ..io import common
+from ..io.cache import cached_parse
 
 
-def read_hvps(filename):
+def read_hvps(filename, dtype=None):
     """ Read a airborne HVPS Cloud Probe File into a DropSizeDistribution Object.
 
     Takes a filename pointing to a HVPS Horizontal G1 Aircraft file and returns a drop size distribution object.
@@ -22,6 +24,9 @@ def read_hvps(filename):
     -----------
     filename: string
        HVPS Cloud Probe Filename
+    dtype: optional, numpy dtype
+        Store the spectra compactly as float32 or uint16, see
+        `DropSizeDistribution.compact`.
 
     Usage:
     ------
@@ -40,7 +45,7 @@ def read_hvps(filename):
     reader = HVPSReader(filename)
 
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
 
     else:
         return None
@@ -54,13 +59,15 @@ class HVPSReader(object):
     Use the read_2ds_h() function to interface with this.
     """
 
+    _cache_version = 1
+    _cache_attributes = ("sample_time", "Nd")
+
     def __init__(self, filename):  # , campaign)
         """
         Handles settuping up a 2DS H reader
         """
         self.fields = {}
-        time = []
-        Nd = []
+        self.filename = filename
         bin_edges = np.array(
             [
                 75,
@@ -128,22 +135,11 @@ class HVPSReader(object):
             ]
         )
 
-        self.f = open(filename, "rU")
-        reader = csv.reader(self.f)
-
-        # Remove Header lines
-        next(self.f)
-        next(self.f)
-        next(self.f)
-        next(self.f)
+        cached_parse(self, filename, lambda: self._read_file(filename))
 
-        for row in reader:
-            time.append(float(row[0].split()[0]))
-            Nd.append(list(map(float, row[10:71])))
+        Nd = np.ma.array(self.Nd)
 
-        Nd = np.ma.array(Nd)
-
-        time = np.ma.array(time)
+        time = np.ma.array(self.sample_time)
 
         # spread
         spread = np.diff(bin_edges)
@@ -175,6 +171,24 @@ class HVPSReader(object):
             "Liquid water particle concentration",
         )
 
+    def _read_file(self, filename):
+        """ Parse the csv file into sample times and Nd. """
+        self.sample_time = []
+        self.Nd = []
+
+        with open(filename, "r") as f:
+            reader = csv.reader(f)
+
+            # Remove Header lines
+            next(f)
+            next(f)
+            next(f)
+            next(f)
+
+            for row in reader:
+                self.sample_time.append(float(row[0].split()[0]))
+                self.Nd.append(list(map(float, row[10:71])))
+
     def _get_epoch_time(sample_times, t_units):
         """Convert time to epoch time and return a dictionary."""
         # Convert the time array into a datetime instance
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized method of moments fits of a gamma drop size distribution,
+
+      N(D) = N0 * D^mu * exp(-Lambda*D)
+
+to a whole record of spectra at once. Moments of every spectrum come from one
+matrix product of Nd with a (bins x moments) matrix, and the shape parameter
+is found from a moment ratio that does not depend on N0 or Lambda.
+"""
+
+import numpy as np
+import scipy.special as scifunct
+
+from . import ua98
+
+# Shape parameters the moment ratio lookup is tabulated at.
+MU_GRID = np.linspace(-0.99, 50.0, 10000)
+
+
+def moment_matrix(diameter, spread, orders):
+    """ Matrix turning drop concentrations into moments.
+
+    Parameters
+    ----------
+    diameter: array_like
+        Bin center diameters [mm].
+    spread: array_like
+        Bin widths [mm].
+    orders: sequence
+        Moment orders.
+
+    Returns
+    -------
+    matrix: array_like
+        D^n * dD for each bin and order, shape (N, len(orders)), so that the
+        moments of Nd are `Nd @ matrix`.
+    """
+    diameter = np.asarray(diameter, dtype=float)[:, np.newaxis]
+    spread = np.asarray(spread, dtype=float)[:, np.newaxis]
+    return spread * diameter ** np.asarray(orders, dtype=float)
+
+
+def dsd_moments(Nd, diameter, spread, orders):
+    """ Moments of a record of drop size distributions.
+
+    Parameters
+    ----------
+    Nd: array_like
+        Drop concentrations [m^-3 mm^-1], shape (numt, N). Masked values count
+        as no drops.
+    diameter: array_like
+        Bin center diameters [mm].
+    spread: array_like
+        Bin widths [mm].
+    orders: sequence
+        Moment orders.
+
+    Returns
+    -------
+    moments: array_like
+        Moments [m^-3 mm^n], shape (numt, len(orders)).
+    """
+    Nd = np.ma.filled(np.ma.asarray(Nd, dtype=float), 0.0)
+    return Nd @ moment_matrix(diameter, spread, orders)
+
+
+def log_moment_ratio(mu, orders):
+    """ Log of the gamma moment ratio M_j^(k-i) / (M_i^(k-j) * M_k^(j-i)).
+
+    N0 and Lambda cancel out of this ratio, so it only depends on the shape.
+
+    Parameters
+    ----------
+    mu: array_like
+        Shape parameter.
+    orders: sequence
+        Moment orders (i, j, k).
+
+    Returns
+    -------
+    log_ratio: array_like
+        Log of the moment ratio.
+    """
+    i, j, k = orders
+    gammaln = scifunct.gammaln
+    return (
+        (k - i) * gammaln(j + mu + 1)
+        - (k - j) * gammaln(i + mu + 1)
+        - (j - i) * gammaln(k + mu + 1)
+    )
+
+
+def shape_from_moments(moments, orders):
+    """ Shape parameter of a gamma distribution with the given moments.
+
+    For moments (2, 4, 6) this is the closed form of Ulbrich and Atlas (1998),
+    `ua98.shape`. Otherwise the moment ratio is inverted with a lookup table
+    over `MU_GRID`, and ratios outside of the table are masked.
+
+    Parameters
+    ----------
+    moments: array_like
+        Moments (M_i, M_j, M_k), shape (..., 3).
+    orders: sequence
+        Moment orders (i, j, k).
+
+    Returns
+    -------
+    mu: masked array
+        Shape parameter.
+    """
+    moments = np.ma.masked_less_equal(moments, 0)
+    M_i, M_j, M_k = moments[..., 0], moments[..., 1], moments[..., 2]
+    if tuple(orders) == (2, 4, 6):
+        return ua98.shape(M_i, M_j, M_k)
+
+    i, j, k = orders
+    log_ratio = (
+        (k - i) * np.ma.log(M_j) - (k - j) * np.ma.log(M_i) - (j - i) * np.ma.log(M_k)
+    )
+    table = log_moment_ratio(MU_GRID, orders)
+    order = np.argsort(table)
+    mu = np.interp(np.ma.filled(log_ratio, np.nan), table[order], MU_GRID[order])
+    outside = (log_ratio < table.min()) | (log_ratio > table.max())
+    return np.ma.masked_where(np.ma.filled(outside, True), mu)
+
+
+def slope_from_moments(M_i, M_j, mu, orders):
+    """ Slope Lambda [mm^-1] from the moments of orders i and j and the shape. """
+    i, j = orders
+    log_gamma_ratio = scifunct.gammaln(j + mu + 1) - scifunct.gammaln(i + mu + 1)
+    return np.ma.exp((log_gamma_ratio + np.ma.log(M_i) - np.ma.log(M_j)) / (j - i))
+
+
+def intercept_from_moment(M_k, mu, Lambda, k):
+    """ Intercept N0 [m^-3 mm^(-1-mu)] from the moment of order k, shape and slope. """
+    return np.ma.exp(
+        np.ma.log(M_k) + (k + mu + 1) * np.ma.log(Lambda) - scifunct.gammaln(k + mu + 1)
+    )
+
+
+def fit_moments(moments, orders=(2, 4, 6)):
+    """ Gamma distribution parameters from three moments of each spectrum.
+
+    Parameters
+    ----------
+    moments: array_like
+        Moments, shape (numt, 3).
+    orders: sequence, optional
+        Moment orders (i, j, k).
+
+    Returns
+    -------
+    N0, mu, Lambda: masked arrays
+        Intercept [m^-3 mm^(-1-mu)], shape and slope [mm^-1] of each spectrum,
+        masked where the moments have no gamma solution.
+    """
+    moments = np.ma.masked_less_equal(np.ma.masked_invalid(moments), 0)
+    mu = shape_from_moments(moments, orders)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if tuple(orders) == (2, 4, 6):
+            Lambda = ua98.slope(moments[:, 0], moments[:, 1], mu)
+        else:
+            Lambda = slope_from_moments(moments[:, 0], moments[:, 1], mu, orders[:2])
+        N0 = intercept_from_moment(moments[:, 2], mu, Lambda, orders[2])
+    return N0, mu, Lambda
+
+
+def truncated_log_moment(n, mu, Lambda, D_min, D_max):
+    """ Log of the moment of order n of a gamma distribution with N0 = 1
+    truncated to diameters between D_min and D_max.
+
+           int_Dmin^Dmax D^n D^mu exp(-Lambda D) dD
+         = Lambda^-(n+mu+1) [gamma(n+mu+1, Lambda Dmax) - gamma(n+mu+1, Lambda Dmin)]
+
+    with gamma the lower incomplete gamma function.
+    """
+    a = n + mu + 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = scifunct.gammainc(a, Lambda * D_max) - scifunct.gammainc(
+            a, Lambda * D_min
+        )
+        return scifunct.gammaln(a) + np.log(fraction) - a * np.log(Lambda)
+
+
+def _truncated_ratio_residuals(mu, log_Lambda, log_ratios, orders, D_min, D_max):
+    """ Model minus observed log moment ratios log(M_j/M_i) and log(M_k/M_j). """
+    Lambda = np.exp(log_Lambda)
+    log_M = [truncated_log_moment(n, mu, Lambda, D_min, D_max) for n in orders]
+    return (
+        log_M[1] - log_M[0] - log_ratios[..., 0],
+        log_M[2] - log_M[1] - log_ratios[..., 1],
+    )
+
+
+def fit_truncated_moments(
+    moments, D_min, D_max, orders=(2, 4, 6), max_iter=50, tol=1e-8
+):
+    """ Gamma distribution parameters from three moments of each spectrum,
+    accounting for the truncation of the spectra to the measured diameters.
+
+    Solves the two moment ratios for (mu, Lambda) with a damped Newton method
+    applied to every spectrum at once, seeded with the untruncated solution
+    of `fit_moments` (a lookup of the moment ratio against mu). N0 then
+    follows from the highest moment.
+
+    Parameters
+    ----------
+    moments: array_like
+        Moments, shape (numt, 3).
+    D_min: float
+        Smallest measured diameter [mm], usually the first bin edge.
+    D_max: float
+        Largest measured diameter [mm], usually the last bin edge.
+    orders: sequence, optional
+        Moment orders (i, j, k).
+    max_iter: int, optional
+        Maximum number of Newton steps.
+    tol: float, optional
+        Tolerance on the log moment ratio residuals.
+
+    Returns
+    -------
+    N0, mu, Lambda: masked arrays
+        Intercept [m^-3 mm^(-1-mu)], shape and slope [mm^-1] of each spectrum,
+        masked where the solver did not converge.
+    """
+    moments = np.ma.masked_less_equal(np.ma.masked_invalid(moments), 0)
+    log_M = np.ma.log(moments)
+    log_ratios = np.ma.filled(
+        np.ma.column_stack([log_M[:, 1] - log_M[:, 0], log_M[:, 2] - log_M[:, 1]]),
+        np.nan,
+    )
+
+    _, mu_seed, Lambda_seed = fit_moments(moments, orders)
+    mu_min = -min(orders) - 1 + 1e-3
+    mu = np.clip(np.ma.filled(mu_seed.astype(float), 1.0), mu_min + 0.1, 30.0)
+    log_Lambda = np.ma.filled(np.ma.log(Lambda_seed), np.log(2.0))
+    log_Lambda = np.where(np.isfinite(log_Lambda), log_Lambda, np.log(2.0))
+
+    f1, f2 = _truncated_ratio_residuals(
+        mu, log_Lambda, log_ratios, orders, D_min, D_max
+    )
+    h = 1e-6
+    for _ in range(max_iter):
+        active = ~((np.abs(f1) < tol) & (np.abs(f2) < tol))
+        active &= np.isfinite(f1) & np.isfinite(f2)
+        if not np.any(active):
+            break
+        a_mu, a_L, a_ratios = mu[active], log_Lambda[active], log_ratios[active]
+
+        # Central difference Jacobian of both residuals in (mu, log Lambda).
+        mu_hi = _truncated_ratio_residuals(a_mu + h, a_L, a_ratios, orders, D_min, D_max)
+        mu_lo = _truncated_ratio_residuals(a_mu - h, a_L, a_ratios, orders, D_min, D_max)
+        L_hi = _truncated_ratio_residuals(a_mu, a_L + h, a_ratios, orders, D_min, D_max)
+        L_lo = _truncated_ratio_residuals(a_mu, a_L - h, a_ratios, orders, D_min, D_max)
+        J11 = (mu_hi[0] - mu_lo[0]) / (2 * h)
+        J21 = (mu_hi[1] - mu_lo[1]) / (2 * h)
+        J12 = (L_hi[0] - L_lo[0]) / (2 * h)
+        J22 = (L_hi[1] - L_lo[1]) / (2 * h)
+        g1, g2 = f1[active], f2[active]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            det = J11 * J22 - J12 * J21
+            d_mu = (J22 * g1 - J12 * g2) / det
+            d_L = (J11 * g2 - J21 * g1) / det
+            # Damp large steps and keep the shape above its lower bound.
+            scale = np.minimum(1.0, 2.0 / np.abs(d_mu))
+            scale = np.minimum(scale, 0.5 / np.abs(d_L))
+        new_mu = np.maximum(a_mu - scale * d_mu, (a_mu + mu_min) / 2.0)
+        new_L = a_L - scale * d_L
+        mu[active], log_Lambda[active] = new_mu, new_L
+        f1[active], f2[active] = _truncated_ratio_residuals(
+            new_mu, new_L, a_ratios, orders, D_min, D_max
+        )
+
+    converged = (np.abs(f1) < tol) & (np.abs(f2) < tol)
+    Lambda = np.exp(log_Lambda)
+    N0 = np.exp(
+        log_M[:, 2] - truncated_log_moment(orders[2], mu, Lambda, D_min, D_max)
+    )
+    mask = ~converged | np.ma.getmaskarray(N0)
+    return (
+        np.ma.masked_where(mask, np.ma.filled(N0, np.nan)),
+        np.ma.masked_where(mask, mu),
+        np.ma.masked_where(mask, Lambda),
+    )
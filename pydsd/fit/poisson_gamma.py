@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Maximum likelihood fits of a normalized gamma drop size distribution,
+
+      N(D) = Nw * f(mu) * (D/D0)^mu * exp(-(3.67 + mu) * D/D0)
+
+      f(mu) = 6/3.67^4 * (3.67 + mu)^(mu + 4) / Gamma(mu + 4)
+
+to the raw drop counts of a disdrometer. The number of drops counted in a bin
+is Poisson distributed with mean N(D) times the exposure of the bin (sampling
+area, fall velocity, sampling interval and bin width), so bins without drops
+constrain the fit as well. Unlike moment or least squares fits of N(D) this
+is not biased when few drops are counted.
+
+All spectra are fit at once with a damped Newton (Levenberg-Marquardt
+Fisher scoring) iteration on a stacked (numt, 3) array of (log Nw, log D0, mu).
+Spectra that do not converge are refit one by one with bounded L-BFGS, in
+parallel.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.optimize
+import scipy.special as scifunct
+
+from . import gamma_moments
+
+# Range of the shape parameter. Fits ending on a bound are masked, the counts
+# do not constrain the shape of those spectra.
+MU_BOUNDS = (-3.0, 30.0)
+
+
+def exposure(sampling_area, velocity, sampling_interval, spread):
+    """ Expected number of drops counted per unit concentration in each bin.
+
+    Parameters
+    ----------
+    sampling_area: array_like
+        Effective sampling area of each bin [mm^2].
+    velocity: array_like
+        Fall velocity of each bin [m/s].
+    sampling_interval: float
+        Sampling interval [s].
+    spread: array_like
+        Bin widths [mm].
+
+    Returns
+    -------
+    exposure: array_like
+        Counts per m^-3 mm^-1 of each bin, the inverse of the factor turning
+        counts into Nd in `DropSizeDistribution.calculate_dsd_from_spectrum`.
+    """
+    return (
+        np.asarray(sampling_area) * np.asarray(velocity) * sampling_interval
+        * np.asarray(spread) / 1e6
+    )
+
+
+def log_f(mu):
+    """ Log of the normalization f(mu) of the normalized gamma distribution. """
+    return (
+        np.log(6.0 / 3.67 ** 4)
+        + (mu + 4) * np.log(3.67 + mu)
+        - scifunct.gammaln(mu + 4)
+    )
+
+
+def _dlog_f(mu):
+    """ Derivative of `log_f` with respect to mu. """
+    return np.log(3.67 + mu) + (mu + 4) / (3.67 + mu) - scifunct.digamma(mu + 4)
+
+
+def _log_mean_counts(theta, log_D, D, log_exposure):
+    """ Log of the expected counts, shape (numt, N), for theta = (log Nw, log D0, mu). """
+    log_Nw, log_D0, mu = theta[..., 0:1], theta[..., 1:2], theta[..., 2:3]
+    return (
+        log_Nw
+        + log_f(mu)
+        + mu * (log_D - log_D0)
+        - (3.67 + mu) * D * np.exp(-log_D0)
+        + log_exposure
+    )
+
+
+def _negative_log_likelihood(theta, counts, log_D, D, log_exposure):
+    """ Poisson negative log likelihood of each spectrum, up to a constant. """
+    log_mean = _log_mean_counts(theta, log_D, D, log_exposure)
+    return np.sum(np.exp(log_mean) - counts * log_mean, axis=-1)
+
+
+def _gradient_information(theta, counts, log_D, D, log_exposure):
+    """ Gradient of the negative log likelihood and Fisher information. """
+    log_D0, mu = theta[..., 1:2], theta[..., 2:3]
+    mean = np.exp(_log_mean_counts(theta, log_D, D, log_exposure))
+    x = D * np.exp(-log_D0)
+    derivatives = np.stack(
+        np.broadcast_arrays(
+            np.ones_like(x), -mu + (3.67 + mu) * x, _dlog_f(mu) + np.log(x) - x
+        ),
+        axis=-1,
+    )  # (numt, N, 3)
+    gradient = np.einsum("tn,tnp->tp", mean - counts, derivatives)
+    information = np.einsum("tn,tnp,tnq->tpq", mean, derivatives, derivatives)
+    return gradient, information
+
+
+def _profile_log_Nw(theta, counts, log_D, D, log_exposure):
+    """ Most likely log Nw given D0 and mu, the log of total counts over total mean. """
+    theta = theta.copy()
+    theta[:, 0] = 0.0
+    log_mean = _log_mean_counts(theta, log_D, D, log_exposure)
+    theta[:, 0] = np.log(np.sum(counts, axis=1)) - scifunct.logsumexp(log_mean, axis=1)
+    return theta
+
+
+def _initial_theta(counts, diameter, spread, bin_exposure):
+    """ Start from the method of moments fit of the counts, or mu = 3. """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Nd = counts / bin_exposure
+        moments = gamma_moments.dsd_moments(
+            np.nan_to_num(Nd), diameter, spread, (2, 3, 4, 6)
+        )
+        _, mu, Lambda = gamma_moments.fit_moments(moments[:, [0, 2, 3]])
+        usable = ~np.ma.getmaskarray(mu) & (mu > MU_BOUNDS[0]) & (mu < 15.0)
+        usable = np.ma.filled(usable, False)
+        mu = np.where(usable, np.ma.filled(mu, 3.0), 3.0)
+        D0 = np.where(
+            usable,
+            np.ma.filled((3.67 + mu) / Lambda, 1.0),
+            moments[:, 2] / moments[:, 1] * (3.67 + mu) / (4 + mu),
+        )
+    return np.column_stack([np.zeros(len(mu)), np.log(D0), mu])
+
+
+def _fit_row(args):
+    """ Bounded L-BFGS fit of one spectrum. Module level so it can be pickled. """
+    theta, counts, log_D, D, log_exposure = args
+
+    def objective(theta):
+        theta = theta[np.newaxis]
+        gradient, _ = _gradient_information(theta, counts, log_D, D, log_exposure)
+        return (
+            _negative_log_likelihood(theta, counts, log_D, D, log_exposure)[0],
+            gradient[0],
+        )
+
+    bounds = [(None, None), (np.log(0.05), np.log(20.0)), MU_BOUNDS]
+    result = scipy.optimize.minimize(
+        objective, theta, jac=True, method="L-BFGS-B", bounds=bounds
+    )
+    return result.x, result.success
+
+
+def poisson_gamma_fit(
+    counts,
+    diameter,
+    spread,
+    bin_exposure,
+    min_drops=10,
+    max_iter=100,
+    tol=1e-6,
+    n_jobs=None,
+):
+    """ Maximum likelihood normalized gamma fit to the drop counts of every spectrum.
+
+    Parameters
+    ----------
+    counts: array_like
+        Number of drops counted in each bin, shape (numt, N). Masked values
+        count as no drops.
+    diameter: array_like
+        Bin center diameters [mm].
+    spread: array_like
+        Bin widths [mm].
+    bin_exposure: array_like
+        Expected counts per unit concentration of each bin, see `exposure`.
+        Bins with no exposure are ignored.
+    min_drops: int, optional
+        Spectra with fewer drops are not fit.
+    max_iter: int, optional
+        Maximum number of vectorized Newton steps.
+    tol: float, optional
+        Convergence tolerance on the Newton steps.
+    n_jobs: int, optional
+        Number of processes refitting spectra the Newton iteration did not
+        converge on. Defaults to the number of CPUs, 1 refits them in this
+        process.
+
+    Returns
+    -------
+    Nw, D0, mu: masked arrays
+        Normalized intercept [m^-3 mm^-1], median volume diameter [mm] and
+        shape of each spectrum, masked where the spectrum has too few drops,
+        the fit did not converge or the shape is on a bound of `MU_BOUNDS`.
+    """
+    counts = np.ma.filled(np.ma.asarray(counts, dtype=float), 0.0)
+    bin_exposure = np.asarray(bin_exposure, dtype=float)
+    used = bin_exposure > 0
+    counts = counts[:, used]
+    D = np.asarray(diameter, dtype=float)[used]
+    log_D = np.log(D)
+    log_exposure = np.log(bin_exposure[used])
+    spread = np.asarray(spread, dtype=float)[used]
+
+    numt = len(counts)
+    fit = np.sum(counts, axis=1) >= max(min_drops, 1)
+    theta = np.full((numt, 3), np.nan)
+    converged = np.zeros(numt, dtype=bool)
+
+    rows = np.flatnonzero(fit)
+    c = counts[rows]
+    t = _initial_theta(c, D, spread, bin_exposure[used])
+    t = _profile_log_Nw(t, c, log_D, D, log_exposure)
+    nll = _negative_log_likelihood(t, c, log_D, D, log_exposure)
+    damping = np.full(len(rows), 1e-3)
+    done = np.zeros(len(rows), dtype=bool)
+    for _ in range(max_iter):
+        active = np.flatnonzero(~done)
+        if len(active) == 0:
+            break
+        a_theta = t[active]
+        a_counts = c[active]
+        gradient, information = _gradient_information(
+            a_theta, a_counts, log_D, D, log_exposure
+        )
+        diagonal = np.einsum("tpp->tp", information)
+        damped = information + (damping[active, np.newaxis] * diagonal)[
+            :, :, np.newaxis
+        ] * np.eye(3)
+        with np.errstate(invalid="ignore", over="ignore"):
+            try:
+                step = -np.linalg.solve(damped, gradient[..., np.newaxis])[..., 0]
+            except np.linalg.LinAlgError:
+                step = -(np.linalg.pinv(damped) @ gradient[..., np.newaxis])[..., 0]
+            new_theta = a_theta + step
+            new_theta[:, 2] = np.clip(new_theta[:, 2], *MU_BOUNDS)
+            new_nll = _negative_log_likelihood(
+                new_theta, a_counts, log_D, D, log_exposure
+            )
+        accept = np.isfinite(new_nll) & (new_nll <= nll[active])
+        accepted = active[accept]
+        t[accepted] = new_theta[accept]
+        nll[accepted] = new_nll[accept]
+        damping[accepted] /= 3.0
+        damping[active[~accept]] *= 4.0
+
+        small = np.all(np.abs(step) < tol, axis=1)
+        converged[rows[active[accept & small]]] = True
+        done[active[accept & small]] = True
+        done[active[~np.isfinite(step).all(axis=1) | (damping[active] > 1e12)]] = True
+
+    theta[rows] = t
+
+    # Refit the spectra the vectorized iteration did not converge on.
+    retry = rows[~converged[rows]]
+    starts = _profile_log_Nw(
+        _initial_theta(counts[retry], D, spread, bin_exposure[used]),
+        counts[retry],
+        log_D,
+        D,
+        log_exposure,
+    )
+    args = [
+        (start, counts[row], log_D, D, log_exposure)
+        for start, row in zip(starts, retry)
+    ]
+    if n_jobs == 1 or len(args) <= 1:
+        refits = [_fit_row(arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            refits = list(executor.map(_fit_row, args))
+    for row, (row_theta, success) in zip(retry, refits):
+        theta[row] = row_theta
+        converged[row] = success
+
+    with np.errstate(invalid="ignore"):
+        on_bound = np.isclose(theta[:, 2], MU_BOUNDS[0]) | np.isclose(
+            theta[:, 2], MU_BOUNDS[1]
+        )
+    mask = ~converged | on_bound
+    return (
+        np.ma.masked_where(mask, np.exp(theta[:, 0])),
+        np.ma.masked_where(mask, np.exp(theta[:, 1])),
+        np.ma.masked_where(mask, theta[:, 2]),
+    )
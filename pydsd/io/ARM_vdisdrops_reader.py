@@ -14,7 +14,7 @@ from ..io import common
 
 
 def read_arm_vdisdrops_netcdf(
-    filename, sampling_interval=60, expand_time_to_full_day=False
+    filename, sampling_interval=60, expand_time_to_full_day=False, dtype=None
 ):
     """
     Takes a filename pointing to an ARM vdisdrops  netcdf file and returns
@@ -36,6 +36,9 @@ def read_arm_vdisdrops_netcdf(
         Sampling interval to collect drops into in seconds. Default 60s
     expand_time_to_full_day: booleans, optional default=False
         Whether to expand object out to cover an entire day. Useful for lining up datasets. 
+    dtype: numpy dtype, optional
+        Store the spectra compactly as float32 or uint16 drop counts, see
+        `DropSizeDistribution.compact`.
 
     Returns
     -------
@@ -47,7 +50,7 @@ def read_arm_vdisdrops_netcdf(
     )
 
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
     else:
         return None
 
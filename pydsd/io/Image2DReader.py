@@ -1,16 +1,19 @@
 # -*- coding: utf-8 -*-
 import os
 
+import hashlib
+from collections import OrderedDict
+
 import netCDF4
 import numpy as np
-import scipy.interpolate as sinterp
+from scipy import sparse
 
 from pydsd.io.common import get_epoch_time
 from . import common
 from ..DropSizeDistribution import DropSizeDistribution
 
 
-def read_ucsc_netcdf(filename):
+def read_ucsc_netcdf(filename, dtype=None):
     """
     Takes a filename pointing to a probe data file and returns
     a drop size distribution object.
@@ -18,6 +21,9 @@ def read_ucsc_netcdf(filename):
     Usage:
     data = read_ucsc_netcdf(filename)
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
@@ -26,13 +32,13 @@ def read_ucsc_netcdf(filename):
     reader = Image2DReader(filename, file_type="ucsc_netcdf")
 
     if reader:
-        dsd = DropSizeDistribution(reader)
+        dsd = DropSizeDistribution(reader, dtype=dtype)
         return dsd
     else:
         return None
 
 
-def read_noaa_aoml_netcdf(filename):
+def read_noaa_aoml_netcdf(filename, dtype=None):
     """
     Takes a filename pointing to a probe data file and returns
     a drop size distribution object.
@@ -40,6 +46,9 @@ def read_noaa_aoml_netcdf(filename):
     Usage:
     data = read_noaa_aoml_netcdf(filename)
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
@@ -48,7 +57,7 @@ def read_noaa_aoml_netcdf(filename):
     reader = Image2DReader(filename, file_type="noaa_aoml_netcdf")
 
     if reader:
-        dsd = DropSizeDistribution(reader)
+        dsd = DropSizeDistribution(reader, dtype=dtype)
 
     return dsd
 
@@ -146,49 +155,27 @@ class Image2DReader(object):
         self.time = get_epoch_time(HHMMSS, t_units)
 
         # Pull in the aircraft variables of interest if desired
-        # Map to imaging probe data
+        # Map to imaging probe data. All requested variables share the same
+        # (flight time, probe time) grids, so the interpolation weights are
+        # built once and applied to every variable with one sparse product.
         if flight_time_dict is not None:
-            if flight_air_density_dict is not None:
-                air_density = np.ma.array(
-                    sinterp.griddata(
-                        flight_time_dict["data"][:],
-                        flight_air_density_dict["data"][:],
-                        Time_unaware[:],
-                    )
-                )
-                self.fields["air_density"] = common.var_to_dict(
-                    "Air Density",
-                    air_density,
-                    flight_air_density_dict["units"],
-                    "Air Density",
+            flight_vars = [
+                ("air_density", "Air Density", flight_air_density_dict),
+                ("vert_wind_velocity", "Vertical Wind Velocity", flight_vert_wind_dict),
+                ("altitude", "Altitude", flight_altitude_dict),
+            ]
+            flight_vars = [var for var in flight_vars if var[2] is not None]
+
+            if flight_vars:
+                remapped = remap_to_grid(
+                    flight_time_dict["data"][:],
+                    HHMMSS[:],
+                    np.column_stack([var[2]["data"][:] for var in flight_vars]),
                 )
-
-            if flight_vert_wind_dict is not None:
-                vert_wind_velocity = np.ma.array(
-                    sinterp.griddata(
-                        flight_time_dict["data"][:],
-                        flight_vert_wind_dict["data"][:],
-                        Time_unaware[:],
+                for idx, (field_name, name, var_dict) in enumerate(flight_vars):
+                    self.fields[field_name] = common.var_to_dict(
+                        name, np.ma.array(remapped[:, idx]), var_dict["units"], name
                     )
-                )
-                self.fields["vert_wind_velocity"] = common.var_to_dict(
-                    "Vertical Wind Velocity",
-                    vert_wind_velocity,
-                    flight_vert_wind_dict["units"],
-                    "Vertical Wind Velocity",
-                )
-
-            if flight_altitude_dict is not None:
-                altitude = np.ma.array(
-                    sinterp.griddata(
-                        flight_time_dict["data"][:],
-                        flight_altitude_dict["data"][:],
-                        Time_unaware[:],
-                    )
-                )
-                self.fields["altitude"] = common.var_to_dict(
-                    "Altitude", altitude, flight_altitude_dict["units"], "Altitude"
-                )
 
     def _read_noaa_aoml_netcdf(
         self,
@@ -266,18 +253,126 @@ class Image2DReader(object):
 
     def apply_running_average(self, array, dim=0, num=6):
         """
+        Block average an array over `num` consecutive points along `dim`.
+
+        The windowed sums are taken from a single cumulative sum along the
+        chosen axis, so the cost is linear in the array size regardless of
+        the number of rows.
+
         Parameters
         ----------
+        array : array_like
+            Array to average.
         num : int
             Number of points for running average
         dim : int
             Dimension to applay the averaging.
+
+        Returns
+        -------
+        array : array_like
+            Averaged array, with every `num`-th window kept along `dim`.
         """
-        weights = np.repeat(1., num) / num
-        if dim == 0:
-            array = np.convolve(array, weights, "valid")[::num]
-        else:
-            tmp = np.empty(array.shape[0], array.shape[1] - num + 1)
-            for index in range(array.shape[0]):
-                tmp[index, :] = np.convolve(array[index, :], weights, "valid")
-            array = tmp[:, ::num]
+        array = np.asanyarray(array, dtype=float)
+        csum = np.cumsum(array, axis=dim)
+        zero_shape = list(csum.shape)
+        zero_shape[dim] = 1
+        csum = np.concatenate((np.zeros(zero_shape), csum), axis=dim)
+
+        n_windows = csum.shape[dim] - num
+        upper = np.take(csum, np.arange(num, num + n_windows), axis=dim)
+        lower = np.take(csum, np.arange(0, n_windows), axis=dim)
+        averaged = (upper - lower) / num
+        return np.take(averaged, np.arange(0, n_windows, num), axis=dim)
+
+
+_INTERPOLATION_WEIGHT_CACHE = OrderedDict()
+_INTERPOLATION_WEIGHT_CACHE_SIZE = 16
+
+
+def _grid_key(grid):
+    """ Hashable key identifying the values of a 1-D grid. """
+    grid = np.ascontiguousarray(np.ma.filled(grid, np.nan), dtype=float)
+    return (grid.shape, hashlib.sha1(grid.tobytes()).hexdigest())
+
+
+def interpolation_weights(source, target):
+    """ Sparse linear interpolation weights from a source grid to a target grid.
+
+    Builds the (len(target), len(source)) matrix W such that W.dot(values)
+    linearly interpolates `values`, sampled on `source`, onto `target`. This
+    matches `scipy.interpolate.griddata(source, values, target)` for 1-D
+    grids, including returning NaN for targets outside of the source range.
+    Weights are cached per (source, target) pair so repeated remapping of
+    variables on the same grids does not rebuild them.
+
+    Parameters
+    ----------
+    source: array_like
+        Grid the values are sampled on. Does not need to be sorted.
+    target: array_like
+        Grid to interpolate the values to.
+
+    Returns
+    -------
+    weights: scipy.sparse.csr_matrix
+        Interpolation weights.
+    outside: np.ndarray
+        Boolean array, True where target lies outside of the source grid.
+    """
+    key = (_grid_key(source), _grid_key(target))
+    if key in _INTERPOLATION_WEIGHT_CACHE:
+        _INTERPOLATION_WEIGHT_CACHE.move_to_end(key)
+        return _INTERPOLATION_WEIGHT_CACHE[key]
+
+    source = np.ma.filled(source, np.nan).astype(float)
+    target = np.ma.filled(target, np.nan).astype(float)
+
+    order = np.argsort(source)
+    sorted_source = source[order]
+
+    right = np.clip(np.searchsorted(sorted_source, target), 1, len(source) - 1)
+    left = right - 1
+    width = sorted_source[right] - sorted_source[left]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        frac = np.where(width > 0, (target - sorted_source[left]) / width, 0.0)
+
+    outside = ~(
+        (target >= sorted_source[0]) & (target <= sorted_source[-1])
+    )
+    rows = np.repeat(np.arange(len(target)), 2)
+    cols = np.column_stack((order[left], order[right])).ravel()
+    vals = np.column_stack((1 - frac, frac))
+    vals[outside] = 0
+    weights = sparse.csr_matrix(
+        (vals.ravel(), (rows, cols)), shape=(len(target), len(source))
+    )
+
+    _INTERPOLATION_WEIGHT_CACHE[key] = (weights, outside)
+    if len(_INTERPOLATION_WEIGHT_CACHE) > _INTERPOLATION_WEIGHT_CACHE_SIZE:
+        _INTERPOLATION_WEIGHT_CACHE.popitem(last=False)
+    return weights, outside
+
+
+def remap_to_grid(source, target, values):
+    """ Linearly interpolate one or more variables from source to target grid.
+
+    Parameters
+    ----------
+    source: array_like
+        Grid the values are sampled on.
+    target: array_like
+        Grid to interpolate the values to.
+    values: array_like
+        Values sampled on `source`. A 2-D array is treated as one variable
+        per column and remapped in a single sparse product.
+
+    Returns
+    -------
+    remapped: np.ndarray
+        Values on the target grid, NaN outside of the source range.
+    """
+    weights, outside = interpolation_weights(source, target)
+    remapped = weights.dot(np.ma.filled(np.asanyarray(values, dtype=float), np.nan))
+    remapped[outside] = np.nan
+    return remapped
@@ -4,9 +4,10 @@ from netCDF4 import num2date, date2num
 
 from ..DropSizeDistribution import DropSizeDistribution
 from . import common
+from .cache import cached_parse
 
 
-def read_jwd(filename):
+def read_jwd(filename, dtype=None):
     """
     Takes a filename pointing to a Joss-WaldVogel file and returns
     a drop size distribution object.
@@ -14,12 +15,15 @@ def read_jwd(filename):
     Usage:
     dsd = read_jwd(filename)
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
     """
     reader = JWDReader(filename)
-    return DropSizeDistribution(reader)
+    return DropSizeDistribution(reader, dtype=dtype)
 
 
 class JWDReader(object):
@@ -88,6 +92,9 @@ class JWDReader(object):
         "Bin size spread of bins",
     )
 
+    _cache_version = 1
+    _cache_attributes = ("time", "Nd", "rain_rate")
+
     def __init__(self, filename):
         self.filename = filename
         self.rain_rate = []
@@ -95,7 +102,7 @@ class JWDReader(object):
         self.Nd = []
         self.time = []
 
-        self._read_file()
+        cached_parse(self, filename, self._read_file)
         self._prep_data()
 
         self.bin_edges = common.var_to_dict(
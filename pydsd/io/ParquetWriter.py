@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar (Apache Parquet) export of the per time fields of
+DropSizeDistribution objects.
+
+Every one dimensional time field (rain rate, D0, Nw, mu, Dm, Zh, Zdr, Kdp...)
+becomes a column, next to the sample time and the station id and location.
+Tables of many stations can be written to one file, so statistics across
+stations can be queried without opening the original files.
+
+pyarrow is an optional dependency and is only imported when used.
+"""
+import itertools
+
+import numpy as np
+
+DEFAULT_ROW_GROUP_SIZE = 131072  # About three months of one minute samples.
+STATION_COLUMNS = ("time", "station", "latitude", "longitude")
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            "pyarrow is required for Parquet export. Install it with `pip install pyarrow`."
+        )
+    return pyarrow
+
+
+def time_fields(dsd):
+    """ Names of the one dimensional time fields of a DropSizeDistribution.
+
+    Parameters
+    ----------
+    dsd: `DropSizeDistribution`
+        DropSizeDistribution object.
+
+    Returns
+    -------
+    names: list
+        Names of the fields with one value per time sample.
+    """
+    return [
+        name
+        for name, field in dsd.fields.items()
+        if np.shape(field["data"]) == (dsd.numt,)
+        and np.asarray(field["data"]).dtype.kind in "fiub"
+        and name not in STATION_COLUMNS
+    ]
+
+
+def dsd_to_table(dsd, station=None, location=None, fields=None):
+    """ Convert the per time fields of a DropSizeDistribution to a pyarrow Table.
+
+    Parameters
+    ----------
+    dsd: `DropSizeDistribution`
+        DropSizeDistribution object.
+    station: str, optional
+        Station id. Defaults to the `site_id` of the DropSizeDistribution info.
+    location: tuple, optional
+        (Latitude, Longitude) of the station in decimal degrees. Defaults to the
+        DropSizeDistribution location when it is set.
+    fields: dict, optional
+        Mapping of field name to NumPy dtype of the columns to write. Fields
+        missing from the DropSizeDistribution are written as nulls. Defaults to
+        every one dimensional time field.
+
+    Returns
+    -------
+    table: `pyarrow.Table`
+        Table with time, station, latitude, longitude and one column per field.
+    """
+    pa = _import_pyarrow()
+    numt = dsd.numt
+
+    if station is None:
+        station = str(dsd.info.get("site_id", ""))
+    if location is None and getattr(dsd, "location", None):
+        location = (dsd.location["latitude"], dsd.location["longitude"])
+    if location is None:
+        location = (np.nan, np.nan)
+    if fields is None:
+        fields = {
+            name: np.asarray(dsd.fields[name]["data"]).dtype for name in time_fields(dsd)
+        }
+
+    epoch_time = np.ma.filled(np.ma.asarray(dsd.time["data"], dtype=float), np.nan)
+    columns = {
+        "time": pa.array(
+            np.round(epoch_time * 1e6).astype("datetime64[us]"),
+            type=pa.timestamp("us", tz="UTC"),
+            mask=np.isnan(epoch_time),
+        ),
+        "station": pa.DictionaryArray.from_arrays(
+            np.zeros(numt, dtype=np.int32), pa.array([station], type=pa.string())
+        ),
+        "latitude": pa.array(np.full(numt, location[0], dtype=np.float64)),
+        "longitude": pa.array(np.full(numt, location[1], dtype=np.float64)),
+    }
+    schema_fields = [
+        pa.field("time", columns["time"].type),
+        pa.field("station", columns["station"].type),
+        pa.field("latitude", pa.float64()),
+        pa.field("longitude", pa.float64()),
+    ]
+
+    for name, dtype in fields.items():
+        dtype = np.dtype(dtype)
+        if name in dsd.fields:
+            field = dsd.fields[name]
+            data = np.ma.asarray(field["data"])
+            values = np.ma.getdata(data).astype(dtype, copy=False)
+            mask = np.ma.getmaskarray(data)
+            if dtype.kind == "f":
+                mask = mask | np.isnan(values)
+            metadata = {
+                key: str(field[key])
+                for key in ("units", "long_name", "standard_name")
+                if key in field
+            }
+        else:
+            values = np.zeros(numt, dtype=dtype)
+            mask = np.ones(numt, dtype=bool)
+            metadata = {}
+        columns[name] = pa.array(values, mask=mask)
+        schema_fields.append(pa.field(name, columns[name].type, metadata=metadata))
+
+    schema = pa.schema(schema_fields, metadata={"source": "Created using PyDSD"})
+    return pa.Table.from_arrays(list(columns.values()), schema=schema)
+
+
+def write_parquet(
+    dsd,
+    filename,
+    station=None,
+    location=None,
+    row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    compression="snappy",
+):
+    """ Write the per time fields of a DropSizeDistribution to a Parquet file.
+
+    Parameters
+    ----------
+    dsd: `DropSizeDistribution`
+        DropSizeDistribution object.
+    filename: str
+        Parquet file to write.
+    station: str, optional
+        Station id. Defaults to the `site_id` of the DropSizeDistribution info.
+    location: tuple, optional
+        (Latitude, Longitude) of the station in decimal degrees.
+    row_group_size: int, optional
+        Maximum number of rows per row group.
+    compression: str, optional
+        Parquet compression codec.
+    """
+    pa = _import_pyarrow()
+    table = dsd_to_table(dsd, station=station, location=location)
+    pa.parquet.write_table(
+        table,
+        filename,
+        row_group_size=row_group_size,
+        compression=compression,
+        use_dictionary=["station"],
+    )
+
+
+def write_parquet_batch(
+    dsds,
+    filename,
+    stations=None,
+    locations=None,
+    fields=None,
+    row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    compression="snappy",
+):
+    """ Write the per time fields of many DropSizeDistributions to one Parquet file.
+
+    DropSizeDistributions are written one after the other, so only one of
+    them needs to be converted at a time. Columns are the union of the time
+    fields of every DropSizeDistribution, fields missing from one of them are
+    written as nulls.
+
+    Parameters
+    ----------
+    dsds: iterable
+        DropSizeDistribution objects to write.
+    filename: str
+        Parquet file to write.
+    stations: iterable, optional
+        Station id of each DropSizeDistribution.
+    locations: iterable, optional
+        (Latitude, Longitude) of each DropSizeDistribution.
+    fields: dict, optional
+        Mapping of field name to NumPy dtype of the columns to write. When not
+        given, `dsds` is read twice to collect the fields, so pass it to
+        stream DropSizeDistributions from a generator.
+    row_group_size: int, optional
+        Maximum number of rows per row group.
+    compression: str, optional
+        Parquet compression codec.
+    """
+    pa = _import_pyarrow()
+    if fields is None:
+        dsds = list(dsds)
+        fields = {}
+        for dsd in dsds:
+            for name in time_fields(dsd):
+                dtype = np.asarray(dsd.fields[name]["data"]).dtype
+                fields[name] = np.result_type(fields.get(name, dtype), dtype)
+    if stations is None:
+        stations = itertools.repeat(None)
+    if locations is None:
+        locations = itertools.repeat(None)
+
+    writer = None
+    try:
+        for dsd, station, location in zip(dsds, stations, locations):
+            table = dsd_to_table(dsd, station=station, location=location, fields=fields)
+            if writer is None:
+                writer = pa.parquet.ParquetWriter(
+                    filename,
+                    table.schema,
+                    compression=compression,
+                    use_dictionary=["station"],
+                )
+            writer.write_table(table, row_group_size=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
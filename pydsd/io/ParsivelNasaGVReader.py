@@ -11,9 +11,12 @@ from ..utility.configuration import Configuration
 
 from ..DropSizeDistribution import DropSizeDistribution
 from . import common
+from .cache import cached_parse
 
 
-def read_parsivel_nasa_gv(filename, campaign="ifloods", skip_header=None):
+def read_parsivel_nasa_gv(
+    filename, campaign="ifloods", skip_header=None, dtype=None
+):
     """
     Parameters
     ----------
@@ -24,6 +27,9 @@ def read_parsivel_nasa_gv(filename, campaign="ifloods", skip_header=None):
         to produce that data.
     skip_header: int
         A number of header lines to skip when reading the file.
+    dtype: numpy dtype, optional
+        Store the spectra compactly as float32 or uint16, see
+        `DropSizeDistribution.compact`.
 
     Takes a filename pointing to a Parsivel NASA Field Campaign file and returns
     a drop size distribution object.
@@ -47,7 +53,7 @@ def read_parsivel_nasa_gv(filename, campaign="ifloods", skip_header=None):
     reader = NASA_APU_reader(filename, campaign, skip_header)
 
     if reader:
-        return DropSizeDistribution(reader)
+        return DropSizeDistribution(reader, dtype=dtype)
 
     else:
         return None
@@ -69,6 +75,9 @@ class NASA_APU_reader(object):
     # mu      = []
     # rho_w = 1
 
+    _cache_version = 1
+    _cache_attributes = ("time", "Nd")
+
     def __init__(self, filename, campaign, skip_header):
         """
         Handles setting up a NASA APU Reader
@@ -82,16 +91,12 @@ class NASA_APU_reader(object):
             print("Campaign type not supported")
             return
 
-        self.f = open(filename, "r")
-        reader = csv.reader(self.f)
-
-        if skip_header is not None:
-            next(reader, None)
-
-        for row in reader:
-            self.time.append(self._parse_time(list(map(int, (row[0].split()[0:4])))))
-            self.Nd.append([float(x) for x in row[0].split()[4:]])
-
+        cached_parse(
+            self,
+            filename,
+            lambda: self._read_file(filename, skip_header),
+            options=(campaign, skip_header),
+        )
         self._prep_data()
 
         self.bin_edges = self.config.fill_in_metadata(
@@ -100,7 +105,19 @@ class NASA_APU_reader(object):
         )
         self.time["data"] = np.ma.array(self._datetime_to_epoch_time(self.time["data"]))
 
-        self.f.close()
+    def _read_file(self, filename, skip_header):
+        """ Parse the text file into the time and Nd lists. """
+        with open(filename, "r") as f:
+            reader = csv.reader(f)
+
+            if skip_header is not None:
+                next(reader, None)
+
+            for row in reader:
+                self.time.append(
+                    self._parse_time(list(map(int, (row[0].split()[0:4]))))
+                )
+                self.Nd.append([float(x) for x in row[0].split()[4:]])
 
     def _prep_data(self):
         self.fields = {}
@@ -6,9 +6,10 @@ from datetime import datetime, timedelta
 
 from ..DropSizeDistribution import DropSizeDistribution
 from . import common
+from .cache import cached_parse
 
 
-def read_parsivel(filename):
+def read_parsivel(filename, dtype=None):
     """
     Takes a filename pointing to a parsivel raw file and returns
     a drop size distribution object.
@@ -16,12 +17,15 @@ def read_parsivel(filename):
     Usage:
     dsd = read_parsivel(filename)
 
+    Pass dtype="float32" or "uint16" to store the spectra compactly, see
+    `DropSizeDistribution.compact`.
+
     Returns:
     DropSizeDistrometer object
 
     """
     reader = ParsivelReader(filename)
-    dsd = DropSizeDistribution(reader)
+    dsd = DropSizeDistribution(reader, dtype=dtype)
     return dsd
 
 
@@ -33,6 +37,18 @@ class ParsivelReader(object):
 
     """
 
+    _cache_version = 1
+    _cache_attributes = (
+        "rain_rate",
+        "Z",
+        "num_particles",
+        "_base_time",
+        "nd",
+        "vd",
+        "raw",
+        "time",
+    )
+
     def __init__(self, filename):
         self.filename = filename
         self.rain_rate = []
@@ -50,7 +66,7 @@ class ParsivelReader(object):
 
         self.pcm = np.reshape(self.pcm_matrix, (32, 32))
 
-        self._read_file()
+        cached_parse(self, filename, self._read_file)
         self._prep_data()
 
         self.bin_edges = np.hstack(
@@ -168,7 +184,7 @@ class ParsivelReader(object):
         """
         time_unaware = np.array(
             [
-                self._base_time[i] + timedelta(seconds=self.time[i])
+                self._base_time[i] + timedelta(seconds=int(self.time[i]))
                 for i in range(0, len(self.time))
             ]
         )
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Conversion between DropSizeDistribution objects and xarray Datasets.
+
+The conversion wraps the NumPy buffers already held by the
+DropSizeDistribution rather than copying them, so converting a large record
+does not double its memory footprint. Masked arrays are split into their data
+and a separate boolean mask variable (or optionally filled with NaN).
+
+xarray is an optional dependency and is only imported when used.
+"""
+
+import numpy as np
+
+from ..DropSizeDistribution import DropSizeDistribution
+from ..utility.configuration import Configuration
+from . import common
+
+MASK_SUFFIX = "_mask"
+
+
+def _import_xarray():
+    try:
+        import xarray
+    except ImportError:
+        raise ImportError(
+            "xarray is required for xarray conversion. Install it with `pip install xarray`."
+        )
+    return xarray
+
+
+def _unmasked_data(data):
+    """ Underlying data buffer of a (possibly masked) array, without copying."""
+    if isinstance(data, np.ndarray):
+        return np.ma.getdata(data)
+    return np.asarray(data)
+
+
+def _field_attrs(name, field, config):
+    """ Field metadata, completed from the package metadata configuration."""
+    attrs = {}
+    if name in config.metadata:
+        attrs.update(config.metadata[name])
+    attrs.update({key: value for key, value in field.items() if key != "data"})
+    return attrs
+
+
+def _to_variable(name, data, dims, attrs, masked, variables):
+    """ Add a variable (and its mask when needed) to the variables dictionary."""
+    if np.ma.is_masked(data):
+        if masked == "nan":
+            values = np.ma.filled(np.ma.asarray(data).astype(float), np.nan)
+        else:
+            values = np.ma.getdata(data)
+            mask = np.ma.getmaskarray(data)
+            attrs = dict(attrs, ancillary_variables=name + MASK_SUFFIX)
+            variables[name + MASK_SUFFIX] = (
+                dims,
+                mask,
+                {"long_name": "Mask for " + name, "flag_meanings": "masked"},
+            )
+    else:
+        values = _unmasked_data(data)
+    variables[name] = (dims, values, attrs)
+
+
+def dsd_to_xarray(dsd, masked="mask", chunks=None):
+    """ Convert a DropSizeDistribution to an xarray Dataset.
+
+    The Dataset variables share memory with the DropSizeDistribution arrays
+    where possible. Per time fields get a `time` dimension, per bin fields a
+    `diameter` dimension, and the drop spectrum `(time, velocity, diameter)`.
+
+    Parameters
+    ----------
+    dsd: `DropSizeDistribution`
+        DropSizeDistribution object to convert.
+    masked: str, optional
+        How to represent masked values. 'mask' (default) stores the mask as a
+        separate boolean variable named `<field>_mask` and keeps the data buffer
+        as is. 'nan' fills masked values with NaN, which copies masked fields.
+    chunks: dict, optional
+        If given, the Dataset is chunked with dask using these chunk sizes.
+
+    Returns
+    -------
+    ds: `xarray.Dataset`
+        Dataset holding the DropSizeDistribution.
+    """
+    xr = _import_xarray()
+    if masked not in ("mask", "nan"):
+        raise ValueError("masked must be one of 'mask' or 'nan'")
+
+    config = Configuration()
+    numt = dsd.numt
+    num_diameter = len(dsd.diameter["data"])
+    spectrum_velocity = getattr(dsd, "spectrum_fall_velocity", None)
+    num_velocity = len(spectrum_velocity["data"]) if spectrum_velocity else None
+
+    coords = {
+        "time": (
+            "time",
+            _unmasked_data(dsd.time["data"]),
+            _field_attrs("time", dsd.time, config),
+        ),
+        "diameter": (
+            "diameter",
+            _unmasked_data(dsd.diameter["data"]),
+            _field_attrs("diameter", dsd.diameter, config),
+        ),
+    }
+    if spectrum_velocity:
+        coords["velocity"] = (
+            "velocity",
+            _unmasked_data(spectrum_velocity["data"]),
+            _field_attrs("spectrum_fall_velocity", spectrum_velocity, config),
+        )
+
+    variables = {}
+    _to_variable(
+        "spread",
+        dsd.spread["data"],
+        ("diameter",),
+        _field_attrs("spread", dsd.spread, config),
+        masked,
+        variables,
+    )
+    if dsd.bin_edges is not None:
+        _to_variable(
+            "bin_edges",
+            dsd.bin_edges["data"],
+            ("bin_edge",),
+            _field_attrs("bin_edges", dsd.bin_edges, config),
+            masked,
+            variables,
+        )
+    if dsd.velocity is not None and "terminal_velocity" not in dsd.fields:
+        _to_variable(
+            "terminal_velocity",
+            dsd.velocity["data"],
+            ("diameter",),
+            _field_attrs("velocity", dsd.velocity, config),
+            masked,
+            variables,
+        )
+    if dsd.effective_sampling_area is not None:
+        _to_variable(
+            "effective_sampling_area",
+            dsd.effective_sampling_area["data"],
+            ("diameter",),
+            _field_attrs("effective_sampling_area", dsd.effective_sampling_area, config),
+            masked,
+            variables,
+        )
+
+    for name, field in dsd.fields.items():
+        dims = common.field_dimensions(
+            name,
+            field["data"],
+            numt,
+            num_diameter,
+            num_velocity,
+            bin_fields=dsd._bin_fields,
+        )
+        _to_variable(
+            name,
+            field["data"],
+            dims,
+            _field_attrs(name, field, config),
+            masked,
+            variables,
+        )
+
+    attrs = dict(dsd.info)
+    attrs["source"] = "Created using PyDSD"
+    ds = xr.Dataset(variables, coords=coords, attrs=attrs)
+
+    if chunks is not None:
+        ds = ds.chunk(chunks)
+    return ds
+
+
+class XarrayReader(object):
+    """
+    Reader style wrapper exposing an xarray Dataset written by `dsd_to_xarray`
+    with the attributes DropSizeDistribution expects from a reader.
+
+    Use the xarray_to_dsd() function to interface with this.
+    """
+
+    reserved_variables = (
+        "spread",
+        "bin_edges",
+        "terminal_velocity",
+        "effective_sampling_area",
+    )
+
+    def __init__(self, ds):
+        self.fields = {}
+        self.info = {
+            key: value for key, value in ds.attrs.items() if key != "source"
+        }
+
+        self.time = self._to_dict(ds, "time")
+        self.diameter = self._to_dict(ds, "diameter")
+        self.spread = self._to_dict(ds, "spread")
+        if "bin_edges" in ds:
+            self.bin_edges = self._to_dict(ds, "bin_edges")
+        if "velocity" in ds.coords:
+            self.spectrum_fall_velocity = self._to_dict(ds, "velocity")
+        if "effective_sampling_area" in ds:
+            self.effective_sampling_area = self._to_dict(
+                ds, "effective_sampling_area"
+            )
+        if "terminal_velocity" in ds:
+            self.fields["terminal_velocity"] = self._to_dict(ds, "terminal_velocity")
+
+        for name in ds.data_vars:
+            if name in self.reserved_variables or name.endswith(MASK_SUFFIX):
+                continue
+            self.fields[name] = self._to_dict(ds, name)
+
+    def _to_dict(self, ds, name):
+        """ Field dictionary for a Dataset variable, restoring its mask."""
+        variable = ds[name]
+        field = {
+            key: value
+            for key, value in variable.attrs.items()
+            if key != "ancillary_variables"
+        }
+        values = variable.values
+        if name + MASK_SUFFIX in ds:
+            field["data"] = np.ma.masked_array(
+                values, mask=ds[name + MASK_SUFFIX].values, copy=False
+            )
+        elif name in ("time", "diameter", "velocity"):
+            field["data"] = values
+        else:
+            field["data"] = np.ma.masked_array(values, copy=False)
+        return field
+
+
+def xarray_to_dsd(ds):
+    """ Convert an xarray Dataset written by `dsd_to_xarray` to a DropSizeDistribution.
+
+    NumPy backed variables are wrapped without copying. Dask backed variables
+    are computed.
+
+    Parameters
+    ----------
+    ds: `xarray.Dataset`
+        Dataset to convert.
+
+    Returns
+    -------
+    dsd: `DropSizeDistribution`
+        DropSizeDistribution object.
+    """
+    return DropSizeDistribution.from_xarray(ds)
@@ -0,0 +1,530 @@
+# -*- coding: utf-8 -*-
+"""
+Chunked directory store for DropSizeDistribution objects.
+
+The store uses the Zarr (version 2) directory layout, so it can be opened with
+zarr or xarray.open_zarr, but reading and writing it only needs NumPy and the
+standard library. Every variable is split into chunks along time and each
+chunk is compressed on its own, so a time range can be read without touching
+the rest of an archive, and new records can be appended to an existing store.
+
+Usage:
+    write_zarr(dsd, "archive.zarr")
+    write_zarr(dsd_next_day, "archive.zarr", mode="a")
+    dsd = read_zarr("archive.zarr", start=start_time, end=end_time)
+
+"""
+import datetime
+import json
+import os
+import shutil
+import warnings
+import zlib
+
+import numpy as np
+from netCDF4 import date2num
+
+from ..DropSizeDistribution import DropSizeDistribution
+from . import common
+
+ZARR_FORMAT = 2
+DEFAULT_TIME_CHUNK = 1440  # One day of one minute samples.
+DEFAULT_COMPRESSION_LEVEL = 5
+INTEGER_FILL_VALUE = -9999
+BOOL_FILL_VALUE = -1
+
+
+def write_zarr(
+    dsd, path, mode="w", time_chunk=DEFAULT_TIME_CHUNK, compression=None
+):
+    """ Write DropSizeDistribution to a chunked directory store.
+
+    Writes the time, bin and velocity coordinates, `Nd`, `drop_spectrum` and
+    every other field of the DropSizeDistribution (scattered radar fields,
+    DSD parameters, rain rate...). Masked values are stored as the variable
+    fill value.
+
+    Parameters
+    ----------
+    dsd: `DropSizeDistribution`
+        DropSizeDistribution object.
+    path: str
+        Directory of the store.
+    mode: str, optional
+        'w' to create the store, replacing any existing store at `path`, or
+        'a' to append the DropSizeDistribution to an existing store along time.
+        Appending to a missing store creates it.
+    time_chunk: int, optional
+        Number of time samples per chunk. Defaults to one day of minutes.
+    compression: dict, optional
+        Mapping of variable name to zlib compression level (0-9), or None to
+        store the variable uncompressed. Variables not listed use level 5.
+    """
+    if mode not in ("w", "a"):
+        raise ValueError("mode must be one of 'w' or 'a'")
+    if time_chunk < 1:
+        raise ValueError("time_chunk must be a positive integer")
+    if compression is None:
+        compression = {}
+
+    if mode == "a" and os.path.isfile(os.path.join(path, ".zgroup")):
+        store = ZarrStore(path)
+        offset = store.numt
+        _check_append(store, dsd)
+    else:
+        _create_group(path, dsd.info)
+        store = None
+        offset = 0
+
+    for name, (dims, data, attrs) in _dsd_variables(dsd).items():
+        array_dir = os.path.join(path, name)
+        if store is not None and name in store.variables:
+            array = store.variables[name]
+            if "time" not in array.dims:
+                continue
+            meta = array.meta
+            meta["shape"][0] = offset + data.shape[0]
+        else:
+            level = compression.get(name, DEFAULT_COMPRESSION_LEVEL)
+            meta = _array_meta(dims, data, offset, time_chunk, level)
+            os.makedirs(array_dir)
+            _write_json(
+                os.path.join(array_dir, ".zattrs"), _attrs(attrs, dims, data.dtype)
+            )
+        _write_region(array_dir, meta, data, offset if "time" in dims else 0)
+        _write_json(os.path.join(array_dir, ".zarray"), meta)
+
+    if store is not None:
+        # Variables missing from the appended record read back as fill values.
+        numt = offset + dsd.numt
+        for array in store.variables.values():
+            if "time" in array.dims and array.shape[0] < numt:
+                meta = array.meta
+                meta["shape"][0] = numt
+                _write_json(os.path.join(array.path, ".zarray"), meta)
+
+
+def read_zarr(path, start=None, end=None, dtype=None):
+    """ Read a DropSizeDistribution from a chunked directory store.
+
+    Only the chunks overlapping the requested time range are read.
+
+    Parameters
+    ----------
+    path: str
+        Directory of the store.
+    start: float or datetime, optional
+        First time to read, in epoch seconds or as a datetime. Defaults to the
+        start of the store.
+    end: float or datetime, optional
+        Last time to read (inclusive). Defaults to the end of the store.
+    dtype: numpy dtype, optional
+        Store the spectra compactly as float32 or uint16, see
+        `DropSizeDistribution.compact`.
+
+    Returns
+    -------
+    dsd: `DropSizeDistribution`
+        DropSizeDistribution object.
+    """
+    return ZarrStore(path).to_dsd(start, end, dtype)
+
+
+class ZarrArray(object):
+    """
+    Lazily read array of a chunked directory store. Data is only read from
+    disk when rows are requested, one chunk at a time.
+
+    Attributes
+    ----------
+    path: str
+        Directory of the array.
+    meta: dict
+        Array metadata (.zarray).
+    attrs: dict
+        Array attributes, without the dimension names.
+    dims: tuple
+        Dimension names of the array.
+    is_bool: bool
+        Whether the array holds booleans, stored as int8 0 and 1 with a fill
+        value of -1.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = _read_json(os.path.join(path, ".zarray"))
+        self.attrs = _read_json(os.path.join(path, ".zattrs"))
+        self.dims = tuple(self.attrs.pop("_ARRAY_DIMENSIONS"))
+        self.is_bool = self.attrs.pop("dtype", None) == "bool"
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.fill_value = _decode_fill_value(self.meta["fill_value"], self.dtype)
+
+    @property
+    def shape(self):
+        return tuple(self.meta["shape"])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice) and key.step in (None, 1):
+            start, stop, _ = key.indices(len(self))
+            return self.read(start, stop)
+        return self.read()[key]
+
+    def read(self, start=0, stop=None):
+        """ Read rows [start, stop) of the array as a masked array. """
+        if stop is None:
+            stop = len(self)
+        stop = max(start, stop)
+        data = np.empty((stop - start,) + self.shape[1:], dtype=self.dtype)
+        chunk_size = self.meta["chunks"][0]
+        for index in range(start // chunk_size, -(-stop // chunk_size)):
+            chunk_start = index * chunk_size
+            lo = max(start, chunk_start)
+            hi = min(stop, chunk_start + chunk_size)
+            chunk = _read_chunk(self.path, self.meta, index, self.fill_value)
+            data[lo - start : hi - start] = chunk[lo - chunk_start : hi - chunk_start]
+
+        if self.dtype.kind == "f" and np.isnan(self.fill_value):
+            return np.ma.masked_invalid(data, copy=False)
+        data = np.ma.masked_equal(data, self.fill_value, copy=False)
+        if self.is_bool:
+            return data.astype(bool)
+        return data
+
+
+class ZarrStore(object):
+    """
+    Chunked directory store opened for reading. Opening the store only reads
+    the metadata, variables are read on access.
+
+    Attributes
+    ----------
+    path: str
+        Directory of the store.
+    attrs: dict
+        Global attributes of the store.
+    variables: dict
+        Mapping of variable name to `ZarrArray`.
+    """
+
+    def __init__(self, path):
+        if not os.path.isfile(os.path.join(path, ".zgroup")):
+            raise ValueError("{} is not a chunked directory store".format(path))
+        self.path = path
+        self.attrs = _read_json(os.path.join(path, ".zattrs"))
+        self.variables = {}
+        for name in sorted(os.listdir(path)):
+            if os.path.isfile(os.path.join(path, name, ".zarray")):
+                self.variables[name] = ZarrArray(os.path.join(path, name))
+
+    @property
+    def numt(self):
+        return len(self.variables["time"])
+
+    def time_slice(self, start=None, end=None):
+        """ Slice of the time indices between start and end (inclusive).
+
+        Parameters
+        ----------
+        start: float or datetime, optional
+            First time, in epoch seconds or as a datetime.
+        end: float or datetime, optional
+            Last time, in epoch seconds or as a datetime.
+
+        Returns
+        -------
+        time_slice: slice
+            Slice along the time dimension.
+        """
+        time = self.variables["time"].read().filled(np.nan)
+        first = 0 if start is None else np.searchsorted(time, _epoch(start), "left")
+        last = len(time) if end is None else np.searchsorted(time, _epoch(end), "right")
+        return slice(int(first), int(last))
+
+    def to_dsd(self, start=None, end=None, dtype=None):
+        """ Read the time range [start, end] into a DropSizeDistribution. """
+        return DropSizeDistribution(
+            ZarrReader(self, self.time_slice(start, end)), dtype=dtype
+        )
+
+
+class ZarrReader(object):
+    """
+    Reader style view of a `ZarrStore` time range, with the attributes
+    DropSizeDistribution expects from a reader. Use read_zarr() to interface
+    with this.
+    """
+
+    reserved_variables = (
+        "time",
+        "diameter",
+        "spread",
+        "bin_edges",
+        "velocity",
+        "effective_sampling_area",
+    )
+
+    def __init__(self, store, time_slice=slice(None)):
+        self.info = {
+            key: value for key, value in store.attrs.items() if key != "source"
+        }
+        self.fields = {}
+
+        for name, array in store.variables.items():
+            if "time" in array.dims:
+                data = array[time_slice]
+            else:
+                data = array.read()
+            field = dict(array.attrs)
+            field["data"] = data
+
+            if name == "velocity":
+                self.spectrum_fall_velocity = field
+            elif name in self.reserved_variables:
+                setattr(self, name, field)
+            else:
+                self.fields[name] = field
+
+
+def _dsd_variables(dsd):
+    """ Mapping of variable name to (dims, data, attrs) for a DropSizeDistribution. """
+    numt = dsd.numt
+    num_diameter = len(dsd.diameter["data"])
+    spectrum_velocity = getattr(dsd, "spectrum_fall_velocity", None)
+    num_velocity = len(spectrum_velocity["data"]) if spectrum_velocity else None
+
+    variables = {
+        "time": (("time",), _time_data(dsd.time["data"]), dsd.time),
+        "diameter": (("diameter",), dsd.diameter["data"], dsd.diameter),
+        "spread": (("diameter",), dsd.spread["data"], dsd.spread),
+    }
+    if dsd.bin_edges is not None:
+        variables["bin_edges"] = (("bin_edge",), dsd.bin_edges["data"], dsd.bin_edges)
+    if spectrum_velocity:
+        variables["velocity"] = (
+            ("velocity",),
+            spectrum_velocity["data"],
+            spectrum_velocity,
+        )
+    if dsd.effective_sampling_area is not None:
+        variables["effective_sampling_area"] = (
+            ("diameter",),
+            dsd.effective_sampling_area["data"],
+            dsd.effective_sampling_area,
+        )
+    if dsd.velocity is not None and "terminal_velocity" not in dsd.fields:
+        variables["terminal_velocity"] = (
+            ("diameter",),
+            dsd.velocity["data"],
+            dsd.velocity,
+        )
+
+    for name, field in dsd.fields.items():
+        dims = common.field_dimensions(
+            name,
+            field["data"],
+            numt,
+            num_diameter,
+            num_velocity,
+            bin_fields=dsd._bin_fields,
+        )
+        variables[name] = (dims, field["data"], field)
+
+    storable = {}
+    for name, (dims, data, attrs) in variables.items():
+        data = _storable(name, data)
+        if data is not None:
+            storable[name] = (dims, data, attrs)
+    return storable
+
+
+def _time_data(time):
+    """ Time as float epoch seconds. """
+    time = np.ma.asarray(time)
+    if time.dtype == object:
+        return np.ma.asarray(date2num(list(time), common.EPOCH_UNITS), dtype=float)
+    return time.astype(float)
+
+
+def _storable(name, data):
+    """ Data as an (at least 1-D) array with a storable dtype, or None. """
+    data = np.ma.atleast_1d(np.ma.asarray(data))
+    if data.dtype.kind in "fiub":
+        return data
+    try:
+        return data.astype(float)
+    except (TypeError, ValueError):
+        warnings.warn(
+            "Skipping {}, its values can not be stored as numbers.".format(name)
+        )
+        return None
+
+
+def _fill_value(dtype):
+    if dtype.kind == "f":
+        return np.nan
+    return INTEGER_FILL_VALUE
+
+
+def _encode_fill_value(fill_value):
+    if isinstance(fill_value, float) and np.isnan(fill_value):
+        return "NaN"
+    return fill_value
+
+
+def _decode_fill_value(fill_value, dtype):
+    if fill_value is None:
+        return _fill_value(dtype)
+    if fill_value == "NaN":
+        return np.nan
+    return dtype.type(fill_value)
+
+
+def _array_meta(dims, data, offset, time_chunk, level):
+    """ .zarray metadata for a new array holding data from `offset` onwards. """
+    dtype = data.dtype
+    if dtype.kind == "b":
+        # Stored as int8 so masked values get a fill value distinct from False.
+        dtype = np.dtype(np.int8)
+        fill_value = BOOL_FILL_VALUE
+    else:
+        if np.ma.is_masked(data) and dtype.kind in "iu":
+            dtype = np.dtype(float)  # Masked integers need a fill value.
+        fill_value = _fill_value(dtype)
+    shape = list(data.shape)
+    if "time" in dims:
+        shape[0] += offset
+        chunks = [time_chunk] + list(data.shape[1:])
+    else:
+        chunks = list(data.shape)
+    return {
+        "zarr_format": ZARR_FORMAT,
+        "shape": shape,
+        "chunks": [max(1, size) for size in chunks],
+        "dtype": dtype.str,
+        "fill_value": _encode_fill_value(fill_value),
+        "order": "C",
+        "compressor": None if level is None else {"id": "zlib", "level": level},
+        "filters": None,
+        "dimension_separator": ".",
+    }
+
+
+def _chunk_filename(array_dir, meta, index):
+    key = ".".join([str(index)] + ["0"] * (len(meta["chunks"]) - 1))
+    return os.path.join(array_dir, key)
+
+
+def _read_chunk(array_dir, meta, index, fill_value):
+    """ Full (padded) chunk `index` along the first axis. Missing chunks are fill values. """
+    filename = _chunk_filename(array_dir, meta, index)
+    dtype = np.dtype(meta["dtype"])
+    if not os.path.isfile(filename):
+        return np.full(meta["chunks"], fill_value, dtype=dtype)
+    with open(filename, "rb") as f:
+        buf = f.read()
+    if meta["compressor"] is not None:
+        buf = zlib.decompress(buf)
+    return np.frombuffer(buf, dtype=dtype).reshape(meta["chunks"])
+
+
+def _write_region(array_dir, meta, data, offset):
+    """ Write `data` to the array along the first axis, starting at row `offset`. """
+    dtype = np.dtype(meta["dtype"])
+    fill_value = _decode_fill_value(meta["fill_value"], dtype)
+    data = np.ma.filled(data.astype(dtype), fill_value)
+    chunk_size = meta["chunks"][0]
+    stop = offset + data.shape[0]
+
+    for index in range(offset // chunk_size, -(-stop // chunk_size)):
+        chunk_start = index * chunk_size
+        lo = max(offset, chunk_start)
+        hi = min(stop, chunk_start + chunk_size)
+        if hi - lo == chunk_size:
+            chunk = np.ascontiguousarray(data[lo - offset : hi - offset])
+        else:  # Partial chunk, keep rows already written by earlier appends.
+            chunk = _read_chunk(array_dir, meta, index, fill_value).copy()
+            chunk[lo - chunk_start : hi - chunk_start] = data[lo - offset : hi - offset]
+        buf = chunk.tobytes()
+        if meta["compressor"] is not None:
+            buf = zlib.compress(buf, meta["compressor"]["level"])
+        with open(_chunk_filename(array_dir, meta, index), "wb") as f:
+            f.write(buf)
+
+
+def _check_append(store, dsd):
+    """ Check a DropSizeDistribution can be appended to a store. """
+    for name in ("diameter", "velocity"):
+        if name not in store.variables:
+            continue
+        field = dsd.diameter if name == "diameter" else getattr(
+            dsd, "spectrum_fall_velocity", None
+        )
+        if field is None or not np.allclose(
+            store.variables[name].read().filled(np.nan), field["data"]
+        ):
+            raise ValueError(
+                "Can not append, {} bins do not match the store.".format(name)
+            )
+    time = store.variables["time"].read()
+    new_time = _time_data(dsd.time["data"])
+    if store.numt and dsd.numt and new_time[0] <= time[-1]:
+        raise ValueError("Can not append, times must be after the end of the store.")
+
+
+def _create_group(path, info):
+    if os.path.isdir(path) and os.listdir(path):
+        if not os.path.isfile(os.path.join(path, ".zgroup")):
+            raise ValueError(
+                "{} exists and is not a chunked directory store".format(path)
+            )
+        shutil.rmtree(path)
+    os.makedirs(path, exist_ok=True)
+    _write_json(os.path.join(path, ".zgroup"), {"zarr_format": ZARR_FORMAT})
+    attrs = dict(info)
+    attrs["source"] = "Created using PyDSD"
+    _write_json(os.path.join(path, ".zattrs"), _json_safe(attrs))
+
+
+def _attrs(field, dims, dtype):
+    attrs = {key: value for key, value in field.items() if key != "data"}
+    attrs = _json_safe(attrs)
+    attrs["_ARRAY_DIMENSIONS"] = list(dims)
+    if dtype.kind == "b":
+        attrs["dtype"] = "bool"  # xarray convention for booleans stored as int8
+    return attrs
+
+
+def _json_safe(attrs):
+    """ Attributes with NumPy values converted to JSON types. """
+    safe = {}
+    for key, value in attrs.items():
+        if isinstance(value, (np.ndarray, np.generic)):
+            value = value.tolist()
+        try:
+            json.dumps(value, allow_nan=False)
+        except (TypeError, ValueError):
+            value = str(value)
+        safe[key] = value
+    return safe
+
+
+def _epoch(time):
+    """ Time in epoch seconds. """
+    if isinstance(time, datetime.datetime):
+        return date2num(time, common.EPOCH_UNITS)
+    return float(time)
+
+
+def _read_json(filename):
+    if not os.path.isfile(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def _write_json(filename, content):
+    with open(filename, "w") as f:
+        json.dump(content, f, indent=4, sort_keys=True, allow_nan=False)
@@ -9,4 +9,9 @@ from .Image2DReader import read_ucsc_netcdf
 from .JWDReader import read_jwd
 from .NetCDFWriter import write_netcdf
 from .ParsivelNasaGVReader import read_parsivel_nasa_gv
-from .ParsivelReader import read_parsivel
\ No newline at end of file
+from .ParsivelReader import read_parsivel
+
+from .XarrayConverter import dsd_to_xarray, xarray_to_dsd
+from .ParquetWriter import write_parquet, write_parquet_batch
+from .ZarrStore import write_zarr, read_zarr
+from .cache import enable_reader_cache, disable_reader_cache
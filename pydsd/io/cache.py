@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in on disk cache of the arrays parsed out of text based disdrometer files.
+
+Text readers spend most of their time tokenizing ASCII. When the cache is
+enabled the arrays each reader builds while parsing are stored as individual
+.npy files, keyed by the source file path, size, modification time and the
+reader version. Later reads of an unchanged file memory map those arrays
+instead of parsing the text again. The cache saves the parsing time, not
+memory: readers still build their (masked) fields from the mapped arrays,
+which copies them.
+
+Usage:
+    from pydsd.io import cache
+    cache.enable_reader_cache("/data/pydsd_cache", max_size=10 * 1024 ** 3)
+    dsd = pydsd.read_parsivel(filename)  # Parsed and stored
+    dsd = pydsd.read_parsivel(filename)  # Loaded from the cache
+
+"""
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pydsd")
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+MANIFEST_FILENAME = "manifest.json"
+
+_reader_cache = None
+
+
+class ReaderCache(object):
+    """
+    Size bounded directory of parsed reader arrays.
+
+    Each entry is a directory named after the entry key, holding one .npy
+    file per array and a manifest. Entries are evicted least recently used
+    first once the total size goes over `max_size`.
+
+    Attributes
+    ----------
+    cache_dir: str
+        Directory the entries are stored in.
+    max_size: int
+        Maximum total size of the cache in bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, filename, reader_name, reader_version, options=()):
+        """ Cache key for a file as parsed by a given reader.
+
+        Parameters
+        ----------
+        filename: str
+            Path to the raw file.
+        reader_name: str
+            Name of the reader class parsing the file.
+        reader_version: int
+            Version of the reader parsing code. Bump to invalidate old entries.
+        options: tuple
+            Any reader options that change how the file is parsed.
+
+        Returns
+        -------
+        key: str
+            Hex digest identifying the entry.
+        """
+        stat = os.stat(filename)
+        description = [
+            os.path.abspath(filename),
+            stat.st_size,
+            stat.st_mtime_ns,
+            reader_name,
+            reader_version,
+            [str(option) for option in options],
+        ]
+        return hashlib.sha1(json.dumps(description).encode("utf-8")).hexdigest()
+
+    def load(self, filename, reader_name, reader_version, options=()):
+        """ Load the cached arrays for a file, or None if it is not cached.
+
+        Arrays are memory mapped copy-on-write, so they can be modified in
+        memory without touching the cache. Readers copy them when building
+        their fields.
+        """
+        entry_dir = os.path.join(
+            self.cache_dir, self.key(filename, reader_name, reader_version, options)
+        )
+        manifest_file = os.path.join(entry_dir, MANIFEST_FILENAME)
+        try:
+            with open(manifest_file) as f:
+                manifest = json.load(f)
+            arrays = {}
+            for name, kind in manifest["arrays"].items():
+                array = np.load(os.path.join(entry_dir, name + ".npy"), mmap_mode="c")
+                if kind == "datetime":
+                    array = array.astype(datetime.datetime)
+                arrays[name] = array
+        except (OSError, ValueError, KeyError):
+            return None
+
+        os.utime(manifest_file)  # Mark as recently used for eviction.
+        return arrays
+
+    def store(self, filename, reader_name, reader_version, arrays, options=()):
+        """ Store the parsed arrays for a file.
+
+        Values that can not be represented as a fixed size array (ragged
+        lists for instance) are not cached, and the entry is skipped.
+
+        Returns
+        -------
+        stored: bool
+            Whether the entry was written.
+        """
+        storable = {}
+        manifest = {"filename": os.path.abspath(filename), "arrays": {}}
+        for name, value in arrays.items():
+            try:
+                array = np.asarray(value)
+            except ValueError:  # Ragged sequences
+                return False
+            kind = "array"
+            if array.dtype == object:
+                try:
+                    array = array.astype("datetime64[us]")
+                except (TypeError, ValueError):
+                    return False
+                kind = "datetime"
+            storable[name] = array
+            manifest["arrays"][name] = kind
+
+        key = self.key(filename, reader_name, reader_version, options)
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            for name, array in storable.items():
+                np.save(os.path.join(tmp_dir, name + ".npy"), array)
+            with open(os.path.join(tmp_dir, MANIFEST_FILENAME), "w") as f:
+                json.dump(manifest, f)
+            entry_dir = os.path.join(self.cache_dir, key)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+
+        self.evict()
+        return True
+
+    def entries(self):
+        """ List of (last_used, size, path) for every entry in the cache. """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            manifest_file = os.path.join(entry_dir, MANIFEST_FILENAME)
+            if name.startswith(".") or not os.path.isfile(manifest_file):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(entry_dir, f))
+                for f in os.listdir(entry_dir)
+            )
+            entries.append((os.path.getmtime(manifest_file), size, entry_dir))
+        return entries
+
+    @property
+    def size(self):
+        """ Total size of the cached entries in bytes. """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """ Remove least recently used entries until under `max_size`. """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """ Remove every entry from the cache. """
+        for _, _, entry_dir in self.entries():
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+
+def enable_reader_cache(cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE):
+    """ Enable caching of parsed text files for all supported readers.
+
+    Parameters
+    ----------
+    cache_dir: str, optional
+        Directory to store the cache in. Defaults to ~/.cache/pydsd
+    max_size: int, optional
+        Maximum size of the cache in bytes. Defaults to 2GB.
+
+    Returns
+    -------
+    cache: `ReaderCache`
+        The enabled cache.
+    """
+    global _reader_cache
+    _reader_cache = ReaderCache(cache_dir, max_size)
+    return _reader_cache
+
+
+def disable_reader_cache():
+    """ Disable caching of parsed text files. Existing entries are kept. """
+    global _reader_cache
+    _reader_cache = None
+
+
+def get_reader_cache():
+    """ Return the enabled `ReaderCache`, or None if caching is disabled. """
+    return _reader_cache
+
+
+def cached_parse(reader, filename, parse, options=()):
+    """ Parse a file with a reader, going through the cache when enabled.
+
+    The reader lists the attributes its parse step fills in through a
+    `_cache_attributes` class attribute, and versions its parsing code with
+    `_cache_version`. On a cache hit these attributes are restored from the
+    cache and `parse` is not called.
+
+    Parameters
+    ----------
+    reader: object
+        Reader instance being set up.
+    filename: str
+        Raw file being read.
+    parse: callable
+        Function parsing the file and setting the cached attributes on reader.
+    options: tuple, optional
+        Reader options that change the parsed result.
+
+    Returns
+    -------
+    hit: bool
+        Whether the attributes were loaded from the cache.
+    """
+    cache = get_reader_cache()
+    if cache is None:
+        parse()
+        return False
+
+    reader_name = type(reader).__name__
+    reader_version = getattr(reader, "_cache_version", 0)
+    arrays = cache.load(filename, reader_name, reader_version, options)
+    if arrays is not None:
+        for name, array in arrays.items():
+            setattr(reader, name, array)
+        return True
+
+    parse()
+    cache.store(
+        filename,
+        reader_name,
+        reader_version,
+        {name: getattr(reader, name) for name in reader._cache_attributes},
+        options,
+    )
+    return False
@@ -51,3 +51,27 @@ def get_epoch_time(sample_times, t_units):
         "long_name": "Time (UTC)",
     }
     return eptime
+
+
+def field_dimensions(
+    name, data, numt, num_diameter, num_velocity=None, bin_fields=()
+):
+    """
+    Work out the dimension names of a field from its shape. Per time fields
+    get a `time` dimension, per bin fields a `diameter` dimension, and drop
+    spectra `(time, velocity, diameter)`. Fields named in `bin_fields` are
+    per bin even when numt equals the number of bins, the same check as
+    `DropSizeDistribution._is_time_field`.
+    """
+    shape = np.shape(data)
+    if name in bin_fields and len(shape) == 1 and shape[0] == num_diameter:
+        return ("diameter",)
+    if len(shape) == 3 and shape == (numt, num_velocity, num_diameter):
+        return ("time", "velocity", "diameter")
+    if len(shape) == 2 and shape == (numt, num_diameter):
+        return ("time", "diameter")
+    if len(shape) == 1 and shape[0] == numt:
+        return ("time",)
+    if len(shape) == 1 and shape[0] == num_diameter:
+        return ("diameter",)
+    return tuple("{}_dim_{}".format(name, i) for i in range(len(shape)))
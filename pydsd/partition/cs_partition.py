@@ -60,10 +60,15 @@ def cs_partition_bringi_2010(
     return classification
 
 
-def cs_partition_islam_2012(rain_rate, r_thresh=10.0, sd_thresh=1.5, window=4):
+def cs_partition_islam_2012(
+    rain_rate, r_thresh=10.0, sd_thresh=1.5, window=4, times=None
+):
     """Convective stratiform partitioning from Islam et al (Atmos Res 2012). The method
     combines Testud et al. 2011, and Bringi et al. 2003. 
 
+    Samples are stratiform when the rain rate stays below r_thresh and its
+    standard deviation below sd_thresh over the window centered on them.
+
     Parameters:
     -----------
     rain_rate: array_like
@@ -72,37 +77,56 @@ def cs_partition_islam_2012(rain_rate, r_thresh=10.0, sd_thresh=1.5, window=4):
         rain rate threshold for which above is convective
     sd_thresh: optional, float
         standard deviation of rain rate threshold above which is convective
-    window: optional, int
-        Window size for calculating standard deviation.
+    window: optional, int or float
+        Window size for calculating standard deviation. A number of samples,
+        or a duration in the units of `times` when those are given.
+    times: optional, array_like
+        Sorted sample times, for windows of fixed duration over irregular
+        sampling. Count windows are padded by reflection at the ends of the
+        series, time windows are truncated there.
 
     Returns:
     --------
     classification: array_like
         Convective stratiform classification. 0-unclassified, 1-stratiform, 2-convective.
+        Missing rain rates are unclassified.
 
     References:
     [1]: Tested et al. 2011
     [2]: Bringi et al. 2003
     """
 
-    classification = np.zeros_like(rain_rate)
-    classification[:] = 2  # Defaults to convective for now.
-    padded_rain_rate = np.pad(rain_rate, int(window / 2), "reflect")
-
+    rain_rate = np.ma.filled(np.ma.asarray(rain_rate, dtype=float), np.nan)
     n_pts = len(rain_rate)
 
-    thresh_left = padded_rain_rate < r_thresh
+    if times is None:
+        pad = int(window / 2)
+        padded_rain_rate = np.pad(rain_rate, pad, "reflect")
+        # The full window ending at padded sample i + window - 1 is centered
+        # on sample i.
+        centered = slice(window - 1, window - 1 + n_pts)
+        std = ts_utility.rolling_std(padded_rain_rate, window)[centered]
+        below = ts_utility.rolling_all(
+            _below(padded_rain_rate, r_thresh), window
+        )[centered]
+    else:
+        std = ts_utility.rolling_std(rain_rate, window, times, center=True)
+        below = ts_utility.rolling_all(
+            _below(rain_rate, r_thresh), window, times, center=True
+        )
+
+    classification = np.full(n_pts, 2.0)  # Defaults to convective for now.
+    with np.errstate(invalid="ignore"):
+        classification[below & (std < sd_thresh)] = 1
+    classification[np.isnan(rain_rate)] = 0
 
-    windowed_thresh = ts_utility.rolling_window(thresh_left, window)
-    windowed_std = np.std(ts_utility.rolling_window(padded_rain_rate, window), 1)
-
-    rain_thresh_mask = list(map(np.all, windowed_thresh))
-    std_thresh_mask = windowed_std < sd_thresh
-    convective_mask = np.logical_and(rain_thresh_mask, std_thresh_mask)
+    return classification
 
-    classification[convective_mask] = 1
 
-    return classification
+def _below(values, thresh):
+    """ Whether values are below thresh, NaN where values are missing. """
+    with np.errstate(invalid="ignore"):
+        return np.where(np.isnan(values), np.nan, values < thresh)
 
 
 def cs_partition_atlas_2000(vertical_velocity, w_thresh=1.0):
@@ -0,0 +1,12 @@
+"""
+Scattering backends producing per size bin scattering tables for the
+DropSizeDistribution radar calculations.
+
+.. moduleauthor:: Joseph C. Hardin <josephhardinee@gmail.com>
+
+"""
+from .table import ScatteringTable
+from .rayleigh import rayleigh_spheroid_table
+from .tmatrix import tmatrix_table
+from .temperature import TemperatureScatteringTable
+from .ensemble import ScatteringEnsemble, build_ensemble, sample_members
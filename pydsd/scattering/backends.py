@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Common entry point to build per bin scattering tables with any backend.
+"""
+from pytmatrix import tmatrix_aux
+
+from . import rayleigh, tmatrix
+
+SCATTERING_BACKENDS = ("tmatrix", "rayleigh_spheroid")
+
+
+def build_table(
+    backend,
+    bin_edges,
+    wavelength,
+    m,
+    dsr_func,
+    canting_angle=20,
+    max_diameter=9.0,
+    geometries=(tmatrix_aux.geom_horiz_back, tmatrix_aux.geom_horiz_forw),
+    scatter_table_filename=None,
+):
+    """ Build a per bin scattering table.
+
+    Parameters
+    ----------
+    backend: str
+        'tmatrix' or 'rayleigh_spheroid'.
+    bin_edges: array_like
+        N+1 bin edges [mm].
+    wavelength: float
+        Wavelength [mm].
+    m: complex
+        Complex refractive index of water.
+    dsr_func: function
+        Drop Shape Relationship function, see the `DSR` module.
+    canting_angle: float, optional
+        Standard deviation of the Gaussian canting angle distribution [deg].
+    max_diameter: float, optional
+        Maximum drop diameter [mm].
+    geometries: tuple, optional
+        Scattering geometries to compute.
+    scatter_table_filename: str, optional
+        Saved pytmatrix table to load, T-Matrix backend only. Other backends
+        raise a ValueError when it is given.
+
+    Returns
+    -------
+    table: `ScatteringTable`
+        Bin integrated scattering table.
+    scatterer: `pytmatrix.tmatrix.Scatterer`
+        Scatterer the table was built from, None for the Rayleigh backend.
+    """
+    if backend not in SCATTERING_BACKENDS:
+        raise ValueError(
+            "Unknown scattering backend {}, use one of {}".format(
+                backend, SCATTERING_BACKENDS
+            )
+        )
+    if scatter_table_filename is not None and backend != "tmatrix":
+        raise ValueError(
+            "scatter_table_filename is a pytmatrix table, which the {} backend "
+            "can not load".format(backend)
+        )
+    if backend == "rayleigh_spheroid":
+        table = rayleigh.rayleigh_spheroid_table(
+            bin_edges,
+            wavelength,
+            m,
+            dsr_func,
+            canting_angle=canting_angle,
+            max_diameter=max_diameter,
+            geometries=geometries,
+        )
+        return table, None
+
+    scatterer = tmatrix.tmatrix_scatterer(
+        wavelength,
+        m,
+        dsr_func,
+        canting_angle=canting_angle,
+        max_diameter=max_diameter,
+        geometries=geometries,
+        scatter_table_filename=scatter_table_filename,
+    )
+    return tmatrix.tmatrix_table(scatterer, bin_edges), scatterer
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Doppler spectra of a vertically pointing radar simulated from disdrometer data.
+
+At vertical incidence the Doppler velocity of a drop is its fall velocity (in
+still air), so the spectral reflectivity is the reflectivity of each size bin
+spread over the velocities its drops fall at. The spread is a fixed
+redistribution matrix from disdrometer bins to radar velocity bins, so the
+spectra of a whole record are one matrix product.
+"""
+import numpy as np
+
+from . import moments
+
+
+def velocity_edges(velocity_resolution, max_velocity):
+    """ Edges of the radar Doppler velocity bins, from 0 to `max_velocity` [m/s]. """
+    num_bins = int(np.ceil(max_velocity / velocity_resolution - 1e-9))
+    return velocity_resolution * np.arange(num_bins + 1)
+
+
+def class_edges(centers):
+    """ Edges of bins given their centers, half way between neighbouring centers. """
+    centers = np.asarray(centers, dtype=float)
+    midpoints = (centers[1:] + centers[:-1]) / 2.0
+    return np.concatenate(
+        [
+            [centers[0] - (midpoints[0] - centers[0])],
+            midpoints,
+            [centers[-1] + (centers[-1] - midpoints[-1])],
+        ]
+    )
+
+
+def redistribution_matrix(lower, upper, edges):
+    """ Fraction of each source interval falling in each velocity bin.
+
+    Velocities are assumed uniformly distributed over each source interval.
+    Intervals of zero width go entirely to the bin holding them. Parts of an
+    interval outside the velocity bins are dropped.
+
+    Parameters
+    ----------
+    lower: array_like
+        Lower velocity of each source interval [m/s], shape (N,).
+    upper: array_like
+        Upper velocity of each source interval [m/s], shape (N,).
+    edges: array_like
+        Edges of the M velocity bins [m/s], shape (M+1,).
+
+    Returns
+    -------
+    redistribution: array_like
+        Fractions, shape (N, M).
+    """
+    lower, upper = np.minimum(lower, upper), np.maximum(lower, upper)
+    edges = np.asarray(edges, dtype=float)
+    width = (upper - lower)[:, np.newaxis]
+
+    overlap = np.clip(
+        np.minimum(upper[:, np.newaxis], edges[np.newaxis, 1:])
+        - np.maximum(lower[:, np.newaxis], edges[np.newaxis, :-1]),
+        0,
+        None,
+    )
+    point = (lower[:, np.newaxis] >= edges[np.newaxis, :-1]) & (
+        lower[:, np.newaxis] < edges[np.newaxis, 1:]
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(width > 0, overlap / width, point.astype(float))
+
+
+def spectral_moments(spectrum, velocity, velocity_resolution):
+    """ Reflectivity, mean velocity and spectrum width of Doppler spectra.
+
+    Parameters
+    ----------
+    spectrum: array_like
+        Spectral reflectivity [mm^6 m^-3 / (m/s)], shape (..., M).
+    velocity: array_like
+        Center velocity of the M bins [m/s].
+    velocity_resolution: float
+        Width of the velocity bins [m/s].
+
+    Returns
+    -------
+    Ze: array_like
+        Linear reflectivity factor [mm^6 m^-3].
+    mean_velocity: array_like
+        Reflectivity weighted mean velocity [m/s].
+    width: array_like
+        Spectrum width, the reflectivity weighted standard deviation of
+        velocity [m/s].
+    """
+    Ze = np.sum(spectrum, axis=-1) * velocity_resolution
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_velocity = spectrum @ velocity * velocity_resolution / Ze
+        second_moment = spectrum @ velocity ** 2 * velocity_resolution / Ze
+        width = np.sqrt(np.maximum(second_moment - mean_velocity ** 2, 0))
+    return Ze, mean_velocity, width
+
+
+class DopplerSpectrumSimulator(object):
+    """
+    Vertically pointing radar Doppler spectra from drop size distributions.
+
+    Attributes
+    ----------
+    bin_reflectivity: array_like
+        Reflectivity factor of each disdrometer bin per unit concentration
+        [mm^6 m^-3 / (m^-3 mm^-1)], shape (N,).
+    velocity_edges: array_like
+        Edges of the radar velocity bins [m/s], shape (M+1,).
+    velocity: array_like
+        Centers of the radar velocity bins [m/s], shape (M,).
+    velocity_resolution: float
+        Width of the radar velocity bins [m/s].
+    """
+
+    def __init__(self, table, geometry, velocity_resolution, max_velocity):
+        """
+        Parameters
+        ----------
+        table: `ScatteringTable`
+            Table holding the backscatter phase matrices at vertical incidence.
+        geometry: tuple
+            Backscatter geometry of the table to use, typically
+            `tmatrix_aux.geom_vert_back`.
+        velocity_resolution: float
+            Radar velocity resolution [m/s].
+        max_velocity: float
+            Largest radar velocity [m/s], e.g. the Nyquist velocity.
+        """
+        self.bin_reflectivity = moments.refl(
+            table.Z[geometry], table.wavelength, table.Kw_sqr
+        )
+        self.velocity_resolution = velocity_resolution
+        self.velocity_edges = velocity_edges(velocity_resolution, max_velocity)
+        self.velocity = (self.velocity_edges[1:] + self.velocity_edges[:-1]) / 2.0
+
+    def from_nd(self, Nd, bin_edge_velocity):
+        """ Doppler spectra from drop concentrations.
+
+        Drops of a bin fall between the velocities at its edges.
+
+        Parameters
+        ----------
+        Nd: array_like
+            Drop concentrations [m^-3 mm^-1], shape (numt, N).
+        bin_edge_velocity: array_like
+            Fall velocity at the N+1 bin edges [m/s].
+
+        Returns
+        -------
+        spectrum: array_like
+            Spectral reflectivity [mm^6 m^-3 / (m/s)], shape (numt, M).
+        """
+        redistribution = redistribution_matrix(
+            bin_edge_velocity[:-1], bin_edge_velocity[1:], self.velocity_edges
+        )
+        weights = self.bin_reflectivity[:, np.newaxis] * redistribution
+        return np.ma.getdata(np.ma.filled(Nd, 0)) @ weights / self.velocity_resolution
+
+    def from_drop_spectrum(self, drop_spectrum, spectrum_velocity, concentration):
+        """ Doppler spectra from the measured velocity and size spectrum.
+
+        Uses the measured fall velocity of the drops instead of a fall
+        velocity relationship.
+
+        Parameters
+        ----------
+        drop_spectrum: array_like
+            Drop counts, shape (numt, K, N) for K velocity classes.
+        spectrum_velocity: array_like
+            Center velocity of the K velocity classes [m/s].
+        concentration: array_like
+            Concentration [m^-3 mm^-1] of one drop counted in each velocity
+            class and size bin, shape (K, N).
+
+        Returns
+        -------
+        spectrum: array_like
+            Spectral reflectivity [mm^6 m^-3 / (m/s)], shape (numt, M).
+        """
+        edges = class_edges(spectrum_velocity)
+        redistribution = redistribution_matrix(
+            edges[:-1], edges[1:], self.velocity_edges
+        )
+        counts = np.ma.getdata(np.ma.filled(drop_spectrum, 0))
+        class_reflectivity = np.einsum(
+            "tkn,kn->tk", counts, concentration * self.bin_reflectivity
+        )
+        return class_reflectivity @ redistribution / self.velocity_resolution
+
+    def moments(self, spectrum):
+        """ Reflectivity, mean velocity and width of spectra, see `spectral_moments`. """
+        return spectral_moments(spectrum, self.velocity, self.velocity_resolution)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Scattering tables for scanning radars at arbitrary elevation angles.
+
+Drops are oriented with the vertical, so the polarimetric variables seen by
+a radar depend on its elevation angle. Tables are built once per elevation,
+in parallel, and can be cached on disk keyed by every setting they depend on.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .backends import build_table
+from .table import ScatteringTable, load_table
+
+
+def elevation_geometries(elevation):
+    """ Backscatter and forward scattering geometries of a radar beam.
+
+    Parameters
+    ----------
+    elevation: float
+        Elevation angle of the beam [deg], 0 is horizontal.
+
+    Returns
+    -------
+    back, forw: tuple
+        Geometries (thet0, thet, phi0, phi, alpha, beta) as used by pytmatrix.
+        An elevation of 0 gives `geom_horiz_back` and `geom_horiz_forw`.
+    """
+    thet0 = 90.0 - float(elevation)
+    back = (thet0, 180.0 - thet0, 0.0, 180.0, 0.0, 0.0)
+    forw = (thet0, thet0, 0.0, 0.0, 0.0, 0.0)
+    return back, forw
+
+
+def table_cache_key(
+    backend, bin_edges, wavelength, m, dsr_func, canting_angle, max_diameter, elevation
+):
+    """ Digest identifying a table.
+
+    Drop shape relationships are identified by name and by their code,
+    defaults and closure values, since lambdas, or closures made by the same
+    factory, share a name.
+    """
+    settings = repr(
+        (
+            backend,
+            float(wavelength),
+            complex(m),
+            "{}.{}".format(dsr_func.__module__, dsr_func.__qualname__),
+            float(canting_angle),
+            float(max_diameter),
+            float(elevation),
+        )
+    ).encode()
+    digest = hashlib.sha1(settings)
+    digest.update(np.ascontiguousarray(bin_edges, dtype=float).tobytes())
+    _update_function_digest(digest, dsr_func)
+    return digest.hexdigest()
+
+
+def _update_function_digest(digest, func):
+    """ Add the code, defaults and closure values of a function to a digest. """
+    code = getattr(func, "__code__", None)
+    if code is None:  # Builtins and callable objects are identified by name.
+        return
+    _update_code_digest(digest, code)
+    values = list(func.__defaults__ or ()) + list(
+        (func.__kwdefaults__ or {}).items()
+    )
+    for cell in func.__closure__ or ():
+        try:
+            values.append(cell.cell_contents)
+        except ValueError:  # Empty cell
+            values.append(None)
+    for value in values:
+        _update_value_digest(digest, value)
+
+
+def _update_code_digest(digest, code):
+    """ Add the bytecode, names and constants of a code object to a digest. """
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):  # Nested functions
+            _update_code_digest(digest, const)
+        else:
+            digest.update(repr(const).encode())
+
+
+def _update_value_digest(digest, value):
+    """ Add a default or closure value to a digest. """
+    if callable(value) and hasattr(value, "__code__"):
+        _update_function_digest(digest, value)
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        digest.update(repr(value).encode())
+
+
+def _build_elevation_table(args):
+    """ Build the table of one elevation. Module level so it can be pickled. """
+    backend, bin_edges, wavelength, m, dsr_func, canting_angle, max_diameter, elevation = (
+        args
+    )
+    table, _ = build_table(
+        backend,
+        bin_edges,
+        wavelength,
+        m,
+        dsr_func,
+        canting_angle=canting_angle,
+        max_diameter=max_diameter,
+        geometries=elevation_geometries(elevation),
+    )
+    return table
+
+
+def build_elevation_tables(
+    elevations,
+    bin_edges,
+    wavelength,
+    m,
+    dsr_func,
+    canting_angle=20,
+    max_diameter=9.0,
+    backend="tmatrix",
+    n_jobs=None,
+    cache_dir=None,
+):
+    """ Build one scattering table holding the geometries of every elevation.
+
+    Parameters
+    ----------
+    elevations: sequence
+        Elevation angles [deg].
+    bin_edges: array_like
+        N+1 bin edges [mm].
+    wavelength: float
+        Wavelength [mm].
+    m: complex
+        Complex refractive index of water.
+    dsr_func: function
+        Drop Shape Relationship function, see the `DSR` module.
+    canting_angle: float, optional
+        Standard deviation of the Gaussian canting angle distribution [deg].
+    max_diameter: float, optional
+        Maximum drop diameter [mm].
+    backend: str, optional
+        Scattering backend, 'tmatrix' or 'rayleigh_spheroid'.
+    n_jobs: int, optional
+        Number of processes building tables. Defaults to the number of CPUs,
+        1 builds them in this process.
+    cache_dir: str, optional
+        Directory of cached tables. Tables found there are loaded, the others
+        are built and saved there.
+
+    Returns
+    -------
+    table: `ScatteringTable`
+        Table with the geometries of every elevation, see `elevation_geometries`.
+    """
+    elevations = list(dict.fromkeys(float(elevation) for elevation in elevations))
+    tables = {}
+    cache_files = {}
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        for elevation in elevations:
+            key = table_cache_key(
+                backend,
+                bin_edges,
+                wavelength,
+                m,
+                dsr_func,
+                canting_angle,
+                max_diameter,
+                elevation,
+            )
+            cache_files[elevation] = os.path.join(cache_dir, key + ".npz")
+            if os.path.exists(cache_files[elevation]):
+                tables[elevation] = load_table(cache_files[elevation])
+
+    missing = [elevation for elevation in elevations if elevation not in tables]
+    args = [
+        (backend, bin_edges, wavelength, m, dsr_func, canting_angle, max_diameter, e)
+        for e in missing
+    ]
+    if n_jobs == 1 or len(missing) <= 1:
+        built = [_build_elevation_table(arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            built = list(executor.map(_build_elevation_table, args))
+    for elevation, table in zip(missing, built):
+        tables[elevation] = table
+        if cache_dir is not None:
+            table.save(cache_files[elevation])
+
+    S = {}
+    Z = {}
+    for elevation in elevations:
+        S.update(tables[elevation].S)
+        Z.update(tables[elevation].Z)
+    first = tables[elevations[0]]
+    return ScatteringTable(
+        first.wavelength, bin_edges, S, Z, first.backend, Kw_sqr=first.Kw_sqr
+    )
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo ensembles of scattering assumptions.
+
+Simulated radar parameters depend on assumptions that are not measured by a
+disdrometer: the canting angle distribution, the drop shape relationship and
+the drop temperature. An ensemble samples these assumptions, builds the per
+bin scattering table of each distinct member once (in parallel), and
+evaluates every member against the drop size distributions in batches of time
+steps. Only per time statistics are kept, so memory grows with the number of
+members times the number of bins, not times the length of the record.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from pytmatrix import tmatrix_aux
+
+from .. import DSR
+from ..utility import dielectric
+from . import moments
+from .backends import build_table
+from .table import _filled
+
+DEFAULT_CANTING_ANGLES = (5.0, 10.0, 15.0, 20.0)
+DEFAULT_DSR_FUNCS = (DSR.tb, DSR.bc, DSR.pb, DSR.brandes)
+DEFAULT_TEMPERATURES = (0.0, 10.0, 20.0, 30.0)
+DEFAULT_CHUNK_SIZE = 1024
+
+
+def sample_members(
+    num_members,
+    canting_angles=DEFAULT_CANTING_ANGLES,
+    dsr_funcs=DEFAULT_DSR_FUNCS,
+    temperatures=DEFAULT_TEMPERATURES,
+    random_state=None,
+):
+    """ Draw ensemble members uniformly from the candidate assumptions.
+
+    Parameters
+    ----------
+    num_members: int
+        Number of ensemble members.
+    canting_angles: sequence, optional
+        Candidate canting angle standard deviations [deg].
+    dsr_funcs: sequence, optional
+        Candidate Drop Shape Relationship functions.
+    temperatures: sequence, optional
+        Candidate temperatures [C].
+    random_state: int or `numpy.random.Generator`, optional
+        Seed or generator for reproducible ensembles.
+
+    Returns
+    -------
+    members: list
+        One (canting_angle, dsr_func, temperature) tuple per member.
+    """
+    rng = np.random.default_rng(random_state)
+    canting = rng.choice(len(canting_angles), num_members)
+    dsr = rng.choice(len(dsr_funcs), num_members)
+    temperature = rng.choice(len(temperatures), num_members)
+    return [
+        (float(canting_angles[c]), dsr_funcs[d], float(temperatures[t]))
+        for c, d, t in zip(canting, dsr, temperature)
+    ]
+
+
+def _build_member_table(args):
+    """ Build the table of one distinct member. Module level so it can be pickled. """
+    backend, bin_edges, wavelength, frequency, member, max_diameter, geometries = args
+    canting_angle, dsr_func, temperature = member
+    table, _ = build_table(
+        backend,
+        bin_edges,
+        wavelength,
+        dielectric.get_refractivity(frequency, temperature),
+        dsr_func,
+        canting_angle=canting_angle,
+        max_diameter=max_diameter,
+        geometries=geometries,
+    )
+    return table
+
+
+def build_ensemble(
+    members,
+    bin_edges,
+    frequency,
+    backend="tmatrix",
+    max_diameter=9.0,
+    geometries=(tmatrix_aux.geom_horiz_back, tmatrix_aux.geom_horiz_forw),
+    n_jobs=None,
+):
+    """ Build the scattering tables of an ensemble.
+
+    Members sharing the same assumptions share one table, so each distinct
+    table is only computed once.
+
+    Parameters
+    ----------
+    members: list
+        (canting_angle, dsr_func, temperature) of each member, see
+        `sample_members`.
+    bin_edges: array_like
+        N+1 bin edges [mm].
+    frequency: float
+        Radar frequency [Hz].
+    backend: str, optional
+        Scattering backend, 'tmatrix' or 'rayleigh_spheroid'.
+    max_diameter: float, optional
+        Maximum drop diameter [mm].
+    geometries: tuple, optional
+        Scattering geometries to compute.
+    n_jobs: int, optional
+        Number of processes building tables. Defaults to the number of CPUs,
+        1 builds them in this process.
+
+    Returns
+    -------
+    ensemble: `ScatteringEnsemble`
+        The ensemble.
+    """
+    wavelength = 299792458 / frequency * 1000.0
+    distinct = list(dict.fromkeys(members))
+    args = [
+        (backend, bin_edges, wavelength, frequency, member, max_diameter, geometries)
+        for member in distinct
+    ]
+    if n_jobs == 1 or len(distinct) == 1:
+        tables = [_build_member_table(arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            tables = list(executor.map(_build_member_table, args))
+
+    distinct_tables = dict(zip(distinct, tables))
+    return ScatteringEnsemble(members, [distinct_tables[member] for member in members])
+
+
+class ScatteringEnsemble(object):
+    """
+    Ensemble of scattering tables, evaluated together.
+
+    Attributes
+    ----------
+    members: list
+        (canting_angle, dsr_func, temperature) of each member.
+    tables: list
+        `ScatteringTable` of each member.
+    wavelength: float
+        Wavelength [mm].
+    Kw_sqr: float
+        Dielectric factor used for reflectivity.
+    """
+
+    def __init__(self, members, tables):
+        self.members = members
+        self.tables = tables
+        self.wavelength = tables[0].wavelength
+        self.Kw_sqr = tables[0].Kw_sqr
+        self._stacked = {}
+
+    def __len__(self):
+        return len(self.members)
+
+    def stacked_table(self, geometry, kind):
+        """ Member tables side by side, shape (N, members * 4) for 'S' or
+        (N, members * 16) for 'Z', so one matrix product evaluates every member.
+        """
+        key = (geometry, kind)
+        if key not in self._stacked:
+            tables = [getattr(table, kind)[geometry] for table in self.tables]
+            stacked = np.stack(tables, axis=1)  # (N, members, i, j)
+            self._stacked[key] = stacked.reshape(len(stacked), -1)
+        return self._stacked[key]
+
+    def iter_radar_parameters(
+        self,
+        Nd,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        back=tmatrix_aux.geom_horiz_back,
+        forw=tmatrix_aux.geom_horiz_forw,
+    ):
+        """ Radar parameters of every member, in chunks of time steps.
+
+        Parameters
+        ----------
+        Nd: array_like
+            Drop concentrations, shape (numt, N).
+        chunk_size: int, optional
+            Number of time steps per chunk.
+        back: tuple, optional
+            Backscattering geometry.
+        forw: tuple, optional
+            Forward scattering geometry.
+
+        Yields
+        ------
+        chunk: slice
+            Time steps of the chunk.
+        params: dict
+            Radar parameters, each of shape (chunk length, members).
+        """
+        Nd = _filled(Nd)
+        num_members = len(self)
+        Z_table = self.stacked_table(back, "Z")
+        S_table = self.stacked_table(forw, "S")
+        for start in range(0, len(Nd), chunk_size):
+            chunk = slice(start, min(start + chunk_size, len(Nd)))
+            Z = (Nd[chunk] @ Z_table).reshape(-1, num_members, 4, 4)
+            S = (Nd[chunk] @ S_table).reshape(-1, num_members, 2, 2)
+            yield chunk, moments.radar_parameters(Z, S, self.wavelength, self.Kw_sqr)
+
+    def radar_statistics(
+        self,
+        Nd,
+        params=("Zh", "Zdr", "Kdp"),
+        percentiles=(5, 50, 95),
+        chunk_size=DEFAULT_CHUNK_SIZE,
+    ):
+        """ Per time step statistics of the radar parameters over the ensemble.
+
+        Parameters
+        ----------
+        Nd: array_like
+            Drop concentrations, shape (numt, N).
+        params: sequence, optional
+            Radar parameters to summarize.
+        percentiles: sequence, optional
+            Percentiles to compute.
+        chunk_size: int, optional
+            Number of time steps evaluated at once.
+
+        Returns
+        -------
+        statistics: dict
+            For each parameter, a dictionary of 'mean', 'std' and 'p<percentile>'
+            arrays of shape (numt,).
+        """
+        numt = len(Nd)
+        names = ["mean", "std"] + ["p{:g}".format(p) for p in percentiles]
+        statistics = {
+            param: {name: np.empty(numt) for name in names} for param in params
+        }
+        with np.errstate(invalid="ignore"):
+            for chunk, values in self.iter_radar_parameters(Nd, chunk_size):
+                for param in params:
+                    stats = statistics[param]
+                    stats["mean"][chunk] = np.mean(values[param], axis=1)
+                    stats["std"][chunk] = np.std(values[param], axis=1)
+                    if len(percentiles):
+                        chunk_percentiles = np.percentile(
+                            values[param], percentiles, axis=1
+                        )
+                        for name, value in zip(names[2:], chunk_percentiles):
+                            stats[name][chunk] = value
+        return statistics
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Radar observables from PSD integrated amplitude (S) and phase (Z) matrices.
+
+These follow the definitions of `pytmatrix.radar`, but work on stacks of
+matrices with shapes (..., 2, 2) and (..., 4, 4), so a whole record of drop
+size distributions is processed in one call.
+"""
+import numpy as np
+
+KW_SQR = 0.93
+
+
+def radar_xsect(Z, h_pol=True):
+    """ Radar cross section from backscatter phase matrices.
+
+    Parameters
+    ----------
+    Z: array_like
+        Phase matrices, shape (..., 4, 4).
+    h_pol: bool, optional
+        Use horizontal polarization if True, otherwise vertical.
+
+    Returns
+    -------
+    xsect: array_like
+        Radar cross section, shape (...).
+    """
+    if h_pol:
+        return 2 * np.pi * (Z[..., 0, 0] - Z[..., 0, 1] - Z[..., 1, 0] + Z[..., 1, 1])
+    else:
+        return 2 * np.pi * (Z[..., 0, 0] + Z[..., 0, 1] + Z[..., 1, 0] + Z[..., 1, 1])
+
+
+def refl(Z, wavelength, Kw_sqr=KW_SQR, h_pol=True):
+    """ Linear reflectivity factor [mm^6 m^-3] from backscatter phase matrices. """
+    return wavelength ** 4 / (np.pi ** 5 * Kw_sqr) * radar_xsect(Z, h_pol)
+
+
+def zdr(Z):
+    """ Linear differential reflectivity from backscatter phase matrices. """
+    return radar_xsect(Z, True) / radar_xsect(Z, False)
+
+
+def delta_hv(Z):
+    """ Backscatter differential phase [rad] from backscatter phase matrices. """
+    return np.arctan2(
+        Z[..., 2, 3] - Z[..., 3, 2], -Z[..., 2, 2] - Z[..., 3, 3]
+    )
+
+
+def ldr(Z, h_pol=True):
+    """ Linear depolarization ratio from backscatter phase matrices. """
+    if h_pol:
+        return (Z[..., 0, 0] - Z[..., 0, 1] + Z[..., 1, 0] - Z[..., 1, 1]) / (
+            Z[..., 0, 0] - Z[..., 0, 1] - Z[..., 1, 0] + Z[..., 1, 1]
+        )
+    else:
+        return (Z[..., 0, 0] + Z[..., 0, 1] - Z[..., 1, 0] - Z[..., 1, 1]) / (
+            Z[..., 0, 0] + Z[..., 0, 1] + Z[..., 1, 0] + Z[..., 1, 1]
+        )
+
+
+def rho_hv(Z):
+    """ Copolar correlation coefficient from backscatter phase matrices. """
+    a = (Z[..., 2, 2] + Z[..., 3, 3]) ** 2 + (Z[..., 3, 2] - Z[..., 2, 3]) ** 2
+    b = Z[..., 0, 0] - Z[..., 0, 1] - Z[..., 1, 0] + Z[..., 1, 1]
+    c = Z[..., 0, 0] + Z[..., 0, 1] + Z[..., 1, 0] + Z[..., 1, 1]
+    return np.sqrt(a / (b * c))
+
+
+def kdp(S, wavelength):
+    """ Specific differential phase [deg/km] from forward amplitude matrices. """
+    return 1e-3 * (180.0 / np.pi) * wavelength * (S[..., 1, 1] - S[..., 0, 0]).real
+
+
+def ai(S, wavelength, h_pol=True):
+    """ Specific attenuation [dB/km] from forward amplitude matrices. """
+    if h_pol:
+        return 4.343e-3 * 2 * wavelength * S[..., 1, 1].imag
+    else:
+        return 4.343e-3 * 2 * wavelength * S[..., 0, 0].imag
+
+
+def radar_parameters(Z, S, wavelength, Kw_sqr=KW_SQR):
+    """ Radar parameters from PSD integrated matrices.
+
+    Parameters
+    ----------
+    Z: array_like
+        Backscatter phase matrices, shape (..., 4, 4).
+    S: array_like
+        Forward amplitude matrices, shape (..., 2, 2).
+    wavelength: float
+        Wavelength [mm].
+    Kw_sqr: float, optional
+        Dielectric factor used for reflectivity.
+
+    Returns
+    -------
+    params: dict
+        Zh [dBZ], Zv [dBZ], Zdr [dB], delta_co [deg], rho_hv, LDR_h [dB],
+        LDR_v [dB], Kdp [deg/km], Ai [dB/km], Av [dB/km] and Adr [dB/km].
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Ai = ai(S, wavelength)
+        Av = ai(S, wavelength, h_pol=False)
+        return {
+            "Zh": 10 * np.log10(refl(Z, wavelength, Kw_sqr)),
+            "Zv": 10 * np.log10(refl(Z, wavelength, Kw_sqr, h_pol=False)),
+            "Zdr": 10 * np.log10(zdr(Z)),
+            "delta_co": delta_hv(Z) * 180.0 / np.pi,
+            "rho_hv": rho_hv(Z),
+            "LDR_h": 10 * np.log10(ldr(Z)),
+            "LDR_v": 10 * np.log10(ldr(Z, h_pol=False)),
+            "Kdp": kdp(S, wavelength),
+            "Ai": Ai,
+            "Av": Av,
+            "Adr": Ai - Av,
+        }
+
+
+def amplitude_to_phase(S):
+    """ Phase matrices from amplitude matrices.
+
+    Parameters
+    ----------
+    S: array_like
+        Complex amplitude matrices, shape (..., 2, 2).
+
+    Returns
+    -------
+    Z: array_like
+        Phase matrices, shape (..., 4, 4).
+    """
+    S11, S12 = S[..., 0, 0], S[..., 0, 1]
+    S21, S22 = S[..., 1, 0], S[..., 1, 1]
+    a11, a12, a21, a22 = abs(S11) ** 2, abs(S12) ** 2, abs(S21) ** 2, abs(S22) ** 2
+    c = np.conj
+
+    Z = np.empty(S.shape[:-2] + (4, 4))
+    Z[..., 0, 0] = 0.5 * (a11 + a12 + a21 + a22)
+    Z[..., 0, 1] = 0.5 * (a11 - a12 + a21 - a22)
+    Z[..., 0, 2] = -(S11 * c(S12) + S22 * c(S21)).real
+    Z[..., 0, 3] = -(S11 * c(S12) - S22 * c(S21)).imag
+    Z[..., 1, 0] = 0.5 * (a11 + a12 - a21 - a22)
+    Z[..., 1, 1] = 0.5 * (a11 - a12 - a21 + a22)
+    Z[..., 1, 2] = -(S11 * c(S12) - S22 * c(S21)).real
+    Z[..., 1, 3] = -(S11 * c(S12) + S22 * c(S21)).imag
+    Z[..., 2, 0] = -(S11 * c(S21) + S22 * c(S12)).real
+    Z[..., 2, 1] = -(S11 * c(S21) - S22 * c(S12)).real
+    Z[..., 2, 2] = (S11 * c(S22) + S12 * c(S21)).real
+    Z[..., 2, 3] = (S11 * c(S22) + S21 * c(S12)).imag
+    Z[..., 3, 0] = -(S21 * c(S11) + S22 * c(S12)).imag
+    Z[..., 3, 1] = -(S21 * c(S11) - S22 * c(S12)).imag
+    Z[..., 3, 2] = (S22 * c(S11) - S12 * c(S21)).imag
+    Z[..., 3, 3] = (S22 * c(S11) - S12 * c(S21)).real
+    return Z
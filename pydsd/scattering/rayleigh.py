@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Rayleigh spheroid scattering backend.
+
+Drops much smaller than the wavelength (S and C band) scatter as dipoles.
+The polarizability of a spheroidal drop is known analytically, so the
+amplitude and phase matrices of every diameter, orientation and geometry are
+computed directly with array operations instead of through T-Matrix tables.
+
+Attenuation and specific differential phase come from the forward scattering
+amplitude. Plain Rayleigh scattering underestimates the absorption of large
+drops, so in forward geometries the polarizabilities are corrected with the
+second order term of the small sphere extinction expansion (Bohren and
+Huffman, 1983, Sec. 5.1) and for radiative reaction.
+"""
+import numpy as np
+from pytmatrix import orientation, tmatrix_aux
+from pytmatrix.quadrature import quadrature
+
+from . import moments
+from .table import ScatteringTable
+
+
+def depolarization_factors(axis_ratio):
+    """ Depolarization factors of spheroids.
+
+    Parameters
+    ----------
+    axis_ratio: array_like
+        Ratio of the symmetry axis to the equatorial axis (below one for
+        oblate drops), as returned by the `DSR` functions.
+
+    Returns
+    -------
+    L_x, L_z: array_like
+        Depolarization factors along an equatorial axis and along the symmetry
+        axis.
+    """
+    r = np.asarray(axis_ratio, dtype=float)
+    L_z = np.full(r.shape, 1.0 / 3.0)
+
+    oblate = r < 1.0 - 1e-6
+    f = np.sqrt(1.0 / r[oblate] ** 2 - 1.0)
+    L_z[oblate] = (1.0 + f ** 2) / f ** 2 * (1.0 - np.arctan(f) / f)
+
+    prolate = r > 1.0 + 1e-6
+    e = np.sqrt(1.0 - 1.0 / r[prolate] ** 2)
+    L_z[prolate] = (1.0 - e ** 2) / e ** 2 * (np.arctanh(e) / e - 1.0)
+
+    return (1.0 - L_z) / 2.0, L_z
+
+
+def polarizabilities(D, m, axis_ratio):
+    """ Polarizabilities [mm^3] of spheroidal drops.
+
+    Parameters
+    ----------
+    D: array_like
+        Volume equivalent diameters [mm].
+    m: complex
+        Complex refractive index of water.
+    axis_ratio: array_like
+        Ratio of the symmetry axis to the equatorial axis.
+
+    Returns
+    -------
+    alpha_x, alpha_z: array_like
+        Polarizabilities along an equatorial axis and along the symmetry axis.
+    """
+    volume = np.pi * np.asarray(D) ** 3 / 6.0
+    eps = m ** 2
+    L_x, L_z = depolarization_factors(axis_ratio)
+    alpha_x = volume * (eps - 1.0) / (1.0 + L_x * (eps - 1.0))
+    alpha_z = volume * (eps - 1.0) / (1.0 + L_z * (eps - 1.0))
+    return alpha_x, alpha_z
+
+
+def forward_correction(D, wavelength, m, alpha):
+    """ Forward scattering polarizabilities with the second order size correction.
+
+    Parameters
+    ----------
+    D: array_like
+        Volume equivalent diameters [mm].
+    wavelength: float
+        Wavelength [mm].
+    m: complex
+        Complex refractive index of water.
+    alpha: array_like
+        Rayleigh polarizabilities [mm^3].
+
+    Returns
+    -------
+    alpha: array_like
+        Corrected polarizabilities [mm^3].
+    """
+    k = 2 * np.pi / wavelength
+    x = k * np.asarray(D) / 2.0
+    eps = m ** 2
+    K = (eps - 1.0) / (eps + 2.0)
+    alpha = alpha * (
+        1.0 + x ** 2 / 15.0 * K * (eps ** 2 + 27 * eps + 38) / (2 * eps + 3)
+    )
+    return alpha / (1.0 - 1j * k ** 3 * alpha / (6 * np.pi))
+
+
+def is_forward(geometry):
+    """ Whether a geometry scatters in the incident direction. """
+    thet0, thet, phi0, phi = geometry[:4]
+    return thet0 == thet and (phi0 - phi) % 360 == 0
+
+
+def orientations(canting_angle, n_alpha=5, n_beta=10):
+    """ Symmetry axis directions and weights for orientation averaging.
+
+    Uses the same quadrature as `pytmatrix.orientation.orient_averaged_fixed`
+    with a Gaussian canting angle distribution.
+
+    Parameters
+    ----------
+    canting_angle: float
+        Standard deviation of the canting angle [deg].
+    n_alpha, n_beta: int, optional
+        Number of azimuth and canting angles.
+
+    Returns
+    -------
+    axes: array_like
+        Unit symmetry axes, shape (n_alpha * n_beta, 3).
+    weights: array_like
+        Normalized weights, shape (n_alpha * n_beta,).
+    """
+    if canting_angle == 0:
+        return np.array([[0.0, 0.0, 1.0]]), np.array([1.0])
+    beta, beta_weights = quadrature.get_points_and_weights(
+        orientation.gaussian_pdf(canting_angle), 0, 180, n_beta
+    )
+    alpha = np.linspace(0, 360, n_alpha + 1)[:-1]
+    alpha, beta = np.meshgrid(np.deg2rad(alpha), np.deg2rad(beta), indexing="ij")
+    axes = np.stack(
+        [
+            np.sin(beta) * np.cos(alpha),
+            np.sin(beta) * np.sin(alpha),
+            np.cos(beta),
+        ],
+        axis=-1,
+    ).reshape(-1, 3)
+    weights = np.tile(beta_weights, n_alpha)
+    return axes, weights / weights.sum()
+
+
+def polarization_basis(geometry):
+    """ Vertical and horizontal polarization unit vectors of a geometry.
+
+    Parameters
+    ----------
+    geometry: tuple
+        Scattering geometry (thet0, thet, phi0, phi, alpha, beta) in degrees,
+        as used by pytmatrix.
+
+    Returns
+    -------
+    incident, scattered: array_like
+        Unit vectors (theta, phi) of the incident and scattered directions,
+        each of shape (2, 3).
+    """
+
+    def basis(theta, phi):
+        theta, phi = np.deg2rad(theta), np.deg2rad(phi)
+        return np.array(
+            [
+                [np.cos(theta) * np.cos(phi), np.cos(theta) * np.sin(phi), -np.sin(theta)],
+                [-np.sin(phi), np.cos(phi), 0.0],
+            ]
+        )
+
+    thet0, thet, phi0, phi = geometry[:4]
+    return basis(thet0, phi0), basis(thet, phi)
+
+
+def amplitude_matrices(wavelength, alpha_x, alpha_z, axes, geometry):
+    """ Amplitude matrices of dipoles for every diameter and orientation.
+
+    Parameters
+    ----------
+    wavelength: float
+        Wavelength [mm].
+    alpha_x, alpha_z: array_like
+        Equatorial and symmetry axis polarizabilities, shape (nD,).
+    axes: array_like
+        Symmetry axes, shape (nO, 3).
+    geometry: tuple
+        Scattering geometry.
+
+    Returns
+    -------
+    S: array_like
+        Amplitude matrices [mm], shape (nD, nO, 2, 2).
+    """
+    k = 2 * np.pi / wavelength
+    incident, scattered = polarization_basis(geometry)
+    a = axes @ scattered.T  # (nO, 2)
+    b = axes @ incident.T
+    S = alpha_x[:, None, None, None] * (scattered @ incident.T)[None, None] + (
+        alpha_z - alpha_x
+    )[:, None, None, None] * (a[:, :, None] * b[:, None, :])[None]
+    return k ** 2 / (4 * np.pi) * S
+
+
+def bin_quadrature(bin_edges, max_diameter, num_points=8):
+    """ Gauss-Legendre diameters and weights over each bin.
+
+    Returns
+    -------
+    D: array_like
+        Diameters, shape (N, num_points).
+    weights: array_like
+        Integration weights, shape (N, num_points). Diameters above
+        max_diameter get no weight.
+    """
+    x, w = np.polynomial.legendre.leggauss(num_points)
+    lower = np.minimum(np.asarray(bin_edges[:-1], dtype=float), max_diameter)
+    upper = np.minimum(np.asarray(bin_edges[1:], dtype=float), max_diameter)
+    half_width = (upper - lower)[:, None] / 2.0
+    D = (upper + lower)[:, None] / 2.0 + half_width * x[None, :]
+    return D, half_width * w[None, :]
+
+
+def rayleigh_spheroid_table(
+    bin_edges,
+    wavelength,
+    m,
+    dsr_func,
+    canting_angle=20,
+    max_diameter=9.0,
+    geometries=(tmatrix_aux.geom_horiz_back, tmatrix_aux.geom_horiz_forw),
+    num_points=8,
+):
+    """ Per bin scattering table of Rayleigh spheroids.
+
+    Parameters
+    ----------
+    bin_edges: array_like
+        N+1 bin edges [mm].
+    wavelength: float
+        Wavelength [mm].
+    m: complex
+        Complex refractive index of water.
+    dsr_func: function
+        Drop Shape Relationship function, see the `DSR` module.
+    canting_angle: float, optional
+        Standard deviation of the Gaussian canting angle distribution [deg].
+    max_diameter: float, optional
+        Diameters above max_diameter are not integrated.
+    geometries: tuple, optional
+        Scattering geometries to compute.
+    num_points: int, optional
+        Number of integration diameters per bin.
+
+    Returns
+    -------
+    table: `ScatteringTable`
+        Bin integrated scattering table.
+    """
+    D, D_weights = bin_quadrature(bin_edges, max_diameter, num_points)
+    D_positive = np.maximum(D, 1e-6).ravel()
+    alpha_x, alpha_z = polarizabilities(
+        D_positive, m, np.asarray(dsr_func(D_positive), dtype=float)
+    )
+    axes, axes_weights = orientations(canting_angle)
+    num_bins = len(bin_edges) - 1
+
+    S = {}
+    Z = {}
+    forward_alpha_x = forward_correction(D_positive, wavelength, m, alpha_x)
+    forward_alpha_z = forward_correction(D_positive, wavelength, m, alpha_z)
+
+    for geometry in geometries:
+        if is_forward(geometry):
+            S_orient = amplitude_matrices(
+                wavelength, forward_alpha_x, forward_alpha_z, axes, geometry
+            )
+        else:
+            S_orient = amplitude_matrices(wavelength, alpha_x, alpha_z, axes, geometry)
+        Z_orient = moments.amplitude_to_phase(S_orient)
+        S_D = np.einsum("o,doij->dij", axes_weights, S_orient)
+        Z_D = np.einsum("o,doij->dij", axes_weights, Z_orient)
+        S[geometry] = np.einsum(
+            "bp,bpij->bij", D_weights, S_D.reshape(num_bins, num_points, 2, 2)
+        )
+        Z[geometry] = np.einsum(
+            "bp,bpij->bij", D_weights, Z_D.reshape(num_bins, num_points, 4, 4)
+        )
+
+    return ScatteringTable(wavelength, bin_edges, S, Z, "rayleigh_spheroid")
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Per size bin scattering tables.
+
+A `ScatteringTable` holds the amplitude (S) and phase (Z) matrices of every
+size bin of a disdrometer, integrated over the diameters of the bin. As the
+drop concentration is constant over a bin, the PSD integrated matrices of a
+whole record are then the matrix product of `Nd` with the table, which
+replaces a per time step integration.
+"""
+import numpy as np
+from pytmatrix import tmatrix_aux
+
+from . import moments
+
+
+class ScatteringTable(object):
+    """
+    Bin integrated scattering matrices for a set of scattering geometries.
+
+    Attributes
+    ----------
+    wavelength: float
+        Wavelength [mm].
+    bin_edges: array_like
+        N+1 bin edges [mm] the table was integrated over.
+    S: dict
+        Mapping of geometry to complex amplitude matrices, shape (N, 2, 2).
+    Z: dict
+        Mapping of geometry to phase matrices, shape (N, 4, 4).
+    backend: str
+        Name of the backend that computed the table.
+    Kw_sqr: float
+        Dielectric factor used for reflectivity.
+    """
+
+    def __init__(self, wavelength, bin_edges, S, Z, backend, Kw_sqr=moments.KW_SQR):
+        self.wavelength = wavelength
+        self.bin_edges = np.asarray(bin_edges)
+        self.S = S
+        self.Z = Z
+        self.backend = backend
+        self.Kw_sqr = Kw_sqr
+
+    @property
+    def geometries(self):
+        return tuple(self.S.keys())
+
+    def get_S(self, Nd, geometry):
+        """ PSD integrated amplitude matrices.
+
+        Parameters
+        ----------
+        Nd: array_like
+            Drop concentrations, shape (numt, N).
+        geometry: tuple
+            Scattering geometry, see `pytmatrix.tmatrix_aux`.
+
+        Returns
+        -------
+        S: array_like
+            Amplitude matrices, shape (numt, 2, 2).
+        """
+        S = self.S[geometry]
+        return (_filled(Nd) @ S.reshape(len(S), 4)).reshape(-1, 2, 2)
+
+    def get_Z(self, Nd, geometry):
+        """ PSD integrated phase matrices, shape (numt, 4, 4). See `get_S`. """
+        Z = self.Z[geometry]
+        return (_filled(Nd) @ Z.reshape(len(Z), 16)).reshape(-1, 4, 4)
+
+    def radar_parameters(
+        self,
+        Nd,
+        back=tmatrix_aux.geom_horiz_back,
+        forw=tmatrix_aux.geom_horiz_forw,
+    ):
+        """ Radar parameters for a record of drop size distributions.
+
+        Parameters
+        ----------
+        Nd: array_like
+            Drop concentrations, shape (numt, N).
+        back: tuple, optional
+            Backscattering geometry.
+        forw: tuple, optional
+            Forward scattering geometry.
+
+        Returns
+        -------
+        params: dict
+            Zh [dBZ], Zdr [dB], delta_co [deg], Kdp [deg/km], Ai [dB/km] and
+            Adr [dB/km] arrays of shape (numt,).
+        """
+        return moments.radar_parameters(
+            self.get_Z(Nd, back), self.get_S(Nd, forw), self.wavelength, self.Kw_sqr
+        )
+
+    def save(self, filename):
+        """ Save the table to a NumPy .npz file, see `load_table`. """
+        geometries = self.geometries
+        np.savez(
+            filename,
+            wavelength=self.wavelength,
+            bin_edges=self.bin_edges,
+            geometries=np.array(geometries, dtype=float),
+            S=np.stack([self.S[geometry] for geometry in geometries]),
+            Z=np.stack([self.Z[geometry] for geometry in geometries]),
+            backend=self.backend,
+            Kw_sqr=self.Kw_sqr,
+        )
+
+
+def load_table(filename):
+    """ Load a table saved with `ScatteringTable.save`.
+
+    Parameters
+    ----------
+    filename: str
+        File to load.
+
+    Returns
+    -------
+    table: `ScatteringTable`
+        The saved table.
+    """
+    with np.load(filename) as saved:
+        geometries = [tuple(float(angle) for angle in g) for g in saved["geometries"]]
+        return ScatteringTable(
+            float(saved["wavelength"]),
+            saved["bin_edges"],
+            dict(zip(geometries, saved["S"])),
+            dict(zip(geometries, saved["Z"])),
+            str(saved["backend"]),
+            Kw_sqr=float(saved["Kw_sqr"]),
+        )
+
+
+def _filled(Nd):
+    """ Nd as a float array, with masked concentrations as zero. """
+    return np.ma.filled(np.ma.asarray(Nd, dtype=float), 0.0)
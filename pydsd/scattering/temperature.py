@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Temperature dependent scattering tables.
+
+The refractive index of water, and so the scattering of the drops, changes
+with temperature. Rather than building a table for every time step, tables
+are built on a small temperature grid and the bin integrated scattering
+matrices are linearly interpolated to the temperature of each time step.
+"""
+import numpy as np
+from pytmatrix import tmatrix_aux
+
+from . import moments
+from .table import _filled
+
+
+def interpolation_weights(temperature, grid):
+    """ Linear interpolation weights of each grid temperature.
+
+    Temperatures outside of the grid use the closest grid temperature.
+
+    Parameters
+    ----------
+    temperature: array_like
+        Temperature of each time step [C], shape (numt,).
+    grid: array_like
+        Increasing temperature grid [C].
+
+    Returns
+    -------
+    weights: array_like
+        Weights, shape (numt, len(grid)).
+    """
+    grid = np.asarray(grid, dtype=float)
+    temperature = np.clip(np.asarray(temperature, dtype=float), grid[0], grid[-1])
+    weights = np.zeros((len(temperature), len(grid)))
+    if len(grid) == 1:
+        weights[:, 0] = 1.0
+        return weights
+
+    upper = np.searchsorted(grid, temperature, side="right")
+    upper = np.clip(upper, 1, len(grid) - 1)
+    lower = upper - 1
+    fraction = (temperature - grid[lower]) / (grid[upper] - grid[lower])
+    rows = np.arange(len(temperature))
+    weights[rows, lower] = 1.0 - fraction
+    weights[rows, upper] += fraction
+    return weights
+
+
+class TemperatureScatteringTable(object):
+    """
+    Scattering tables on a temperature grid, interpolated per time step.
+
+    Attributes
+    ----------
+    tables: list
+        `ScatteringTable` for each temperature of the grid.
+    temperatures: tuple
+        Increasing temperature grid [C].
+    wavelength: float
+        Wavelength [mm].
+    backend: str
+        Name of the backend that computed the tables.
+    Kw_sqr: float
+        Dielectric factor used for reflectivity.
+    """
+
+    def __init__(self, tables, temperatures):
+        order = np.argsort(temperatures)
+        self.tables = [tables[i] for i in order]
+        self.temperatures = tuple(float(temperatures[i]) for i in order)
+        self.wavelength = self.tables[0].wavelength
+        self.backend = self.tables[0].backend
+        self.Kw_sqr = self.tables[0].Kw_sqr
+
+    @property
+    def geometries(self):
+        return self.tables[0].geometries
+
+    def interpolation_weights(self, temperature):
+        """ Interpolation weights of the grid temperatures for each time step. """
+        return interpolation_weights(temperature, self.temperatures)
+
+    def get_S(self, Nd, geometry, temperature):
+        """ PSD integrated amplitude matrices at the temperature of each time step.
+
+        Parameters
+        ----------
+        Nd: array_like
+            Drop concentrations, shape (numt, N).
+        geometry: tuple
+            Scattering geometry.
+        temperature: array_like
+            Temperature of each time step [C], shape (numt,).
+
+        Returns
+        -------
+        S: array_like
+            Amplitude matrices, shape (numt, 2, 2).
+        """
+        return self._interpolate(
+            Nd, temperature, lambda table, Nd: table.get_S(Nd, geometry)
+        )
+
+    def get_Z(self, Nd, geometry, temperature):
+        """ PSD integrated phase matrices, shape (numt, 4, 4). See `get_S`. """
+        return self._interpolate(
+            Nd, temperature, lambda table, Nd: table.get_Z(Nd, geometry)
+        )
+
+    def radar_parameters(
+        self,
+        Nd,
+        temperature,
+        back=tmatrix_aux.geom_horiz_back,
+        forw=tmatrix_aux.geom_horiz_forw,
+    ):
+        """ Radar parameters at the temperature of each time step.
+
+        See `ScatteringTable.radar_parameters`, with the temperature of each
+        time step [C] as an extra argument.
+        """
+        return moments.radar_parameters(
+            self.get_Z(Nd, back, temperature),
+            self.get_S(Nd, forw, temperature),
+            self.wavelength,
+            self.Kw_sqr,
+        )
+
+    def _interpolate(self, Nd, temperature, integrate):
+        """ Interpolate a table integral between the grid temperatures. """
+        Nd = _filled(Nd)
+        weights = self.interpolation_weights(temperature)
+        empty = integrate(self.tables[0], Nd[:0])
+        result = np.zeros((len(Nd),) + empty.shape[1:], dtype=empty.dtype)
+        for table, table_weights in zip(self.tables, weights.T):
+            used = np.flatnonzero(table_weights)
+            if len(used) == 0:
+                continue
+            values = integrate(table, Nd[used])
+            result[used] += table_weights[used, None, None] * values
+        return result
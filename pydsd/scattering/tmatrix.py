@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+T-Matrix scattering backend.
+
+Builds per bin tables from the diameter tables of a pytmatrix
+`PSDIntegrator`. The bin tables use the same trapezoidal integration as
+`PSDIntegrator` with a `BinnedPSD`, so they give the same results as
+integrating each drop size distribution with pytmatrix.
+"""
+import numpy as np
+from pytmatrix import orientation, tmatrix_aux
+from pytmatrix.psd import PSDIntegrator
+from pytmatrix.tmatrix import Scatterer
+
+from .table import ScatteringTable
+
+
+def tmatrix_scatterer(
+    wavelength,
+    m,
+    dsr_func,
+    canting_angle=20,
+    max_diameter=9.0,
+    geometries=(tmatrix_aux.geom_horiz_back, tmatrix_aux.geom_horiz_forw),
+    scatter_table_filename=None,
+):
+    """ Scatterer with an initialized PSDIntegrator table.
+
+    Parameters
+    ----------
+    wavelength: float
+        Wavelength [mm].
+    m: complex
+        Complex refractive index of water.
+    dsr_func: function
+        Drop Shape Relationship function, see the `DSR` module.
+    canting_angle: float, optional
+        Standard deviation of the Gaussian canting angle distribution [deg].
+    max_diameter: float, optional
+        Maximum drop diameter of the table [mm].
+    geometries: tuple, optional
+        Scattering geometries to compute.
+    scatter_table_filename: str, optional
+        Load the PSDIntegrator table from this file instead of computing it.
+
+    Returns
+    -------
+    scatterer: `pytmatrix.tmatrix.Scatterer`
+        Scatterer with its PSDIntegrator table set up.
+    """
+    scatterer = Scatterer(wavelength=wavelength, m=m)
+    scatterer.psd_integrator = PSDIntegrator()
+    scatterer.psd_integrator.axis_ratio_func = lambda D: 1.0 / dsr_func(D)
+    scatterer.psd_integrator.D_max = max_diameter
+    scatterer.psd_integrator.geometries = tuple(geometries)
+    scatterer.or_pdf = orientation.gaussian_pdf(canting_angle)
+    scatterer.orient = orientation.orient_averaged_fixed
+    if scatter_table_filename is None:
+        scatterer.psd_integrator.init_scatter_table(scatterer)
+    else:
+        scatterer.psd_integrator.load_scatter_table(scatter_table_filename)
+    return scatterer
+
+
+def bin_weights(psd_D, bin_edges):
+    """ Trapezoidal integration weights of each diameter for each bin.
+
+    Parameters
+    ----------
+    psd_D: array_like
+        Diameters the scattering properties are tabulated at.
+    bin_edges: array_like
+        N+1 bin edges.
+
+    Returns
+    -------
+    weights: array_like
+        Weights, shape (N, len(psd_D)), so that the integral over a `BinnedPSD`
+        of a tabulated quantity f is `Nd @ weights @ f`.
+    """
+    psd_D = np.asarray(psd_D)
+    bin_edges = np.asarray(bin_edges)
+    dD = np.diff(psd_D)
+    trapz_weights = np.zeros(len(psd_D))
+    trapz_weights[:-1] += dD / 2.0
+    trapz_weights[1:] += dD / 2.0
+
+    # BinnedPSD puts D in bin i when bin_edges[i] < D <= bin_edges[i+1].
+    bin_index = np.searchsorted(bin_edges, psd_D, side="left") - 1
+    inside = (bin_index >= 0) & (bin_index < len(bin_edges) - 1)
+
+    weights = np.zeros((len(bin_edges) - 1, len(psd_D)))
+    weights[bin_index[inside], np.flatnonzero(inside)] = trapz_weights[inside]
+    return weights
+
+
+def tmatrix_table(scatterer, bin_edges):
+    """ Per bin scattering table from an initialized pytmatrix Scatterer.
+
+    Parameters
+    ----------
+    scatterer: `pytmatrix.tmatrix.Scatterer`
+        Scatterer with a `PSDIntegrator` whose scattering table has been
+        initialized or loaded.
+    bin_edges: array_like
+        N+1 bin edges [mm].
+
+    Returns
+    -------
+    table: `ScatteringTable`
+        Bin integrated scattering table for the integrator geometries.
+    """
+    integrator = scatterer.psd_integrator
+    weights = bin_weights(integrator._psd_D, bin_edges)
+
+    S = {}
+    Z = {}
+    for geometry in integrator.geometries:
+        S[geometry] = np.einsum("bd,ijd->bij", weights, integrator._S_table[geometry])
+        Z[geometry] = np.einsum("bd,ijd->bij", weights, integrator._Z_table[geometry])
+
+    return ScatteringTable(
+        scatterer.wavelength, bin_edges, S, Z, "tmatrix", Kw_sqr=scatterer.Kw_sqr
+    )
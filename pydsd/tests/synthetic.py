@@ -0,0 +1,36 @@
+"""
+Synthetic drop size distributions for tests.
+"""
+import numpy as np
+
+from ..aux_readers import ARM_Vdis_Reader
+
+ARM_VDIS_FILE = "testdata/arm_vdis_b1.cdf"
+
+
+def synthetic_dsd(spectra):
+    """ DropSizeDistribution of the ARM 2DVD test file with synthetic spectra.
+
+    The record is cut to the number of spectra with `isel`, so every per time
+    field and the field store stay consistent with the new Nd.
+
+    Parameters
+    ----------
+    spectra: function
+        Function of the bin diameters [mm] returning Nd, shape (numt, bins).
+
+    Returns
+    -------
+    dsd: `DropSizeDistribution`
+        The first numt time steps of the test file, with Nd replaced.
+    """
+    dsd = ARM_Vdis_Reader.read_arm_vdis_b1(ARM_VDIS_FILE)
+    Nd = np.ma.array(spectra(dsd.diameter["data"]), dtype=float)
+    dsd = dsd.isel(slice(0, len(Nd)))
+    dsd.Nd["data"] = Nd
+    return dsd
+
+
+def normalized_gamma(diameter, D0, mu, Nw):
+    """ Normalized gamma Nd with the shape of the broadcast D0, mu and Nw. """
+    return Nw * (diameter / D0) ** mu * np.exp(-(3.67 + mu) * diameter / D0)
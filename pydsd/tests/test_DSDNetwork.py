@@ -0,0 +1,83 @@
+import pytest
+import numpy as np
+
+from ..io import ARM_vdisdrops_reader
+from ..DSDNetwork import DSDNetwork
+from .synthetic import normalized_gamma, synthetic_dsd
+
+
+@pytest.fixture(scope="module")
+def stations():
+    rng = np.random.default_rng(1)
+    D0 = rng.uniform(0.8, 2.5, (40, 1))
+    mu = rng.uniform(0, 5, (40, 1))
+    Nw = 10 ** rng.uniform(3, 4.5, (40, 1))
+    first = synthetic_dsd(lambda D: normalized_gamma(D, D0, mu, Nw))
+    first.Nd["data"][0] = 0
+    second = first.isel(slice(0, None, 2))
+    third = ARM_vdisdrops_reader.read_arm_vdisdrops_netcdf(
+        "testdata/corvdisdropsM1.b1.20181214.020816.cdf"
+    )
+    third = third.isel(slice(0, 40))
+    third.time["data"] = first.time["data"][:40] + 1
+    return first, second, third
+
+
+def test_network_layout(stations):
+    times = stations[0].time["data"]
+    network = DSDNetwork(stations, stations=["a", "b", "c"], times=times)
+    assert len(network) == 3
+    assert network.stations == ["a", "b", "c"]
+    assert network.numt == 40
+    assert len(network.groups) == 2
+    np.testing.assert_array_equal(network.groups[0]["stations"], [0, 1])
+    assert network.groups[0]["Nd"].shape == (2, 40, len(stations[0].diameter["data"]))
+    np.testing.assert_array_equal(network.missing.sum(axis=1), [0, 20, 0])
+    np.testing.assert_array_equal(network.missing[1], np.arange(40) % 2 == 1)
+
+    strict = DSDNetwork(stations, times=times, tolerance=0)
+    assert np.all(strict.missing[2])
+
+    union = DSDNetwork(stations)
+    assert union.numt == 80
+    np.testing.assert_array_equal(union.missing.sum(axis=1), [40, 60, 40])
+
+
+def test_network_matches_stations(stations):
+    first = stations[0]
+    network = DSDNetwork(stations, times=first.time["data"])
+    network.calculate_RR()
+    network.calculate_dsd_parameterization()
+    network.fit_gamma()
+    network.calculate_radar_parameters(backend="rayleigh_spheroid")
+
+    expected = first.isel(slice(None))
+    expected.calculate_RR()
+    expected.calculate_dsd_parameterization()
+    for name in ["rain_rate", "Nt", "W", "Dm", "Nw", "D0", "Dmax"]:
+        data = network.fields[name]["data"]
+        assert data.shape == (3, 40)
+        np.testing.assert_allclose(
+            data[0][1:], expected.fields[name]["data"][1:], rtol=1e-6
+        )
+        np.testing.assert_allclose(
+            data[1][::2], expected.fields[name]["data"][::2], rtol=1e-6
+        )
+        assert np.all(data.mask[1][1::2])
+
+    expected.fit_gamma()
+    for name in ["mu", "Lambda", "N0"]:
+        np.testing.assert_allclose(
+            network.fields[name]["data"][0][1:],
+            expected.fields[name]["data"][1:],
+            rtol=1e-6,
+        )
+
+    expected.calculate_radar_parameters(backend="rayleigh_spheroid")
+    for name in ["Zh", "Zdr", "Kdp", "Ai"]:
+        np.testing.assert_allclose(
+            network.fields[name]["data"][0][1:],
+            expected.fields[name]["data"][1:],
+            rtol=1e-6,
+        )
+    assert "scattering_table" in network.groups[1]
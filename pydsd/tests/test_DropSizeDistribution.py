@@ -2,13 +2,16 @@ import pytest
 import os.path
 import numpy as np
 import copy
+import netCDF4
 
 from ..aux_readers import ARM_Vdis_Reader
 from ..io import ARM_vdisdrops_reader
 from ..io.NetCDFWriter import write_netcdf
 from .. import DropSizeDistribution
-from ..aux_readers import ARM_APU_reader
+from ..aux_readers import ARM_APU_reader, ARM_JWD_Reader
+from ..io import ParsivelReader
 from ..utility import filter
+from .synthetic import normalized_gamma, synthetic_dsd
 
 
 @pytest.fixture
@@ -19,6 +22,21 @@ def two_dvddrops_open_test_file(tmpdir):
     return dsd
 
 
+@pytest.fixture(scope="module")
+def gamma_dsd():
+    rng = np.random.default_rng(0)
+    D0 = rng.uniform(0.8, 2.5, (200, 1))
+    mu = rng.uniform(0, 5, (200, 1))
+    Nw = 10 ** rng.uniform(3, 4.5, (200, 1))
+    dsd = synthetic_dsd(
+        lambda D: normalized_gamma(D, D0, mu, Nw)
+        * rng.lognormal(0, 0.1, (200, len(D)))
+    )
+    dsd.calculate_RR()
+    dsd.calculate_radar_parameters(backend="rayleigh_spheroid")
+    return dsd
+
+
 @pytest.fixture
 def two_dvd_open_test_file(tmpdir):
     filename_in = "testdata/arm_vdis_b1.cdf"
@@ -85,6 +103,20 @@ class TestDropSizeDistribution(object):
             scatter_table_filename=tmpdir + "/test_scatter.scatter"
         )
 
+    def test_scatter_table_file_needs_tmatrix(self, two_dvd_open_test_file, tmpdir):
+        filename = tmpdir + "/test_scatter.scatter"
+        with pytest.raises(ValueError):
+            two_dvd_open_test_file.calculate_radar_parameters(
+                scatter_table_filename=filename, backend="rayleigh_spheroid"
+            )
+        two_dvd_open_test_file.fields["temperature"] = {
+            "data": np.full(two_dvd_open_test_file.numt, 10.0)
+        }
+        with pytest.raises(ValueError):
+            two_dvd_open_test_file.calculate_radar_parameters(
+                scatter_table_filename=filename, temperature_field="temperature"
+            )
+
     def test_calculate_spectrum_accepts_function(self, parsivel_open_test_file):
         parsivel_open_test_file.calculate_dsd_from_spectrum(
             effective_sampling_area=filter.parsivel_sampling_area
@@ -113,3 +145,273 @@ class TestDropSizeDistribution(object):
             two_dvddrops_open_test_file.fields["Nd"]["source"]
             == "Calculated from spectrum."
         )
+
+    def test_calculate_relationship_matches_R_Zh_relationship(self, gamma_dsd):
+        popt, pcov, ci = gamma_dsd.calculate_relationship(["Zh"])
+        R_Zh_popt, R_Zh_pcov = gamma_dsd.calculate_R_Zh_relationship()
+
+        assert ci is None
+        np.testing.assert_allclose(popt, R_Zh_popt, rtol=1e-6)
+        np.testing.assert_allclose(pcov, R_Zh_pcov, rtol=1e-4)
+
+        popt, pcov, ci = gamma_dsd.calculate_relationship(
+            ["Zh", "Zdr"], n_boot=50, random_state=0
+        )
+        assert ci.shape == (2, 3)
+        assert np.all((ci[0] < popt) & (popt < ci[1]))
+
+    def test_calculate_grouped_relationship(self, gamma_dsd):
+        labels = np.ma.masked_array(np.arange(gamma_dsd.numt) % 3)
+        labels[-1] = np.ma.masked
+        groups = gamma_dsd.calculate_grouped_relationship(labels, ["Zh"])
+
+        np.testing.assert_array_equal(groups["label"], [0, 1, 2])
+        np.testing.assert_array_equal(groups["count"], [67, 66, 66])
+        dsd = copy.deepcopy(gamma_dsd)
+        dsd.fields["rain_rate"]["data"] = np.ma.masked_where(
+            labels != 1, dsd.fields["rain_rate"]["data"]
+        )
+        np.testing.assert_allclose(
+            groups["popt"][1], dsd.calculate_relationship(["Zh"])[0], rtol=1e-6
+        )
+
+    def test_fit_gamma_ua98(self):
+        mu = np.array([0.0, 3.0])
+        Lambda = (3.67 + mu) / 1.5
+        dsd = synthetic_dsd(
+            lambda D: [8000 * D ** m * np.exp(-l * D) for m, l in zip(mu, Lambda)]
+            + [np.zeros(len(D))]
+        )
+        D = dsd.diameter["data"]
+        dsd.fit_gamma(method="ua98")
+
+        np.testing.assert_allclose(dsd.fields["mu"]["data"][:2], mu, atol=0.01)
+        np.testing.assert_allclose(dsd.fields["Lambda"]["data"][:2], Lambda, rtol=0.01)
+        np.testing.assert_allclose(dsd.fields["D0"]["data"][:2], 1.5, rtol=0.01)
+        assert dsd.fields["mu"]["data"].mask[2]
+        np.testing.assert_allclose(
+            dsd._calc_mth_moment(3), [np.dot(D ** 3 * Nd, dsd.spread["data"]) for Nd in dsd.Nd["data"]]
+        )
+        with pytest.raises(ValueError):
+            dsd.fit_gamma(method="mse")
+
+    def test_fit_gamma_truncated_moments(self):
+        mu = np.array([0.0, 3.0, 6.0])
+        Lambda = (3.67 + mu) / np.array([1.5, 0.8, 2.5])
+        dsd = synthetic_dsd(
+            lambda D: [8000 * D ** m * np.exp(-l * D) for m, l in zip(mu, Lambda)]
+        )
+        dsd.fit_gamma(method="truncated_moments")
+
+        np.testing.assert_allclose(dsd.fields["mu"]["data"], mu, atol=0.1)
+        np.testing.assert_allclose(dsd.fields["Lambda"]["data"], Lambda, rtol=0.03)
+        assert "truncated_moments" in dsd.fields["mu"]["source"]
+
+    def test_rain_events(self, gamma_dsd):
+        dsd = gamma_dsd
+        rain_rate = dsd.fields["rain_rate"]["data"]
+        dry = np.zeros(dsd.numt, dtype=bool)
+        dry[50:90] = dry[150:] = True
+        dsd.fields["rain_rate"]["data"] = np.ma.where(dry, 0, rain_rate)
+        try:
+            index = dsd.find_rain_events(min_gap=600)
+            assert dsd.events is index
+            np.testing.assert_array_equal(index.start, [0, 90])
+            np.testing.assert_array_equal(index.stop, [50, 150])
+
+            statistics = dsd.event_statistics()
+            np.testing.assert_allclose(
+                statistics["accumulation"],
+                [np.sum(rain_rate[:50]) / 60.0, np.sum(rain_rate[90:150]) / 60.0],
+            )
+            np.testing.assert_allclose(
+                statistics["peak_rain_rate"],
+                [np.max(rain_rate[:50]), np.max(rain_rate[90:150])],
+            )
+            np.testing.assert_allclose(statistics["duration"], [49 * 60, 59 * 60])
+        finally:
+            dsd.fields["rain_rate"]["data"] = rain_rate
+
+    def test_isel_sel(self, two_dvddrops_open_test_file):
+        dsd = two_dvddrops_open_test_file
+        times = dsd.time["data"]
+
+        subset = dsd.isel(slice(10, 20))
+        assert subset.numt == 10
+        np.testing.assert_array_equal(subset.time["data"], times[10:20])
+        assert subset.Nd is subset.fields["Nd"]
+        assert np.shares_memory(subset.Nd["data"], dsd.Nd["data"])
+        assert np.shares_memory(
+            subset.fields["drop_spectrum"]["data"], dsd.fields["drop_spectrum"]["data"]
+        )
+        np.testing.assert_array_equal(
+            subset.fields["drop_spectrum"]["data"], dsd.fields["drop_spectrum"]["data"][10:20]
+        )
+        np.testing.assert_array_equal(subset.diameter["data"], dsd.diameter["data"])
+        assert dsd.numt == len(times)
+
+        picked = dsd.isel(np.array([3, 1]))
+        np.testing.assert_array_equal(picked.time["data"], times[[3, 1]])
+        assert picked.fields["number_measured_drops"]["data"].shape[0] == 2
+        assert dsd.isel(-1).numt == 1
+
+        window = dsd.sel(times[5], times[9])
+        np.testing.assert_array_equal(window.time["data"], times[5:10])
+        assert np.shares_memory(window.Nd["data"], dsd.Nd["data"])
+        start = netCDF4.num2date(times[5], dsd.time["units"], only_use_cftime_datetimes=False)
+        np.testing.assert_array_equal(
+            dsd.sel(start=start).time["data"], times[5:]
+        )
+        np.testing.assert_array_equal(
+            dsd.sel(end=np.datetime64(start.replace(tzinfo=None))).time["data"],
+            times[:6],
+        )
+        assert dsd.sel(times[-1] + 1).numt == 0
+
+    def test_isel_indexes_only_time_dimension(self):
+        dsd = ARM_JWD_Reader.read_arm_jwd_b1(
+            "testdata/sgpdisdrometerC1.b1.20110427.000000_test_jwd_b1.cdf"
+        )
+        num_bins = len(dsd.diameter["data"])
+        velocity = dsd.fields["velocity"]["data"]
+
+        # numt equal to the number of bins must not slice the per bin fields.
+        subset = dsd.isel(np.arange(num_bins) % 2).isel(slice(0, 3))
+        assert subset.numt == 3
+        np.testing.assert_array_equal(subset.fields["velocity"]["data"], velocity)
+        binned = dsd.isel(np.arange(num_bins) % 2)
+        aggregated = binned.aggregate_to(binned.time["data"][:3], window=60)
+        np.testing.assert_array_equal(aggregated.fields["velocity"]["data"], velocity)
+
+        parsivel = ParsivelReader.read_parsivel(
+            "testdata/parsivel_telegraph_testfile.mis"
+        )
+        times = np.asarray(parsivel.time["data"])
+        np.testing.assert_array_equal(parsivel.isel(0).time["data"], times[:1])
+        wet = np.arange(parsivel.numt) % 3 == 0
+        np.testing.assert_array_equal(parsivel.isel(wet).time["data"], times[wet])
+        assert parsivel.isel(wet).Nd["data"].shape[0] == wet.sum()
+
+    def test_time_join_and_aggregate(self, two_dvddrops_open_test_file):
+        dsd = two_dvddrops_open_test_file
+        times = dsd.time["data"]
+        coarse = dsd.isel(slice(0, None, 5))
+
+        indices, (coarse_indices,) = dsd.time_join(coarse, tolerance=0)
+        np.testing.assert_array_equal(indices, np.arange(0, dsd.numt, 5))
+        np.testing.assert_array_equal(coarse_indices, np.arange(len(indices)))
+
+        interval = np.median(np.diff(times))
+        aggregated = dsd.aggregate_to(coarse, window=5 * interval)
+        assert aggregated.numt == coarse.numt
+        assert aggregated.Nd is aggregated.fields["Nd"]
+        np.testing.assert_allclose(
+            aggregated.Nd["data"][1], np.mean(dsd.Nd["data"][5:10], axis=0)
+        )
+        np.testing.assert_allclose(
+            aggregated.fields["number_measured_drops"]["data"][1],
+            np.sum(dsd.fields["number_measured_drops"]["data"][5:10], axis=0),
+        )
+        np.testing.assert_array_equal(aggregated.time["data"], coarse.time["data"])
+
+        sparse = dsd.aggregate_to(times[:3], window=interval / 2, min_samples=2)
+        assert np.all(sparse.Nd["data"].mask)
+
+    def test_compact_storage(self, two_dvddrops_open_test_file):
+        dsd = two_dvddrops_open_test_file
+        dsd.calculate_RR()
+        dsd.calculate_dsd_parameterization()
+        expected = {
+            name: np.ma.filled(dsd.fields[name]["data"], np.nan)
+            for name in ["rain_rate", "Nt", "D0", "Dm"]
+        }
+        full_size = sum(dsd.memory_usage().values())
+
+        compact = ARM_vdisdrops_reader.read_arm_vdisdrops_netcdf(
+            "testdata/corvdisdropsM1.b1.20181214.020816.cdf", dtype="uint16"
+        )
+        assert compact.dtype == np.uint16
+        assert compact.fields["drop_spectrum"]["data"].dtype == np.uint16
+        assert compact.fields["number_measured_drops"]["data"].dtype == np.uint16
+        assert compact.Nd["data"].dtype == np.float32
+        assert compact.Nd is compact.fields["Nd"]
+        assert sum(compact.memory_usage().values()) < full_size / 3
+
+        compact.calculate_RR()
+        compact.calculate_dsd_parameterization()
+        for name, values in expected.items():
+            np.testing.assert_allclose(
+                np.ma.filled(compact.fields[name]["data"], np.nan), values, rtol=1e-5
+            )
+        compact.calculate_dsd_from_spectrum()
+        assert compact.Nd["data"].dtype == np.float32
+
+        counts = compact.fields["number_measured_drops"]["data"]
+        masked = np.ma.array(counts, mask=np.zeros(counts.shape, dtype=bool))
+        masked[3, :10] = np.ma.masked
+        compact.fields["number_measured_drops"]["data"] = masked
+        compact.compact("uint16")
+        mask = compact.field_mask("number_measured_drops")
+        assert mask.shape == counts.shape
+        assert mask[3, :10].all() and mask.sum() == 10
+        assert not np.ma.isMaskedArray(compact.fields["number_measured_drops"]["data"])
+        selected = compact.isel(slice(2, 5))
+        assert selected.field_mask("number_measured_drops")[1, :10].all()
+
+        with pytest.raises(ValueError):
+            compact.compact("int8")
+
+    def test_compact_storage_partially_masked_nd(self):
+        dsd = ARM_Vdis_Reader.read_arm_vdis_b1("testdata/arm_vdis_b1.cdf")
+        Nd = np.ma.array(dsd.Nd["data"], mask=np.zeros(dsd.Nd["data"].shape, bool))
+        Nd[5:10, 3:6] = np.ma.masked
+        Nd[12] = np.ma.masked
+        dsd.Nd["data"] = Nd
+        compact = copy.deepcopy(dsd)
+        compact.compact("float32")
+        assert compact.Nd["data"].dtype == np.float32
+        assert compact.field_mask("Nd")[5:10, 3:6].all()
+        assert compact.field_mask("Nd").sum() == 15 + Nd.shape[1]
+
+        for record in (dsd, compact):
+            record.calculate_RR()
+            record.calculate_dsd_parameterization()
+        for name in ["rain_rate", "Nt", "Nw", "W", "D0"]:
+            values = np.ma.filled(compact.fields[name]["data"][5:10], np.nan)
+            assert np.all(np.isfinite(values)), name
+            np.testing.assert_allclose(
+                values,
+                np.ma.filled(dsd.fields[name]["data"][5:10], np.nan),
+                rtol=1e-5,
+                err_msg=name,
+            )
+
+        # A missing spectrum stays missing, it is not read as a dry one.
+        np.testing.assert_array_equal(
+            np.ma.getmaskarray(compact.fields["rain_rate"]["data"]),
+            np.ma.getmaskarray(dsd.fields["rain_rate"]["data"]),
+        )
+        assert np.ma.getmaskarray(dsd.fields["rain_rate"]["data"])[12]
+        for name in ["Nt", "Nw", "W", "D0", "Dmax"]:
+            mask = np.ma.getmaskarray(compact.fields[name]["data"])
+            assert mask[12] and mask.sum() == 1, name
+
+    def test_fit_gamma_mle(self, two_dvddrops_open_test_file):
+        dsd = two_dvddrops_open_test_file
+        dsd.fit_gamma_mle(n_jobs=1)
+
+        for param in ["Nw", "D0", "mu", "Lambda", "N0", "Z_R_a", "Z_R_b"]:
+            assert len(dsd.fields[param]["data"]) == dsd.numt
+        mu = dsd.fields["mu"]["data"]
+        enough_drops = np.sum(dsd.fields["number_measured_drops"]["data"], axis=1) >= 10
+        assert mu.count() <= np.sum(enough_drops)
+        assert mu.count() > 0.8 * np.sum(enough_drops)
+        assert np.ma.all((mu > -3) & (mu < 30))
+        D0 = dsd.fields["D0"]["data"]
+        np.testing.assert_allclose(
+            dsd.fields["Lambda"]["data"], (3.67 + mu) / D0, rtol=1e-10
+        )
+
+        del dsd.fields["number_measured_drops"], dsd.fields["drop_spectrum"]
+        with pytest.raises(ValueError):
+            dsd.fit_gamma_mle()
@@ -2,6 +2,7 @@ import numpy as np
 from unittest import TestCase
 
 from .. import read_noaa_aoml_netcdf, read_ucsc_netcdf
+from ..io import Image2DReader
 
 
 class TestUCSCReader(TestCase):
@@ -30,3 +31,44 @@ class TestNOAAAOMLReader(TestCase):
 
     def test_dsd_has_3_entries(self):
         self.assertTrue(len(self.dsd.Nd["data"]) == 3)
+
+
+class TestImage2DRemapping(TestCase):
+    """ Test the interpolation and averaging helpers of the Image2D Reader
+    """
+
+    def test_remap_matches_linear_interpolation(self):
+        source = np.array([3.0, 0.0, 1.0, 2.0, 5.0])
+        target = np.array([-1.0, 0.0, 0.5, 2.25, 4.0, 5.0, 6.0])
+        values = np.column_stack((source ** 2, np.sin(source)))
+
+        remapped = Image2DReader.remap_to_grid(source, target, values)
+
+        order = np.argsort(source)
+        for col in range(values.shape[1]):
+            expected = np.interp(
+                target, source[order], values[order, col], left=np.nan, right=np.nan
+            )
+            np.testing.assert_allclose(remapped[:, col], expected)
+
+    def test_interpolation_weights_are_cached(self):
+        source = np.arange(10.0)
+        target = np.linspace(0, 9, 25)
+        first = Image2DReader.interpolation_weights(source, target)
+        second = Image2DReader.interpolation_weights(source.copy(), target.copy())
+        self.assertIs(first[0], second[0])
+
+    def test_running_average_matches_convolution(self):
+        reader = Image2DReader.Image2DReader.__new__(Image2DReader.Image2DReader)
+        data = np.random.RandomState(0).rand(4, 40)
+        weights = np.repeat(1.0, 6) / 6
+
+        averaged = reader.apply_running_average(data, dim=1, num=6)
+        for row in range(data.shape[0]):
+            expected = np.convolve(data[row], weights, "valid")[::6]
+            np.testing.assert_allclose(averaged[row], expected)
+
+        np.testing.assert_allclose(
+            reader.apply_running_average(data[0], dim=0, num=6),
+            np.convolve(data[0], weights, "valid")[::6],
+        )
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from ..aux_readers import ARM_Vdis_Reader
+from ..io.ParquetWriter import write_parquet, write_parquet_batch, time_fields
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def dsd():
+    dsd = ARM_Vdis_Reader.read_arm_vdis_b1("testdata/arm_vdis_b1.cdf")
+    dsd.calculate_dsd_parameterization()
+    return dsd
+
+
+class TestParquetWriter(object):
+    """
+    Test module for the Parquet export of per time fields.
+    """
+
+    def test_time_fields_are_one_dimensional(self, dsd):
+        names = time_fields(dsd)
+        assert "D0" in names
+        assert "rain_rate" in names
+        assert "Nd" not in names
+
+    def test_write_parquet(self, dsd, tmpdir):
+        filename = str(tmpdir.join("dsd.parquet"))
+        dsd.to_parquet(filename, station="sgp_c1", location=(36.6, -97.5))
+        table = pq.read_table(filename)
+
+        assert table.num_rows == dsd.numt
+        assert set(time_fields(dsd)) <= set(table.column_names)
+        assert table.schema.field("station").type.value_type == "string"
+        assert table.column("station")[0].as_py() == "sgp_c1"
+        assert table.column("latitude")[0].as_py() == 36.6
+        assert table.schema.field("D0").metadata[b"units"] == b"mm"
+
+        D0 = np.ma.masked_invalid(dsd.fields["D0"]["data"])
+        stored = table.column("D0").to_numpy(zero_copy_only=False)
+        np.testing.assert_allclose(stored[~D0.mask], D0.compressed())
+        assert np.isnan(stored[D0.mask]).all()
+
+    def test_row_groups(self, dsd, tmpdir):
+        filename = str(tmpdir.join("dsd.parquet"))
+        write_parquet(dsd, filename, row_group_size=500)
+        assert pq.ParquetFile(filename).num_row_groups == 3
+
+    def test_write_parquet_batch(self, dsd, tmpdir):
+        filename = str(tmpdir.join("network.parquet"))
+        other = ARM_Vdis_Reader.read_arm_vdis_b1("testdata/arm_vdis_b1.cdf")
+        write_parquet_batch(
+            [dsd, other], filename, stations=["first", "second"], row_group_size=1000
+        )
+        table = pq.read_table(filename)
+
+        assert table.num_rows == 2 * dsd.numt
+        stations = table.column("station").to_pylist()
+        assert stations[0] == "first"
+        assert stations[-1] == "second"
+        # The second station has no DSD parameters calculated.
+        assert table.column("D0").slice(dsd.numt).null_count == other.numt
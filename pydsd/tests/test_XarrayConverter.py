@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import unittest
+
+from ..DropSizeDistribution import DropSizeDistribution
+from ..aux_readers import ARM_Vdis_Reader
+from ..io import ARM_vdisdrops_reader
+
+pytest.importorskip("xarray")
+
+
+class TestXarrayConverter(unittest.TestCase):
+    """
+    Test module for the xarray conversion of DropSizeDistribution objects.
+    """
+
+    def setUp(self):
+        filename = "testdata/arm_vdis_b1.cdf"
+        self.dsd = ARM_Vdis_Reader.read_arm_vdis_b1(filename)
+
+    def test_to_xarray_has_fields_and_coords(self):
+        ds = self.dsd.to_xarray()
+        self.assertIn("Nd", ds)
+        self.assertEqual(ds["Nd"].dims, ("time", "diameter"))
+        self.assertEqual(ds.sizes["time"], self.dsd.numt)
+        self.assertEqual(ds["Nd"].attrs["units"], self.dsd.fields["Nd"]["units"])
+
+    def test_to_xarray_does_not_copy(self):
+        ds = self.dsd.to_xarray()
+        self.assertTrue(
+            np.shares_memory(ds["Nd"].values, np.ma.getdata(self.dsd.fields["Nd"]["data"]))
+        )
+
+    def test_round_trip(self):
+        ds = self.dsd.to_xarray()
+        dsd = DropSizeDistribution.from_xarray(ds)
+        np.testing.assert_array_equal(
+            dsd.fields["Nd"]["data"], self.dsd.fields["Nd"]["data"]
+        )
+        np.testing.assert_array_equal(
+            dsd.diameter["data"], self.dsd.diameter["data"]
+        )
+        self.assertEqual(dsd.numt, self.dsd.numt)
+        self.assertTrue(
+            np.shares_memory(dsd.fields["Nd"]["data"], ds["Nd"].values)
+        )
+
+    def test_masked_values_round_trip(self):
+        Nd = np.ma.array(self.dsd.fields["Nd"]["data"], copy=True)
+        Nd[0, :] = np.ma.masked
+        self.dsd.fields["Nd"]["data"] = Nd
+
+        ds = self.dsd.to_xarray()
+        self.assertIn("Nd_mask", ds)
+        self.assertTrue(ds["Nd_mask"].values[0].all())
+
+        dsd = DropSizeDistribution.from_xarray(ds)
+        np.testing.assert_array_equal(
+            np.ma.getmaskarray(dsd.fields["Nd"]["data"]), np.ma.getmaskarray(Nd)
+        )
+
+    def test_masked_as_nan(self):
+        Nd = np.ma.array(self.dsd.fields["Nd"]["data"], copy=True)
+        Nd[0, :] = np.ma.masked
+        self.dsd.fields["Nd"]["data"] = Nd
+
+        ds = self.dsd.to_xarray(masked="nan")
+        self.assertNotIn("Nd_mask", ds)
+        self.assertTrue(np.isnan(ds["Nd"].values[0]).all())
+
+    def test_bin_field_dims_when_numt_equals_bins(self):
+        dsd = self.dsd.isel(slice(0, len(self.dsd.diameter["data"])))
+        dsd.fields["terminal_velocity"] = {"data": dsd.velocity["data"]}
+        ds = dsd.to_xarray()
+        self.assertEqual(ds["terminal_velocity"].dims, ("diameter",))
+        self.assertEqual(ds["Nd"].dims, ("time", "diameter"))
+
+    def test_drop_spectrum_dims(self):
+        filename = "testdata/corvdisdropsM1.b1.20181214.020816.cdf"
+        dsd = ARM_vdisdrops_reader.read_arm_vdisdrops_netcdf(filename)
+        ds = dsd.to_xarray()
+        self.assertEqual(ds["drop_spectrum"].dims, ("time", "velocity", "diameter"))
+
+        round_trip = DropSizeDistribution.from_xarray(ds)
+        np.testing.assert_array_equal(
+            round_trip.spectrum_fall_velocity["data"],
+            dsd.spectrum_fall_velocity["data"],
+        )
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pytest
+
+from ..aux_readers import ARM_Vdis_Reader
+from ..io import ARM_vdisdrops_reader
+from ..io.ZarrStore import write_zarr, read_zarr, ZarrStore
+
+
+@pytest.fixture
+def dsd():
+    dsd = ARM_Vdis_Reader.read_arm_vdis_b1("testdata/arm_vdis_b1.cdf")
+    dsd.calculate_dsd_parameterization()
+    return dsd
+
+
+class TestZarrStore(object):
+    """
+    Test module for the chunked directory store.
+    """
+
+    def test_round_trip(self, dsd, tmpdir):
+        path = str(tmpdir.join("dsd.zarr"))
+        write_zarr(dsd, path, time_chunk=100)
+        stored = read_zarr(path)
+
+        assert stored.numt == dsd.numt
+        np.testing.assert_array_equal(stored.diameter["data"], dsd.diameter["data"])
+        for name in ("Nd", "D0", "Nw", "mu", "rain_rate"):
+            original = np.ma.masked_invalid(np.ma.asarray(dsd.fields[name]["data"]))
+            assert np.ma.allclose(stored.fields[name]["data"], original)
+            assert stored.fields[name]["units"] == dsd.fields[name]["units"]
+
+    def test_time_chunks_and_compression(self, dsd, tmpdir):
+        path = str(tmpdir.join("dsd.zarr"))
+        write_zarr(dsd, path, time_chunk=100, compression={"Nd": None})
+        store = ZarrStore(path)
+
+        assert store.variables["Nd"].meta["chunks"] == [100, len(dsd.diameter["data"])]
+        assert store.variables["Nd"].meta["compressor"] is None
+        assert store.variables["D0"].meta["compressor"]["id"] == "zlib"
+        assert os.path.isfile(os.path.join(path, "Nd", "14.0"))
+
+    def test_time_range_reads_only_overlapping_chunks(self, dsd, tmpdir):
+        path = str(tmpdir.join("dsd.zarr"))
+        write_zarr(dsd, path, time_chunk=100)
+        time = np.asarray(dsd.time["data"])
+
+        # Reading must not need chunks outside of the requested range.
+        os.remove(os.path.join(path, "Nd", "0.0"))
+        selected = read_zarr(path, start=time[150], end=time[250])
+
+        assert selected.numt == 101
+        np.testing.assert_array_equal(selected.time["data"], time[150:251])
+        assert np.ma.allclose(
+            selected.fields["Nd"]["data"], dsd.fields["Nd"]["data"][150:251]
+        )
+
+    def test_append(self, dsd, tmpdir):
+        path = str(tmpdir.join("dsd.zarr"))
+        time = np.asarray(dsd.time["data"])
+
+        write_zarr(dsd, path, time_chunk=100)
+        later = ARM_Vdis_Reader.read_arm_vdis_b1("testdata/arm_vdis_b1.cdf")
+        later.time["data"] = later.time["data"] + (time[-1] - time[0] + 60)
+        write_zarr(later, path, mode="a")
+
+        stored = read_zarr(path)
+        assert stored.numt == 2 * dsd.numt
+        assert np.ma.allclose(
+            stored.fields["Nd"]["data"][dsd.numt :], later.fields["Nd"]["data"]
+        )
+        # Fields missing from the appended record are masked.
+        assert stored.fields["D0"]["data"][dsd.numt :].mask.all()
+
+    def test_append_rejects_overlapping_times(self, dsd, tmpdir):
+        path = str(tmpdir.join("dsd.zarr"))
+        write_zarr(dsd, path)
+        with pytest.raises(ValueError):
+            write_zarr(dsd, path, mode="a")
+
+    def test_drop_spectrum(self, tmpdir):
+        filename = "testdata/corvdisdropsM1.b1.20181214.020816.cdf"
+        dsd = ARM_vdisdrops_reader.read_arm_vdisdrops_netcdf(filename)
+        path = str(tmpdir.join("spectrum.zarr"))
+        write_zarr(dsd, path)
+        stored = read_zarr(path)
+
+        assert ZarrStore(path).variables["drop_spectrum"].dims == (
+            "time",
+            "velocity",
+            "diameter",
+        )
+        assert np.ma.allclose(
+            stored.fields["drop_spectrum"]["data"], dsd.fields["drop_spectrum"]["data"]
+        )
+        np.testing.assert_array_equal(
+            stored.spectrum_fall_velocity["data"], dsd.spectrum_fall_velocity["data"]
+        )
+
+    def test_bool_field(self, dsd, tmpdir):
+        path = str(tmpdir.join("dsd.zarr"))
+        wet = np.ma.asarray(np.arange(dsd.numt) % 2 == 0)
+        wet[:3] = np.ma.masked
+        dsd.fields["wet"] = {"data": wet}
+        dsd.fields["names"] = {"data": np.array(["a"] * dsd.numt, dtype=object)}
+        with pytest.warns(UserWarning):
+            write_zarr(dsd, path)
+        stored = read_zarr(path).fields["wet"]["data"]
+
+        assert stored.dtype == bool
+        np.testing.assert_array_equal(stored.mask, wet.mask)
+        np.testing.assert_array_equal(stored[3:], wet[3:])
+        assert "dtype" not in ZarrStore(path).variables["wet"].attrs
+
+    def test_bin_field_when_numt_equals_bins(self, dsd, tmpdir):
+        path = str(tmpdir.join("dsd.zarr"))
+        num_diameter = len(dsd.diameter["data"])
+        dsd = dsd.isel(slice(0, num_diameter))
+        dsd.fields["terminal_velocity"] = {"data": dsd.velocity["data"]}
+        write_zarr(dsd, path, time_chunk=10)
+        time = np.asarray(dsd.time["data"])
+        selected = read_zarr(path, start=time[5], end=time[14])
+
+        assert ZarrStore(path).variables["terminal_velocity"].dims == ("diameter",)
+        np.testing.assert_array_equal(
+            selected.fields["terminal_velocity"]["data"], dsd.velocity["data"]
+        )
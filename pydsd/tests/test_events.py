@@ -0,0 +1,56 @@
+import numpy as np
+import unittest
+
+from ..utility import events
+
+
+class TestEvents(unittest.TestCase):
+    """ Test rain event segmentation and per event reductions."""
+
+    def setUp(self):
+        self.times = np.arange(20) * 60.0
+        self.rain_rate = np.zeros(20)
+        self.rain_rate[[2, 3, 5]] = [1.0, 4.0, 2.0]
+        self.rain_rate[[12, 13]] = [0.5, np.nan]
+        self.rain_rate[15] = 3.0
+
+    def test_find_events_splits_on_gaps(self):
+        index = events.find_events(self.rain_rate > 0.1, self.times, min_gap=120)
+        np.testing.assert_array_equal(index.start, [2, 12, 15])
+        np.testing.assert_array_equal(index.stop, [6, 13, 16])
+        np.testing.assert_array_equal(
+            index.labels(),
+            [-1, -1, 0, 0, 0, 0] + [-1] * 6 + [1, -1, -1, 2] + [-1] * 4,
+        )
+        self.assertEqual([s for s in index], [slice(2, 6), slice(12, 13), slice(15, 16)])
+
+        merged = events.find_events(self.rain_rate > 0.1, self.times, min_gap=300)
+        np.testing.assert_array_equal(merged.start, [2, 12])
+        np.testing.assert_array_equal(merged.stop, [6, 16])
+
+        long_events = events.find_events(
+            self.rain_rate > 0.1, self.times, min_gap=120, min_duration=60
+        )
+        np.testing.assert_array_equal(long_events.start, [2])
+
+    def test_reductions(self):
+        index = events.find_events(self.rain_rate > 0.1, self.times, min_gap=300)
+        np.testing.assert_allclose(index.reduce(self.rain_rate, "sum"), [7.0, 3.5])
+        np.testing.assert_allclose(index.reduce(self.rain_rate, "max"), [4.0, 3.0])
+        np.testing.assert_allclose(index.reduce(self.rain_rate, "min"), [0.0, 0.0])
+        np.testing.assert_allclose(index.reduce(self.rain_rate, "count"), [4, 3])
+        np.testing.assert_allclose(index.reduce(self.rain_rate, "mean"), [1.75, 3.5 / 3])
+
+        spectra = np.arange(40.0).reshape(20, 2)
+        np.testing.assert_allclose(
+            index.reduce(spectra, "sum"), [spectra[2:6].sum(0), spectra[12:16].sum(0)]
+        )
+        self.assertTrue(np.isnan(index.reduce(np.full(20, np.nan), "mean")).all())
+        with self.assertRaises(ValueError):
+            index.reduce(self.rain_rate, "median")
+
+    def test_no_events(self):
+        index = events.find_events(np.zeros(5, dtype=bool), np.arange(5), 1)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(len(index.reduce(np.ones(5), "sum")), 0)
+        np.testing.assert_array_equal(index.labels(), [-1] * 5)
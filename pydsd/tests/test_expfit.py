@@ -36,6 +36,27 @@ class Test_expfit(TestCase):
             fit[1], b, 7, "Fit of Exponent Parameter Failed for expfit with nan data"
         )
 
+    def test_expfit_handles_zeros(self):
+        """ Test whether expfit skips zero x values, and keeps zero y values."""
+
+        a = 2
+        b = 3
+        x = np.array([0, 1, 2, 3, 4, 5], dtype=float)
+        y = a * np.power(x, b)
+        fit = expfit.expfit(x, y)[0]
+        self.assertAlmostEqual(
+            fit[0], a, 7, "Fit of Scale Parameter Failed for expfit with zeros"
+        )
+        self.assertAlmostEqual(
+            fit[1], b, 7, "Fit of Exponent Parameter Failed for expfit with zeros"
+        )
+
+        y[2] = 0
+        self.assertTrue(np.all(np.isfinite(expfit.expfit(x, y)[0])))
+
+        fit = expfit.expfit2([x, x[::-1]], a * x ** b * x[::-1] ** 0.5)[0]
+        np.testing.assert_allclose(fit, [a, b, 0.5], rtol=1e-6)
+
     def test_expfit2_returns_correct_relationship(self):
         """
         Test whether or not expfit2 can model a simple two variable exponential relationship.
@@ -75,3 +96,53 @@ class Test_expfit(TestCase):
         self.assertAlmostEqual(
             fit[2], c, 7, "Fit of Second Exponent Parameter Failed for expfit2"
         )
+
+    def test_powerlaw_fit_matches_curve_fit_on_noisy_data(self):
+        """ Test whether powerlaw_fit finds the same least squares solution as curve_fit."""
+        from scipy.optimize import curve_fit
+
+        rng = np.random.default_rng(0)
+        x = 10 ** rng.uniform(1, 5, 2000)
+        y = 0.017 * np.power(x, 0.71) * rng.lognormal(0, 0.3, 2000)
+        popt, pcov = expfit.powerlaw_fit(x, y)
+        cf_popt, cf_pcov = curve_fit(
+            lambda x, a, b: a * np.power(x, b), x, y, p0=[0.02, 0.7]
+        )
+        np.testing.assert_allclose(popt, cf_popt, rtol=1e-6)
+        np.testing.assert_allclose(pcov, cf_pcov, rtol=1e-3)
+
+    def test_bootstrap_powerlaw_fit_covers_truth(self):
+        """ Test whether bootstrap intervals are reproducible and cover the true parameters."""
+        rng = np.random.default_rng(1)
+        x1 = rng.uniform(1, 100, 5000)
+        x2 = rng.uniform(1, 3, 5000)
+        y = 2 * np.power(x1, 0.5) * np.power(x2, -1) + rng.normal(0, 0.2, 5000)
+        popt, pcov, ci, replicates = expfit.bootstrap_powerlaw_fit(
+            [x1, x2], y, n_boot=200, batch_size=64, random_state=3
+        )
+        self.assertEqual(replicates.shape, (200, 3))
+        self.assertTrue(np.all((ci[0] < popt) & (popt < ci[1])))
+        self.assertTrue(np.all((ci[0] < [2, 0.5, -1]) & ([2, 0.5, -1] < ci[1])))
+        np.testing.assert_array_equal(
+            ci,
+            expfit.bootstrap_powerlaw_fit(
+                [x1, x2], y, n_boot=200, batch_size=64, random_state=3
+            )[2],
+        )
+
+    def test_grouped_powerlaw_fit_matches_per_group_fits(self):
+        """ Test whether grouped fits match fitting each group on its own."""
+        rng = np.random.default_rng(2)
+        labels = rng.integers(0, 7, 3000)
+        x = rng.uniform(1, 100, 3000)
+        y = (1 + labels) * np.power(x, 0.5 + 0.1 * labels) + rng.normal(0, 0.5, 3000)
+        groups = expfit.grouped_powerlaw_fit(x, y, labels, n_jobs=3)
+
+        np.testing.assert_array_equal(groups["label"], np.arange(7))
+        np.testing.assert_array_equal(groups["count"], np.bincount(labels))
+        for label, popt, pcov in zip(groups["label"], groups["popt"], groups["pcov"]):
+            group_popt, group_pcov = expfit.powerlaw_fit(
+                x[labels == label], y[labels == label]
+            )
+            np.testing.assert_allclose(popt, group_popt, rtol=1e-6)
+            np.testing.assert_allclose(pcov, group_pcov, rtol=1e-4)
@@ -0,0 +1,84 @@
+import copy
+import pickle
+import unittest
+
+import numpy as np
+
+from ..utility.field_store import FieldStore
+
+
+class TestFieldStore(unittest.TestCase):
+    """ Test the array backed field store."""
+
+    def setUp(self):
+        self.store = FieldStore(
+            4,
+            {
+                "rain_rate": {
+                    "data": np.ma.array([0.0, 1.0, 2.0, 3.0]),
+                    "units": "mm/h",
+                },
+                "Nd": {"data": np.ones((4, 3))},
+                "counts": {"data": np.arange(4)},
+            },
+            capacity=1,
+        )
+
+    def test_per_time_fields_share_one_buffer(self):
+        self.assertEqual(self.store.columns, ["rain_rate"])
+        rain_rate = self.store["rain_rate"]
+        self.assertIsInstance(rain_rate, dict)
+        self.assertEqual(rain_rate["units"], "mm/h")
+        self.assertTrue(np.shares_memory(rain_rate["data"], self.store._values))
+        self.assertEqual(self.store["counts"]["data"].dtype, np.arange(4).dtype)
+        self.assertIs(self.store["Nd"]["data"], self.store["Nd"]["data"])
+
+        rain_rate["data"][1] = 5.0
+        rain_rate["data"][2] = np.ma.masked
+        np.testing.assert_array_equal(
+            self.store.to_array(["rain_rate"])[:, 0], [0.0, 5.0, np.nan, 3.0]
+        )
+
+        for name in ["D0", "Dm", "Nw"]:
+            self.store[name] = {"data": np.full(4, 2.0)}
+        self.assertEqual(self.store._values.shape[1], 4)
+        self.assertTrue(np.shares_memory(rain_rate["data"], self.store._values))
+        self.assertTrue(rain_rate["data"].mask[2])
+        self.assertEqual(self.store.to_array().shape, (4, 4))
+
+    def test_assignment_and_deletion(self):
+        rain_rate = self.store["rain_rate"]
+        rain_rate["data"] = np.full(4, 7.0)
+        self.assertNotIsInstance(rain_rate["data"], np.ma.MaskedArray)
+        np.testing.assert_array_equal(self.store["rain_rate"]["data"], 7.0)
+
+        self.store["alias"] = rain_rate
+        self.assertIs(self.store["alias"], rain_rate)
+        self.store["rain_rate"] = {"data": np.zeros(4)}
+        del self.store["alias"]
+        np.testing.assert_array_equal(rain_rate["data"], 7.0)
+        self.assertFalse(np.shares_memory(rain_rate["data"], self.store._values))
+        self.store["D0"] = {"data": np.ones(4)}
+        np.testing.assert_array_equal(rain_rate["data"], 7.0)
+        np.testing.assert_array_equal(self.store["rain_rate"]["data"], 0.0)
+
+        rain_rate = self.store["rain_rate"]
+        rain_rate.update(data=np.ones(4), history="scaled")
+        self.assertEqual(self.store.columns, ["rain_rate", "D0"])
+        self.assertTrue(np.shares_memory(rain_rate["data"], self.store._values))
+
+    def test_copies(self):
+        shallow = copy.copy(self.store["rain_rate"])
+        self.assertIs(type(shallow), dict)
+
+        holder = {"store": self.store, "rain_rate": self.store["rain_rate"]}
+        copied = copy.deepcopy(holder)
+        self.assertIs(copied["rain_rate"], copied["store"]["rain_rate"])
+        copied["rain_rate"]["data"][0] = 10.0
+        self.assertEqual(self.store["rain_rate"]["data"][0], 0.0)
+
+        unpickled = pickle.loads(pickle.dumps(self.store))
+        np.testing.assert_array_equal(
+            unpickled["rain_rate"]["data"], self.store["rain_rate"]["data"]
+        )
+        self.assertEqual(unpickled.columns, ["rain_rate"])
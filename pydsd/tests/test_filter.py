@@ -0,0 +1,158 @@
+import pytest
+import numpy as np
+
+from ..io import ARM_vdisdrops_reader
+from ..utility import filter
+
+
+def reference_pcm_matrix(
+    dsd, over_fall_speed, under_fall_speed, maintain_smallest=False
+):
+    """ Fall speed matrix built bin by bin, as the original filter did. """
+    terminal_fall_speed = dsd.velocity["data"]
+    spectra_velocity = dsd.spectrum_fall_velocity["data"]
+    pcm_matrix = np.zeros((len(terminal_fall_speed), len(spectra_velocity)))
+    for idx in np.arange(0, len(terminal_fall_speed)):
+        pcm_matrix[idx] = np.logical_and(
+            spectra_velocity > (terminal_fall_speed[idx] * (1 - under_fall_speed)),
+            spectra_velocity < (terminal_fall_speed[idx] * (1 + over_fall_speed)),
+        )
+    pcm_matrix = pcm_matrix.astype(int).T
+    if maintain_smallest:
+        dbins_under_1 = np.sum(dsd.diameter["data"] <= 1)
+        vbins_under_25 = np.sum(spectra_velocity < 2.5)
+        pcm_matrix[0:vbins_under_25, 0:dbins_under_1] = 1
+    return pcm_matrix
+
+
+@pytest.fixture
+def spectrum_dsd():
+    dsd = ARM_vdisdrops_reader.read_arm_vdisdrops_netcdf(
+        "testdata/corvdisdropsM1.b1.20181214.020816.cdf"
+    )
+    dsd = dsd.isel(slice(0, 4))
+    velocity = dsd.spectrum_fall_velocity["data"]
+    diameter = dsd.diameter["data"]
+    terminal = dsd.velocity["data"]
+    spectrum = np.zeros((4, len(velocity), len(diameter)))
+    small = np.searchsorted(diameter, 1.0)
+    large = np.searchsorted(diameter, 3.0)
+
+    def velocity_bin(v):
+        return np.argmin(np.abs(velocity - v))
+
+    spectrum[:, velocity_bin(terminal[small]), small] = 20
+    spectrum[1, velocity_bin(2 * terminal[small]), small] = 1
+    spectrum[2, velocity_bin(0.2 * terminal[small]), small] = 1
+    spectrum[2, velocity_bin(0.2 * terminal[large]), large] = 1
+    spectrum[3] = 0
+    spectrum[3, velocity_bin(terminal[small]), small] = 2
+    dsd.fields["drop_spectrum"]["data"] = spectrum
+    del dsd.fields["number_measured_drops"]
+    dsd.fields["rain_rate"] = {"data": np.ma.array([1.0, 500.0, 2.0, np.nan])}
+    return dsd, small, large
+
+
+def test_quality_control_flags(spectrum_dsd):
+    dsd, small, large = spectrum_dsd
+    flags = filter.quality_control(dsd)
+    assert flags.dtype == np.uint16
+    np.testing.assert_array_equal(
+        flags, [0, filter.QC_RAIN_RATE_RANGE, 0, filter.QC_LOW_COUNT]
+    )
+    assert dsd.fields["qc_flags"]["flag_meanings"] == "low_count rain_rate_range"
+
+    bin_flags = dsd.fields["qc_bin_flags"]["data"]
+    assert bin_flags.shape == (4, len(dsd.diameter["data"]))
+    assert bin_flags[1, small] == filter.QC_MARGIN_FALLERS
+    assert bin_flags[2, small] == filter.QC_SPLASHING
+    assert bin_flags[2, large] == filter.QC_WIND
+    assert np.count_nonzero(bin_flags) == 3
+
+    flags = filter.quality_control(dsd, {"low_count": {"min_drops": 1}})
+    np.testing.assert_array_equal(flags, [0, filter.QC_RAIN_RATE_RANGE, 0, 0])
+    assert np.count_nonzero(dsd.fields["qc_bin_flags"]["data"]) == 3
+
+    with pytest.raises(ValueError):
+        filter.quality_control(dsd, ["unknown"])
+
+
+def test_skip_flagged(spectrum_dsd):
+    dsd, small, large = spectrum_dsd
+    with pytest.raises(ValueError):
+        filter.unflagged(dsd)
+    filter.quality_control(dsd)
+    np.testing.assert_array_equal(
+        filter.unflagged(dsd), [True, False, True, False]
+    )
+    np.testing.assert_array_equal(
+        filter.unflagged(dsd, filter.QC_LOW_COUNT), [True, True, True, False]
+    )
+    good_bins = filter.unflagged(dsd, bins=True)
+    assert not good_bins[2, large] and good_bins[2, 0]
+
+    Nd = dsd.Nd["data"]
+    filter.mask_flagged(dsd, bins=True)
+    masked = dsd.Nd["data"]
+    assert np.shares_memory(np.ma.getdata(masked), np.ma.getdata(Nd))
+    assert np.all(masked.mask[[1, 3]])
+    assert masked.mask[2, large] and not masked.mask[0].any()
+
+
+def test_filter_chain_is_lazy_and_fused(spectrum_dsd):
+    dsd, small, large = spectrum_dsd
+    Nd = dsd.Nd["data"].copy()
+    spectrum = dsd.fields["drop_spectrum"]["data"].copy()
+    diameter = dsd.diameter["data"]
+
+    chain = filter.FilterChain(dsd).dropsize(drop_min=0.5).dropsize(drop_max=2.0)
+    chain.parsivel_matrix(0.5, 0.5)
+    assert chain.nd_weights.shape == diameter.shape
+    filtered = chain.Nd
+    assert chain.Nd is filtered
+    np.testing.assert_array_equal(
+        filtered["data"], Nd * ((diameter > 0.5) & (diameter < 2.0))
+    )
+    assert filtered["history"].count("Filtered between") == 2
+    np.testing.assert_array_equal(dsd.Nd["data"], Nd)
+
+    np.testing.assert_array_equal(
+        chain.drop_spectrum["data"], spectrum * reference_pcm_matrix(dsd, 0.5, 0.5)
+    )
+    assert chain.drop_spectrum["data"][1, :, small].sum() == 20
+    assert chain.drop_spectrum["data"][1].sum() < spectrum[1].sum()
+
+    chain.apply()
+    assert dsd.Nd is dsd.fields["Nd"]
+    np.testing.assert_array_equal(dsd.Nd["data"], filtered["data"])
+    assert "Filtered for speeds" in dsd.fields["drop_spectrum"]["history"]
+    assert chain.nd_weights is None
+
+    Nd = filter.filter_nd_on_dropsize(dsd, drop_max=1.0, replace=False)
+    assert np.all(Nd["data"][:, diameter >= 1.0] == 0)
+    assert np.any(dsd.Nd["data"][:, diameter >= 1.0] != 0)
+
+
+@pytest.mark.parametrize(
+    "over, under, maintain_smallest",
+    [(0.5, 0.5, False), (0.5, 0.5, True), (0.3, 0.6, True)],
+)
+def test_parsivel_matrix_matches_reference(over, under, maintain_smallest):
+    dsd = ARM_vdisdrops_reader.read_arm_vdisdrops_netcdf(
+        "testdata/corvdisdropsM1.b1.20181214.020816.cdf"
+    )
+    dsd = dsd.isel(slice(0, 5))
+    spectrum = np.random.default_rng(0).poisson(
+        1.0, dsd.fields["drop_spectrum"]["data"].shape
+    ).astype(float)
+    dsd.fields["drop_spectrum"]["data"] = spectrum
+    expected = spectrum * reference_pcm_matrix(dsd, over, under, maintain_smallest)
+
+    chain = filter.FilterChain(dsd).parsivel_matrix(over, under, maintain_smallest)
+    np.testing.assert_array_equal(chain.drop_spectrum["data"], expected)
+    np.testing.assert_array_equal(
+        filter.filter_spectrum_with_parsivel_matrix(
+            dsd, over, under, replace=False, maintain_smallest=maintain_smallest
+        ),
+        expected,
+    )
@@ -0,0 +1,85 @@
+import numpy as np
+import unittest
+
+from ..fit import gamma_moments
+
+
+class TestGammaMoments(unittest.TestCase):
+    """ Test the vectorized gamma method of moments fits."""
+
+    def setUp(self):
+        self.diameter = np.arange(0.05, 12, 0.1)
+        self.spread = np.full(len(self.diameter), 0.1)
+        self.mu = np.array([0.0, 2.0, 5.0, -0.5])
+        self.Lambda = (3.67 + self.mu) / np.array([1.5, 1.0, 2.0, 0.8])
+        self.N0 = np.array([8000.0, 2e4, 3e5, 1000.0])
+        self.Nd = (
+            self.N0[:, np.newaxis]
+            * self.diameter ** self.mu[:, np.newaxis]
+            * np.exp(-self.Lambda[:, np.newaxis] * self.diameter)
+        )
+
+    def test_dsd_moments_match_sums(self):
+        moments = gamma_moments.dsd_moments(
+            self.Nd, self.diameter, self.spread, [0, 3, 4.5]
+        )
+        for n, column in zip([0, 3, 4.5], moments.T):
+            np.testing.assert_allclose(
+                column, np.sum(self.Nd * self.diameter ** n * self.spread, axis=1)
+            )
+
+    def test_fit_moments_recovers_gamma_parameters(self):
+        for orders in [(2, 4, 6), (3, 4, 6), (1, 3, 5)]:
+            moments = gamma_moments.dsd_moments(
+                self.Nd, self.diameter, self.spread, orders
+            )
+            N0, mu, Lambda = gamma_moments.fit_moments(moments, orders)
+            np.testing.assert_allclose(mu, self.mu, atol=0.05)
+            np.testing.assert_allclose(Lambda, self.Lambda, rtol=0.01)
+            np.testing.assert_allclose(N0, self.N0, rtol=0.05)
+
+    def test_fit_moments_masks_empty_spectra(self):
+        N0, mu, Lambda = gamma_moments.fit_moments(np.zeros((2, 3)))
+        self.assertTrue(np.all(np.ma.getmaskarray(mu)))
+        self.assertTrue(np.all(np.ma.getmaskarray(N0)))
+
+    def test_truncated_log_moment_matches_quadrature(self):
+        diameter = np.linspace(0.3, 6.0, 200001)
+        for n, mu, Lambda in [(2, 0.0, 2.0), (4, 3.0, 4.5), (6, -0.5, 1.2)]:
+            integrand = diameter ** (n + mu) * np.exp(-Lambda * diameter)
+            expected = np.trapz(integrand, diameter)
+            np.testing.assert_allclose(
+                np.exp(gamma_moments.truncated_log_moment(n, mu, Lambda, 0.3, 6.0)),
+                expected,
+                rtol=1e-6,
+            )
+
+    def test_fit_truncated_moments_recovers_truncated_gamma(self):
+        D_min, D_max = 0.3, 4.0
+        for orders in [(2, 4, 6), (3, 4, 6)]:
+            moments = np.column_stack(
+                [
+                    self.N0
+                    * np.exp(
+                        gamma_moments.truncated_log_moment(
+                            n, self.mu, self.Lambda, D_min, D_max
+                        )
+                    )
+                    for n in orders
+                ]
+            )
+            N0, mu, Lambda = gamma_moments.fit_truncated_moments(
+                moments, D_min, D_max, orders
+            )
+            np.testing.assert_allclose(mu, self.mu, atol=1e-5)
+            np.testing.assert_allclose(Lambda, self.Lambda, rtol=1e-5)
+            np.testing.assert_allclose(N0, self.N0, rtol=1e-4)
+
+            # Ignoring the truncation biases the untruncated fit.
+            _, untruncated_mu, _ = gamma_moments.fit_moments(moments, orders)
+            self.assertGreater(np.max(np.abs(untruncated_mu - self.mu)), 0.1)
+
+    def test_fit_truncated_moments_masks_empty_spectra(self):
+        N0, mu, Lambda = gamma_moments.fit_truncated_moments(np.zeros((2, 3)), 0.3, 8.0)
+        self.assertTrue(np.all(np.ma.getmaskarray(mu)))
+        self.assertTrue(np.all(np.ma.getmaskarray(N0)))
@@ -0,0 +1,75 @@
+import numpy as np
+import scipy.special
+import unittest
+
+from ..fit import gamma_moments, poisson_gamma
+
+
+class TestPoissonGamma(unittest.TestCase):
+    """ Test the Poisson maximum likelihood gamma fits."""
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.diameter = np.arange(0.3, 10, 0.2)
+        self.spread = np.full(len(self.diameter), 0.2)
+        velocity = 9.65 - 10.3 * np.exp(-0.6 * self.diameter)
+        self.exposure = poisson_gamma.exposure(
+            np.full(len(self.diameter), 5000.0), velocity, 60, self.spread
+        )
+        num_spectra = 500
+        self.mu = rng.uniform(-1, 8, num_spectra)
+        self.D0 = rng.uniform(0.8, 2.5, num_spectra)
+        self.Nw = 10 ** rng.uniform(2.5, 4.5, num_spectra)
+        x = self.diameter / self.D0[:, np.newaxis]
+        Nd = (
+            self.Nw[:, np.newaxis]
+            * np.exp(poisson_gamma.log_f(self.mu))[:, np.newaxis]
+            * x ** self.mu[:, np.newaxis]
+            * np.exp(-(3.67 + self.mu[:, np.newaxis]) * x)
+        )
+        self.counts = rng.poisson(Nd * self.exposure)
+
+    def test_log_f_matches_normalization(self):
+        mu = np.array([-1.0, 0.0, 3.0, 10.0])
+        expected = (
+            6.0 / 3.67 ** 4 * (3.67 + mu) ** (mu + 4) / scipy.special.gamma(mu + 4)
+        )
+        np.testing.assert_allclose(np.exp(poisson_gamma.log_f(mu)), expected)
+
+    def test_fit_recovers_parameters(self):
+        Nw, D0, mu = poisson_gamma.poisson_gamma_fit(
+            self.counts, self.diameter, self.spread, self.exposure, n_jobs=1
+        )
+        self.assertLess(np.ma.count_masked(mu), 10)
+        self.assertLess(np.ma.median(np.abs(mu - self.mu)), 0.4)
+        self.assertLess(np.ma.median(np.abs(D0 / self.D0 - 1)), 0.05)
+        self.assertLess(np.ma.median(np.abs(Nw / self.Nw - 1)), 0.1)
+
+        # More accurate than the method of moments on the same counts.
+        moments = gamma_moments.dsd_moments(
+            self.counts / self.exposure, self.diameter, self.spread, (2, 4, 6)
+        )
+        _, moment_mu, _ = gamma_moments.fit_moments(moments)
+        self.assertLess(
+            np.ma.median(np.abs(mu - self.mu)),
+            np.ma.median(np.abs(moment_mu - self.mu)),
+        )
+
+    def test_fallback_matches_vectorized_fit(self):
+        counts = self.counts[:20]
+        _, _, mu = poisson_gamma.poisson_gamma_fit(
+            counts, self.diameter, self.spread, self.exposure, n_jobs=1
+        )
+        _, _, fallback_mu = poisson_gamma.poisson_gamma_fit(
+            counts, self.diameter, self.spread, self.exposure, max_iter=0, n_jobs=2
+        )
+        np.testing.assert_allclose(fallback_mu, mu, atol=1e-3)
+
+    def test_few_drops_are_masked(self):
+        counts = np.zeros((2, len(self.diameter)))
+        counts[1, 5] = 3
+        Nw, D0, mu = poisson_gamma.poisson_gamma_fit(
+            counts, self.diameter, self.spread, self.exposure, n_jobs=1
+        )
+        self.assertTrue(np.all(np.ma.getmaskarray(mu)))
+        self.assertTrue(np.all(np.ma.getmaskarray(Nw)))
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+
+from ..io import cache
+from ..io import ParsivelReader
+from ..io import ParsivelNasaGVReader
+
+
+@pytest.fixture
+def reader_cache(tmpdir):
+    rc = cache.enable_reader_cache(str(tmpdir.join("cache")))
+    yield rc
+    cache.disable_reader_cache()
+
+
+class TestReaderCache(object):
+    """
+    Test module for the parsed reader cache.
+    """
+
+    def test_cache_disabled_by_default(self):
+        assert cache.get_reader_cache() is None
+
+    def test_parsivel_reads_match_from_cache(self, reader_cache):
+        filename = "testdata/parsivel_telegraph_testfile.mis"
+        parsed = ParsivelReader.read_parsivel(filename)
+        assert len(reader_cache.entries()) == 1
+
+        cached = ParsivelReader.read_parsivel(filename)
+        np.testing.assert_array_equal(
+            parsed.fields["Nd"]["data"], cached.fields["Nd"]["data"]
+        )
+        np.testing.assert_array_equal(parsed.time["data"], cached.time["data"])
+        np.testing.assert_array_equal(
+            parsed.fields["rain_rate"]["data"], cached.fields["rain_rate"]["data"]
+        )
+
+    def test_cache_hit_skips_parsing(self, reader_cache, monkeypatch):
+        filename = "testdata/apu_nasa_mc3e_dsd.txt"
+        parsed = ParsivelNasaGVReader.read_parsivel_nasa_gv(filename, campaign="mc3e_dsd")
+
+        def fail(*args):
+            raise AssertionError("File was parsed despite being cached.")
+
+        monkeypatch.setattr(ParsivelNasaGVReader.NASA_APU_reader, "_read_file", fail)
+        cached = ParsivelNasaGVReader.read_parsivel_nasa_gv(filename, campaign="mc3e_dsd")
+        np.testing.assert_array_equal(
+            parsed.fields["Nd"]["data"], cached.fields["Nd"]["data"]
+        )
+
+    def test_reader_options_are_part_of_key(self, reader_cache):
+        filename = "testdata/apu_nasa_mc3e_dsd.txt"
+        key = reader_cache.key(filename, "NASA_APU_reader", 1, ("mc3e_dsd", None))
+        assert key != reader_cache.key(filename, "NASA_APU_reader", 1, ("mc3e_dsd", 1))
+        assert key != reader_cache.key(filename, "NASA_APU_reader", 2, ("mc3e_dsd", None))
+
+    def test_modified_file_invalidates_entry(self, reader_cache, tmpdir):
+        filename = str(tmpdir.join("sample.txt"))
+        with open(filename, "w") as f:
+            f.write("1")
+        reader_cache.store(filename, "Reader", 1, {"a": np.arange(3)})
+        assert reader_cache.load(filename, "Reader", 1) is not None
+
+        stat = os.stat(filename)
+        os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert reader_cache.load(filename, "Reader", 1) is None
+
+    def test_eviction_keeps_cache_under_max_size(self, reader_cache, tmpdir):
+        filename = str(tmpdir.join("sample.txt"))
+        with open(filename, "w") as f:
+            f.write("1")
+        reader_cache.max_size = 20000
+        for version in range(5):
+            reader_cache.store(filename, "Reader", version, {"a": np.zeros(1000)})
+        assert reader_cache.size <= 20000
+        assert reader_cache.load(filename, "Reader", 4) is not None
+        assert reader_cache.load(filename, "Reader", 0) is None
@@ -0,0 +1,280 @@
+import numpy as np
+import pytest
+import pytmatrix
+from pytmatrix import radar, tmatrix_aux
+from pytmatrix.tmatrix import Scatterer
+
+from .. import DSR
+from ..aux_readers import ARM_Vdis_Reader
+from ..scattering import doppler, elevation, ensemble, moments, temperature
+from .synthetic import synthetic_dsd
+
+
+def gamma_nd(diameter):
+    """ Gamma DSDs with a range of median drop diameters. """
+    Nd = []
+    for D0 in [0.8, 1.2, 1.6, 2.0]:
+        for mu in [0, 3]:
+            Lambda = (3.67 + mu) / D0
+            Nd.append(8000 * diameter ** mu * np.exp(-Lambda * diameter))
+    return np.ma.array(Nd)
+
+
+@pytest.fixture(scope="module")
+def s_band_dsd():
+    dsd = synthetic_dsd(gamma_nd)
+    dsd.set_scattering_temperature_and_frequency(10, 2.8e9)
+    dsd.calculate_radar_parameters()
+    return dsd
+
+
+class TestScattering(object):
+    """
+    Test module for the scattering backends and tables.
+    """
+
+    def test_amplitude_to_phase_matches_pytmatrix(self):
+        scatterer = Scatterer(
+            radius=2.0, wavelength=33.3, m=complex(8, 2), axis_ratio=1 / 0.7
+        )
+        scatterer.set_geometry((30.0, 70.0, 10.0, 200.0, 20.0, 35.0))
+        S, Z = scatterer.get_SZ()
+        np.testing.assert_allclose(moments.amplitude_to_phase(S), Z, atol=1e-12)
+
+    def test_tmatrix_table_matches_binned_psd_integration(self, s_band_dsd):
+        scatterer = s_band_dsd.scatterer
+        for t in [0, 5]:
+            scatterer.psd = pytmatrix.psd.BinnedPSD(
+                s_band_dsd.bin_edges["data"], s_band_dsd.Nd["data"][t]
+            )
+            scatterer.set_geometry(tmatrix_aux.geom_horiz_back)
+            assert s_band_dsd.fields["Zh"]["data"][t] == pytest.approx(
+                10 * np.log10(radar.refl(scatterer))
+            )
+            scatterer.set_geometry(tmatrix_aux.geom_horiz_forw)
+            assert s_band_dsd.fields["Kdp"]["data"][t] == pytest.approx(
+                radar.Kdp(scatterer)
+            )
+            assert s_band_dsd.fields["Ai"]["data"][t] == pytest.approx(
+                radar.Ai(scatterer)
+            )
+
+    def test_dual_pol_moments_match_pytmatrix(self, s_band_dsd):
+        scatterer = s_band_dsd.scatterer
+        t = 6
+        scatterer.psd = pytmatrix.psd.BinnedPSD(
+            s_band_dsd.bin_edges["data"], s_band_dsd.Nd["data"][t]
+        )
+        scatterer.set_geometry(tmatrix_aux.geom_horiz_back)
+        fields = s_band_dsd.fields
+        assert fields["Zv"]["data"][t] == pytest.approx(
+            10 * np.log10(radar.refl(scatterer, h_pol=False))
+        )
+        assert fields["rho_hv"]["data"][t] == pytest.approx(radar.rho_hv(scatterer))
+        assert fields["LDR_h"]["data"][t] == pytest.approx(
+            10 * np.log10(radar.ldr(scatterer))
+        )
+        assert fields["LDR_v"]["data"][t] == pytest.approx(
+            10 * np.log10(radar.ldr(scatterer, h_pol=False))
+        )
+        scatterer.set_geometry(tmatrix_aux.geom_horiz_forw)
+        assert fields["Av"]["data"][t] == pytest.approx(
+            radar.Ai(scatterer, h_pol=False)
+        )
+
+    def test_rayleigh_spheroid_matches_tmatrix_at_s_band(self, s_band_dsd):
+        tmatrix_fields = {
+            name: s_band_dsd.fields[name]["data"].copy()
+            for name in ["Zh", "Zdr", "Kdp", "Ai"]
+        }
+        s_band_dsd.calculate_radar_parameters(backend="rayleigh_spheroid")
+
+        assert s_band_dsd.scattering_table.backend == "rayleigh_spheroid"
+        np.testing.assert_allclose(
+            s_band_dsd.fields["Zh"]["data"], tmatrix_fields["Zh"], atol=0.5
+        )
+        np.testing.assert_allclose(
+            s_band_dsd.fields["Zdr"]["data"], tmatrix_fields["Zdr"], atol=0.1
+        )
+        np.testing.assert_allclose(
+            s_band_dsd.fields["Kdp"]["data"], tmatrix_fields["Kdp"], rtol=0.05, atol=1e-3
+        )
+        np.testing.assert_allclose(
+            s_band_dsd.fields["Ai"]["data"], tmatrix_fields["Ai"], rtol=0.1, atol=1e-3
+        )
+
+    def test_unknown_backend_raises(self, s_band_dsd):
+        with pytest.raises(ValueError):
+            s_band_dsd.calculate_radar_parameters(backend="mie")
+
+    def test_temperature_interpolation_weights(self):
+        weights = temperature.interpolation_weights(
+            [-5.0, 0.0, 5.0, 17.5, 30.0], [0.0, 10.0, 20.0]
+        )
+        np.testing.assert_allclose(
+            weights,
+            [[1, 0, 0], [1, 0, 0], [0.5, 0.5, 0], [0, 0.25, 0.75], [0, 0, 1]],
+        )
+
+    def test_temperature_field_matches_fixed_temperature(self):
+        dsd = synthetic_dsd(gamma_nd)
+        dsd.set_scattering_temperature_and_frequency(0, 2.8e9)
+        dsd.calculate_radar_parameters(backend="rayleigh_spheroid")
+        Zh_0 = dsd.fields["Zh"]["data"].copy()
+        dsd.set_scattering_temperature_and_frequency(20, 2.8e9)
+        dsd.calculate_radar_parameters(backend="rayleigh_spheroid")
+        Zh_20 = dsd.fields["Zh"]["data"].copy()
+        Kdp_20 = dsd.fields["Kdp"]["data"].copy()
+
+        temperatures = np.where(np.arange(dsd.numt) % 2 == 0, 0.0, 20.0)
+        dsd.fields["temperature"] = {"data": np.ma.array(temperatures), "units": "C"}
+        dsd.calculate_radar_parameters(
+            backend="rayleigh_spheroid", temperature_field="temperature"
+        )
+
+        assert dsd.scattering_table.temperatures == (0.0, 10.0, 20.0)
+        np.testing.assert_allclose(dsd.fields["Zh"]["data"][::2], Zh_0[::2])
+        np.testing.assert_allclose(dsd.fields["Zh"]["data"][1::2], Zh_20[1::2])
+        np.testing.assert_allclose(dsd.fields["Kdp"]["data"][1::2], Kdp_20[1::2])
+
+    def test_single_assumption_ensemble_matches_deterministic(self):
+        dsd = synthetic_dsd(gamma_nd)
+        dsd.set_scattering_temperature_and_frequency(20, 2.8e9)
+        dsd.calculate_radar_parameters(dsr_func=DSR.bc, backend="rayleigh_spheroid")
+        dsd.calculate_radar_ensemble(
+            num_members=3,
+            canting_angles=(20,),
+            dsr_funcs=(DSR.bc,),
+            temperatures=(20,),
+            backend="rayleigh_spheroid",
+            n_jobs=1,
+        )
+
+        assert len(dsd.scattering_ensemble) == 3
+        for param in ["Zh", "Zdr", "Kdp"]:
+            np.testing.assert_allclose(
+                dsd.fields[param + "_mean"]["data"], dsd.fields[param]["data"]
+            )
+            np.testing.assert_allclose(
+                dsd.fields[param + "_p50"]["data"], dsd.fields[param]["data"]
+            )
+            np.testing.assert_allclose(
+                dsd.fields[param + "_std"]["data"], 0, atol=1e-10
+            )
+
+    def test_ensemble_statistics_are_ordered(self, s_band_dsd):
+        members = ensemble.sample_members(12, random_state=3)
+        assert members == ensemble.sample_members(12, random_state=3)
+        scattering_ensemble = ensemble.build_ensemble(
+            members,
+            s_band_dsd.bin_edges["data"],
+            2.8e9,
+            backend="rayleigh_spheroid",
+            n_jobs=2,
+        )
+        statistics = scattering_ensemble.radar_statistics(
+            s_band_dsd.Nd["data"], params=["Zdr"], chunk_size=3
+        )
+
+        Zdr = statistics["Zdr"]
+        assert Zdr["mean"].shape == (s_band_dsd.numt,)
+        assert np.all(Zdr["std"] > 0)
+        assert np.all(Zdr["p5"] <= Zdr["p50"])
+        assert np.all(Zdr["p50"] <= Zdr["p95"])
+
+    def test_redistribution_matrix_conserves_drops(self):
+        edges = doppler.velocity_edges(0.5, 3.0)
+        redistribution = doppler.redistribution_matrix(
+            np.array([0.2, 1.0, 2.9, 2.5]), np.array([0.7, 1.0, 3.5, 2.5]), edges
+        )
+        np.testing.assert_allclose(
+            redistribution,
+            [
+                [0.6, 0.4, 0, 0, 0, 0],
+                [0, 0, 1, 0, 0, 0],
+                [0, 0, 0, 0, 0, 1 / 6.0],
+                [0, 0, 0, 0, 0, 1],
+            ],
+        )
+
+    def test_doppler_spectrum_of_single_bin(self):
+        dsd = synthetic_dsd(lambda D: np.zeros((1, len(D))))
+        dsd.Nd["data"][0, 10] = 100.0
+        dsd.calculate_doppler_spectrum(
+            velocity_resolution=0.001, backend="rayleigh_spheroid"
+        )
+
+        v0, v1 = np.interp(
+            dsd.bin_edges["data"][10:12], dsd.diameter["data"], dsd.velocity["data"]
+        )
+        Ze = 100.0 * dsd.doppler_simulator.bin_reflectivity[10]
+        assert dsd.fields["Ze_vertical"]["data"][0] == pytest.approx(10 * np.log10(Ze))
+        assert dsd.fields["mean_doppler_velocity"]["data"][0] == pytest.approx(
+            (v0 + v1) / 2, abs=1e-3
+        )
+        assert dsd.fields["doppler_spectrum_width"]["data"][0] == pytest.approx(
+            (v1 - v0) / np.sqrt(12), abs=1e-3
+        )
+
+    def test_doppler_spectrum_from_drop_spectrum_matches_nd(self):
+        dsd = ARM_Vdis_Reader.read_arm_vdis_b1("testdata/arm_vdis_b1.cdf")
+        num_diameter = len(dsd.diameter["data"])
+        rng = np.random.default_rng(0)
+        dsd.spectrum_fall_velocity = {"data": np.linspace(0.25, 10.25, 21)}
+        dsd.fields["drop_spectrum"] = {
+            "data": rng.poisson(2.0, (dsd.numt, 21, num_diameter)).astype(float)
+        }
+        dsd.effective_sampling_area = {"data": np.full(num_diameter, 0.005)}
+        dsd.calculate_doppler_spectrum(
+            use_drop_spectrum=True, backend="rayleigh_spheroid"
+        )
+
+        Nd = dsd.calculate_dsd_from_spectrum(replace=False)
+        Ze = Nd @ dsd.doppler_simulator.bin_reflectivity
+        np.testing.assert_allclose(
+            dsd.fields["Ze_vertical"]["data"], 10 * np.log10(Ze)
+        )
+        assert dsd.fields["doppler_spectrum"]["data"].shape == (dsd.numt, 64)
+
+    def test_elevation_tables_match_horizontal_and_cache(self, tmpdir):
+        dsd = synthetic_dsd(gamma_nd)
+        dsd.set_scattering_temperature_and_frequency(10, 5.6e9)
+        dsd.calculate_radar_parameters(backend="rayleigh_spheroid")
+
+        assert elevation.elevation_geometries(0) == (
+            tmatrix_aux.geom_horiz_back,
+            tmatrix_aux.geom_horiz_forw,
+        )
+        dsd.calculate_radar_parameters_at_elevations(
+            [0, 20], backend="rayleigh_spheroid", n_jobs=2, cache_dir=str(tmpdir)
+        )
+        assert len(tmpdir.listdir()) == 2
+        for param in ["Zh", "Zdr", "Kdp"]:
+            np.testing.assert_allclose(
+                dsd.fields[param + "_el0"]["data"], dsd.fields[param]["data"]
+            )
+        # Drops look rounder and thinner away from the horizontal.
+        assert np.all(dsd.fields["Zdr_el20"]["data"] < dsd.fields["Zdr_el0"]["data"])
+        assert np.all(dsd.fields["Kdp_el20"]["data"] < dsd.fields["Kdp_el0"]["data"])
+
+        Zdr_20 = dsd.fields["Zdr_el20"]["data"].copy()
+        dsd.calculate_radar_parameters_at_elevations(
+            [20], backend="rayleigh_spheroid", cache_dir=str(tmpdir)
+        )
+        assert len(tmpdir.listdir()) == 2
+        np.testing.assert_allclose(dsd.fields["Zdr_el20"]["data"], Zdr_20)
+
+    def test_table_cache_key_tells_lambdas_and_closures_apart(self):
+        def key(dsr_func):
+            return elevation.table_cache_key(
+                "tmatrix", np.arange(5.0), 53.5, 8 + 2j, dsr_func, 7, 8, 0
+            )
+
+        def linear_dsr(slope):
+            return lambda D: 1.0 - slope * D
+
+        oblate, spherical = (lambda D: 1.0 - 0.06 * D), (lambda D: 1.0)
+        assert key(oblate) != key(spherical)
+        assert key(linear_dsr(0.06)) != key(linear_dsr(0.05))
+        assert key(linear_dsr(0.06)) == key(linear_dsr(0.06))
+        assert key(DSR.bc) == key(DSR.bc)
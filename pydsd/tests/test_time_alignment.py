@@ -0,0 +1,72 @@
+import numpy as np
+import unittest
+
+from ..utility import time_alignment
+
+
+class TestTimeAlignment(unittest.TestCase):
+    """ Test joining and aggregating records by time."""
+
+    def setUp(self):
+        self.reference = np.array([0.0, 60.0, 120.0, 180.0])
+        self.times = np.array([-5.0, 10.0, 50.0, 65.0, 170.0, 500.0])
+
+    def test_nearest_indices(self):
+        np.testing.assert_array_equal(
+            time_alignment.nearest_indices(self.reference, self.times),
+            [0, 3, 4, 4],
+        )
+        np.testing.assert_array_equal(
+            time_alignment.nearest_indices(self.reference, self.times, tolerance=10),
+            [0, 3, -1, 4],
+        )
+        np.testing.assert_array_equal(
+            time_alignment.nearest_indices(
+                self.reference, self.times, direction="backward"
+            ),
+            [0, 2, 3, 4],
+        )
+        np.testing.assert_array_equal(
+            time_alignment.nearest_indices(
+                self.reference, self.times, direction="forward", tolerance=60
+            ),
+            [1, 3, 4, -1],
+        )
+        np.testing.assert_array_equal(
+            time_alignment.nearest_indices(self.reference, []), [-1] * 4
+        )
+        with self.assertRaises(ValueError):
+            time_alignment.nearest_indices(self.reference, self.times, direction="up")
+
+    def test_join_keeps_samples_matched_everywhere(self):
+        third = np.array([0.0, 119.0, 185.0])
+        indices, (first, second) = time_alignment.join(
+            self.reference, self.times, third, tolerance=10
+        )
+        np.testing.assert_array_equal(indices, [0, 3])
+        np.testing.assert_array_equal(first, [0, 4])
+        np.testing.assert_array_equal(second, [0, 2])
+
+    def test_aggregate_over_windows(self):
+        start, stop = time_alignment.window_indices(self.reference, self.times, 60)
+        np.testing.assert_array_equal(start, [1, 3, 4, 5])
+        np.testing.assert_array_equal(stop, [3, 4, 5, 5])
+        start_right, stop_right = time_alignment.window_indices(
+            self.reference, self.times, 60, label="right"
+        )
+        np.testing.assert_array_equal(start_right, [0, 1, 3, 4])
+        np.testing.assert_array_equal(stop_right, [1, 3, 4, 5])
+
+        values = np.array(
+            [[1.0, 2.0], [2.0, np.nan], [4.0, 6.0], [8.0, 1.0], [3.0, 3.0], [0.0, 0.0]]
+        )
+        np.testing.assert_allclose(
+            time_alignment.aggregate(values, start, stop),
+            [[3.0, 6.0], [8.0, 1.0], [3.0, 3.0], [np.nan, np.nan]],
+        )
+        np.testing.assert_allclose(
+            time_alignment.aggregate(values, start, stop, "sum")[:, 0], [6, 8, 3, 0]
+        )
+        np.testing.assert_allclose(
+            time_alignment.aggregate(values, start, stop, "count")[:, 1], [1, 1, 1, 0]
+        )
@@ -0,0 +1,113 @@
+import numpy as np
+import unittest
+import warnings
+
+from ..partition import cs_partition_islam_2012
+from ..utility import ts_utility
+
+
+class TestRollingStatistics(unittest.TestCase):
+    """ Test the O(n) rolling statistics against per window numpy reductions."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = rng.normal(size=300)
+        self.values[rng.random(300) < 0.1] = np.nan
+        self.times = np.cumsum(rng.uniform(30, 90, 300))
+
+    def reference(self, reduction, window, times, center):
+        start, stop = ts_utility.window_bounds(len(self.values), window, times, center)
+        result = []
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for a, b in zip(start, stop):
+                result.append(reduction(self.values[a:b]))
+        return np.array(result, dtype=float)
+
+    def test_window_bounds(self):
+        start, stop = ts_utility.window_bounds(6, 4)
+        np.testing.assert_array_equal(start, [0, 0, 0, 0, 1, 2])
+        np.testing.assert_array_equal(stop, [1, 2, 3, 4, 5, 6])
+        start, stop = ts_utility.window_bounds(6, 4, center=True)
+        np.testing.assert_array_equal(start, [0, 0, 0, 1, 2, 3])
+        np.testing.assert_array_equal(stop, [2, 3, 4, 5, 6, 6])
+        start, stop = ts_utility.window_bounds(4, 60, times=[0, 30, 90, 100])
+        np.testing.assert_array_equal(start, [0, 0, 2, 2])
+        np.testing.assert_array_equal(stop, [1, 2, 3, 4])
+
+    def test_statistics_match_reductions(self):
+        reductions = {
+            "sum": lambda v: np.nansum(v) if np.isfinite(v).any() else np.nan,
+            "mean": np.nanmean,
+            "std": np.nanstd,
+            "min": lambda v: np.nanmin(v) if np.isfinite(v).any() else np.nan,
+            "max": lambda v: np.nanmax(v) if np.isfinite(v).any() else np.nan,
+        }
+        for window, times in [(5, None), (4, None), (300.0, self.times)]:
+            for center in [False, True]:
+                for name, reduction in reductions.items():
+                    np.testing.assert_allclose(
+                        getattr(ts_utility, "rolling_" + name)(
+                            self.values, window, times, center
+                        ),
+                        self.reference(reduction, window, times, center),
+                        err_msg=name,
+                    )
+
+    def test_all_any_skip_missing(self):
+        flags = np.where(np.isnan(self.values), np.nan, self.values > 0)
+        positive = lambda v: v[np.isfinite(v)] > 0
+        for window, times in [(5, None), (300.0, self.times)]:
+            np.testing.assert_array_equal(
+                ts_utility.rolling_all(flags, window, times),
+                self.reference(lambda v: np.all(positive(v)), window, times, False),
+            )
+            np.testing.assert_array_equal(
+                ts_utility.rolling_any(flags, window, times),
+                self.reference(lambda v: np.any(positive(v)), window, times, False),
+            )
+
+    def test_min_periods(self):
+        values = np.array([1.0, np.nan, np.nan, 4.0])
+        np.testing.assert_array_equal(
+            ts_utility.rolling_count(values, 2), [1, 1, 0, 1]
+        )
+        np.testing.assert_array_equal(
+            ts_utility.rolling_mean(values, 3, min_periods=2), [np.nan] * 4
+        )
+        np.testing.assert_array_equal(
+            ts_utility.rolling_sum(np.ma.masked_greater(values, 3), 2), [1, 1, np.nan, np.nan]
+        )
+
+
+class TestIslamPartition(unittest.TestCase):
+    """ Test the rolling window convective stratiform partitioning."""
+
+    def setUp(self):
+        self.rain_rate = np.random.default_rng(1).gamma(0.5, 8, 2000)
+
+    def test_matches_strided_windows(self):
+        for window in [3, 5, 7]:
+            padded = np.pad(self.rain_rate, window // 2, "reflect")
+            below = np.all(ts_utility.rolling_window(padded < 10.0, window), axis=1)
+            std = np.std(ts_utility.rolling_window(padded, window), axis=1)
+            expected = np.where(below & (std < 1.5), 1, 2)
+            np.testing.assert_array_equal(
+                cs_partition_islam_2012(self.rain_rate, window=window), expected
+            )
+
+    def test_even_and_time_windows(self):
+        classification = cs_partition_islam_2012(self.rain_rate)
+        self.assertEqual(len(classification), len(self.rain_rate))
+
+        times = np.arange(len(self.rain_rate)) * 60.0
+        timed = cs_partition_islam_2012(self.rain_rate, window=300.0, times=times)
+        np.testing.assert_array_equal(
+            timed[2:-2], cs_partition_islam_2012(self.rain_rate, window=5)[2:-2]
+        )
+
+    def test_missing_rain_rate_is_unclassified(self):
+        rain_rate = np.ma.masked_greater(self.rain_rate, 30)
+        classification = cs_partition_islam_2012(rain_rate)
+        self.assertTrue(np.all(classification[rain_rate.mask] == 0))
+        self.assertTrue(np.all(classification[~rain_rate.mask] > 0))
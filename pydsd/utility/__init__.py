@@ -1 +1,12 @@
-from .ts_utility import rolling_window
+from .ts_utility import (
+    rolling_window,
+    window_bounds,
+    rolling_count,
+    rolling_sum,
+    rolling_mean,
+    rolling_std,
+    rolling_min,
+    rolling_max,
+    rolling_all,
+    rolling_any,
+)
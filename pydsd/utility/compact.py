@@ -0,0 +1,83 @@
+"""
+Compact storage of drop spectra.
+
+Spectra dominate the memory of a DropSizeDistribution, a year of one minute
+32 x 32 Parsivel spectra is over 4 GB as float64 with a full np.ma mask. In
+compact storage spectra are float32, or uint16 for drop counts, and masks
+are only kept where a value is masked: masked values are stored as 0, like
+np.ma reductions treat them, with a bitmap of the mask packed along the
+last axis, one bit per value.
+
+Readers parse into full precision arrays and compact them afterwards, so
+compact storage reduces the memory held once a file is read, not the peak
+memory while reading it.
+
+Compact arrays are only a storage format. Reductions over them (moments,
+rain rate, Nt...) multiply them with float64 bin parameters, so numpy
+accumulates them in float64.
+"""
+import numpy as np
+
+DTYPES = (np.dtype(np.float32), np.dtype(np.uint16))
+
+
+def check_dtype(dtype):
+    """ Compact storage dtype of counts, float32 or uint16. """
+    dtype = np.dtype(dtype)
+    if dtype not in DTYPES:
+        raise ValueError(
+            "Compact storage dtype must be float32 or uint16, not {}".format(dtype)
+        )
+    return dtype
+
+
+def compact_array(data, dtype):
+    """ Convert an array to compact storage.
+
+    Parameters
+    ----------
+    data: array_like
+        Possibly masked array.
+    dtype: dtype
+        float32, or uint16 for non negative integer counts.
+
+    Returns
+    -------
+    values: np.ndarray
+        Data in dtype, masked values are 0.
+    packed_mask: np.ndarray or None
+        For data with masked values, the mask packed with `numpy.packbits`
+        along the last axis. None otherwise.
+    """
+    dtype = check_dtype(dtype)
+    mask = np.ma.getmaskarray(data) if np.ma.is_masked(data) else None
+    values = np.ma.getdata(data)
+    if mask is not None:
+        values = np.where(mask, 0, values)
+    packed_mask = None if mask is None else np.packbits(mask, axis=-1)
+    if dtype.kind == "f":
+        return values.astype(dtype), packed_mask
+
+    with np.errstate(invalid="ignore"):
+        if values.size and not (
+            np.all(values >= 0)
+            and np.all(values <= np.iinfo(dtype).max)
+            and np.all(np.mod(values, 1) == 0)
+        ):
+            raise ValueError("Data can not be stored as {} counts".format(dtype))
+    return values.astype(dtype), packed_mask
+
+
+def unpack_mask(packed_mask, shape):
+    """ Boolean mask of the given shape from a mask packed by `compact_array`. """
+    return np.unpackbits(packed_mask, axis=-1, count=shape[-1]).astype(bool)
+
+
+def nbytes(data):
+    """ Bytes held by an array and its mask. """
+    if data is None:
+        return 0
+    size = np.asarray(np.ma.getdata(data)).nbytes
+    if np.ma.getmask(data) is not np.ma.nomask:
+        size += np.ma.getmask(data).nbytes
+    return size
@@ -0,0 +1,127 @@
+"""
+Rain events: runs of wet samples separated by dry gaps.
+
+Events are found in one vectorized pass over the record and stored as two
+index arrays, so per event reductions are single `numpy.ufunc.reduceat`
+calls no matter how many events or samples a record has.
+"""
+import numpy as np
+
+
+def find_events(wet, times, min_gap, min_duration=0):
+    """ Segment a record into events of wet samples.
+
+    Parameters
+    ----------
+    wet: array_like
+        Whether each sample is wet. Masked samples are dry.
+    times: array_like
+        Sorted sample times.
+    min_gap: float
+        Wet samples more than min_gap apart belong to different events, in
+        the units of `times`.
+    min_duration: float, optional
+        Events lasting less, from their first to their last wet sample, are
+        dropped.
+
+    Returns
+    -------
+    events: `EventIndex`
+        The events.
+    """
+    wet = np.ma.filled(np.ma.asarray(wet, dtype=bool), False)
+    times = np.asarray(times)
+    wet_index = np.flatnonzero(wet)
+    if len(wet_index) == 0:
+        return EventIndex(np.zeros(0, dtype=int), np.zeros(0, dtype=int), len(wet))
+
+    breaks = np.flatnonzero(np.diff(times[wet_index]) > min_gap)
+    start = wet_index[np.concatenate([[0], breaks + 1])]
+    stop = wet_index[np.concatenate([breaks, [len(wet_index) - 1]])] + 1
+    keep = times[stop - 1] - times[start] >= min_duration
+    return EventIndex(start[keep], stop[keep], len(wet))
+
+
+class EventIndex(object):
+    """
+    Start and stop indices of events in a record.
+
+    Attributes
+    ----------
+    start: array_like
+        Index of the first sample of each event.
+    stop: array_like
+        Index after the last sample of each event.
+    numt: int
+        Number of samples in the record.
+    """
+
+    def __init__(self, start, stop, numt):
+        self.start = np.asarray(start, dtype=np.intp)
+        self.stop = np.asarray(stop, dtype=np.intp)
+        self.numt = numt
+
+    def __len__(self):
+        return len(self.start)
+
+    def __iter__(self):
+        """ Iterate over the slice of each event. """
+        return (slice(a, b) for a, b in zip(self.start, self.stop))
+
+    @property
+    def num_samples(self):
+        """ Number of samples in each event. """
+        return self.stop - self.start
+
+    def labels(self):
+        """ Event number of each sample, -1 for samples outside of events. """
+        sizes = self.num_samples
+        offsets = np.arange(np.sum(sizes)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        labels = np.full(self.numt, -1, dtype=np.intp)
+        labels[np.repeat(self.start, sizes) + offsets] = np.repeat(
+            np.arange(len(self)), sizes
+        )
+        return labels
+
+    def _reduceat(self, ufunc, values):
+        """ Apply ufunc.reduceat over each event along the first axis. """
+        # Interleave starts and stops, the reductions from a stop to the next
+        # start are the gaps between events and are dropped.
+        padded = np.concatenate([values, values[:1]])
+        bounds = np.column_stack([self.start, self.stop]).ravel()
+        return ufunc.reduceat(padded, bounds, axis=0)[::2]
+
+    def reduce(self, values, how="sum"):
+        """ Reduce values over each event, skipping NaN and masked values.
+
+        Parameters
+        ----------
+        values: array_like
+            Values of each sample, shape (numt, ...).
+        how: str, optional
+            'sum', 'mean', 'min', 'max' or 'count' of valid values.
+
+        Returns
+        -------
+        reduced: array_like
+            Reduction of each event, shape (events, ...). NaN for events
+            without valid values, except for 'sum' and 'count'.
+        """
+        if how not in ("sum", "mean", "min", "max", "count"):
+            raise ValueError("Unknown event reduction {}".format(how))
+        values = np.ma.filled(np.ma.asarray(values, dtype=float), np.nan)
+        if len(self) == 0:
+            return np.zeros((0,) + values.shape[1:])
+        valid = np.isfinite(values)
+        count = self._reduceat(np.add, valid.astype(np.intp))
+        if how == "count":
+            return count
+        if how in ("sum", "mean"):
+            total = self._reduceat(np.add, np.where(valid, values, 0.0))
+            if how == "sum":
+                return total
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(count > 0, total / count, np.nan)
+        ufunc, fill = (np.minimum, np.inf) if how == "min" else (np.maximum, -np.inf)
+        extreme = self._reduceat(ufunc, np.where(valid, values, fill))
+        return np.where(count > 0, extreme, np.nan)
@@ -1,10 +1,16 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from scipy.optimize import curve_fit
+
+# Bootstrap replicates are solved in batches of about this many points times
+# replicates, which bounds the memory of the stacked problems.
+BOOTSTRAP_BATCH_ELEMENTS = 10000000
 
 
 def expfit(x, y):
     """
-    expfit calculates an exponential power law fit based upon levenburg-marquardt minimization. Fits
+    expfit calculates an exponential power law fit based upon least squares minimization. Fits
     are of the form. y = ax**b
     Parameters:
     -----------
@@ -32,16 +38,16 @@ def expfit(x, y):
     x_finite_index = np.isfinite(x_array)
     y_finite_index = np.isfinite(y_array)
 
-    mask = np.logical_and(x_finite_index, y_finite_index)
+    # The fit is linear in log x, points with x <= 0 can not be fit. Points
+    # with y <= 0 only enter the refinement, see `_fit_log_params`.
+    mask = np.logical_and(x_finite_index, y_finite_index) & (x_array > 0)
 
-    expfunc = lambda x, a, b: a * np.power(x, b)
-    popt, pcov = curve_fit(expfunc, x_array[mask], y_array[mask])
-    return popt, pcov
+    return powerlaw_fit(x_array[mask], y_array[mask])
 
 
 def expfit2(x, y):
     """
-    expfit2 calculates an exponential power law fit based upon levenburg-marquardt minimization. Fits
+    expfit2 calculates an exponential power law fit based upon least squares minimization. Fits
     are of the form. y = a(x[0]**b)(x[1]**c)
     Parameters:
     -----------
@@ -73,7 +79,391 @@ def expfit2(x, y):
     mask = np.logical_and(
         x2_finite_index, np.logical_and(x1_finite_index, y_finite_index)
     )
+    mask &= (x1_array > 0) & (x2_array > 0)  # The fit is linear in log x.
+
+    return powerlaw_fit([x1_array[mask], x2_array[mask]], y_array[mask])
+
+
+def _design_matrix(x):
+    """ Columns [1, log x_1, ..., log x_k] of the log linear power law model. """
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.column_stack([np.ones(x.shape[1]), np.log(x).T])
+
+
+def _solve(A, b):
+    """ Batched linear solve, falling back to least squares for singular systems. """
+    try:
+        return np.linalg.solve(A, b[..., np.newaxis])[..., 0]
+    except np.linalg.LinAlgError:
+        return np.einsum("bij,bj->bi", np.linalg.pinv(A), b)
+
+
+def _outer_products(X):
+    """ Outer product of each row of X with itself, flattened, shape (n, p * p). """
+    p = X.shape[1]
+    return (X[:, :, np.newaxis] * X[:, np.newaxis, :]).reshape(len(X), p * p)
+
+
+def _levenberg_marquardt(theta, evaluate, max_iter=50, tol=1e-10):
+    """ Damped Gauss-Newton refinement of a batch of least squares problems.
+
+    Parameters
+    ----------
+    theta: array_like
+        Starting parameters, shape (B, p).
+    evaluate: function
+        Returns the normal matrices J^T J (B, p, p), gradients J^T r (B, p)
+        and sums of squared residuals (B,) of a batch of parameters.
+    max_iter: int, optional
+        Maximum number of refinement steps.
+    tol: float, optional
+        Relative decrease of the sum of squares, or relative step, to stop at.
+
+    Returns
+    -------
+    theta, JTJ, ssr: array_like
+        Parameters, normal matrices and sums of squares at the solution.
+    """
+    p = theta.shape[1]
+    JTJ, gradient, ssr = evaluate(theta)
+    damping = np.full(len(theta), 1e-3)
+    done = np.zeros(len(theta), dtype=bool)
+    for _ in range(max_iter):
+        scaling = np.einsum("bii->bi", JTJ)[:, :, np.newaxis] * np.eye(p)
+        step = _solve(JTJ + damping[:, np.newaxis, np.newaxis] * scaling, gradient)
+        new_JTJ, new_gradient, new_ssr = evaluate(theta + step)
+
+        better = np.isfinite(new_ssr) & (new_ssr <= ssr)
+        done |= (better & (ssr - new_ssr <= tol * ssr)) | np.all(
+            np.abs(step) <= tol * (1 + np.abs(theta)), axis=1
+        )
+        theta = np.where(better[:, np.newaxis], theta + step, theta)
+        JTJ = np.where(better[:, np.newaxis, np.newaxis], new_JTJ, JTJ)
+        gradient = np.where(better[:, np.newaxis], new_gradient, gradient)
+        ssr = np.where(better, new_ssr, ssr)
+        damping = np.where(better, damping / 10.0, damping * 10.0)
+        if np.all(done | (damping > 1e10)):
+            break
+    return theta, JTJ, ssr
+
+
+def _log_y(y):
+    """ log(y) where y is positive, with a mask of the usable points. """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_y = np.log(y)
+    positive = np.isfinite(log_y)
+    return np.where(positive, log_y, 0.0), positive
+
+
+def _fit_log_params(X, y, weights, max_iter=50, tol=1e-10, theta=None):
+    """ Least squares power law parameters for a batch of weighted problems.
+
+    Parameters are theta = (log a, b_1, ..., b_k) so that the model is
+    exp(X @ theta). Starts from the closed form log linear least squares
+    solution and refines it with damped Gauss-Newton (Levenberg-Marquardt)
+    steps on the linear residuals, solving every problem of the batch at once.
+
+    Parameters
+    ----------
+    X: array_like
+        Design matrix, shape (n, p).
+    y: array_like
+        Dependent variable, shape (n,).
+    weights: array_like
+        Weight of each point in each problem, shape (B, n).
+    max_iter: int, optional
+        Maximum number of refinement steps.
+    tol: float, optional
+        Relative decrease of the sum of squares to stop at.
+    theta: array_like, optional
+        Starting parameters, shape (p,), instead of the log linear solution.
 
-    expfunc = lambda x, a, b, c: a * np.power(x[0], b) * np.power(x[1], c)
-    popt, pcov = curve_fit(expfunc, [x1_array[mask], x2_array[mask]], y_array[mask])
+    Returns
+    -------
+    theta: array_like
+        Parameters, shape (B, p).
+    JTJ: array_like
+        Weighted normal matrices at the solution, shape (B, p, p).
+    ssr: array_like
+        Weighted sums of squared residuals, shape (B,).
+    """
+    p = X.shape[1]
+    outer = _outer_products(X)
+    if theta is None:
+        log_y, positive = _log_y(y)
+        log_weights = weights * positive
+        theta = _solve((log_weights @ outer).reshape(-1, p, p), (log_weights * log_y) @ X)
+    else:
+        theta = np.tile(theta, (len(weights), 1))
+
+    def evaluate(theta):
+        with np.errstate(over="ignore", invalid="ignore"):
+            f = np.exp(theta @ X.T)
+            r = y - f
+            JTJ = ((weights * f * f) @ outer).reshape(-1, p, p)
+            return JTJ, (weights * f * r) @ X, np.sum(weights * r ** 2, axis=1)
+
+    return _levenberg_marquardt(theta, evaluate, max_iter=max_iter, tol=tol)
+
+
+def _fit_log_params_segments(X, y, starts, max_iter=50, tol=1e-10):
+    """ Least squares power law parameters of contiguous segments of points.
+
+    Same as `_fit_log_params`, with one problem per segment of the (sorted)
+    points instead of weights, so that the sums over the points of every
+    segment are computed together with `np.add.reduceat`.
+
+    Parameters
+    ----------
+    X: array_like
+        Design matrix, shape (n, p).
+    y: array_like
+        Dependent variable, shape (n,).
+    starts: array_like
+        Index of the first point of each segment, increasing, starting at 0.
+
+    Returns
+    -------
+    theta, JTJ, ssr: array_like
+        See `_fit_log_params`, one row per segment.
+    """
+    p = X.shape[1]
+    outer = _outer_products(X)
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(y))))
+
+    log_y, positive = _log_y(y)
+    sums = np.add.reduceat(
+        np.column_stack([outer * positive[:, np.newaxis], X * log_y[:, np.newaxis]]),
+        starts,
+    )
+    theta = _solve(sums[:, : p * p].reshape(-1, p, p), sums[:, p * p :])
+
+    def evaluate(theta):
+        with np.errstate(over="ignore", invalid="ignore"):
+            f = np.exp(np.sum(X * theta[segment], axis=1))
+            r = y - f
+            sums = np.add.reduceat(
+                np.column_stack(
+                    [outer * (f * f)[:, np.newaxis], X * (f * r)[:, np.newaxis], r ** 2]
+                ),
+                starts,
+            )
+        return sums[:, : p * p].reshape(-1, p, p), sums[:, p * p : -1], sums[:, -1]
+
+    return _levenberg_marquardt(theta, evaluate, max_iter=max_iter, tol=tol)
+
+
+def _to_popt_pcov(theta, JTJ, residual_variance):
+    """ Scale and exponents with their covariance, as returned by `curve_fit`. """
+    popt = theta.copy()
+    popt[..., 0] = np.exp(theta[..., 0])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        theta_cov = residual_variance[:, np.newaxis, np.newaxis] * np.linalg.pinv(JTJ)
+    # d(a)/d(log a) = a
+    jacobian = np.ones_like(popt)
+    jacobian[..., 0] = popt[..., 0]
+    pcov = theta_cov * jacobian[:, :, np.newaxis] * jacobian[:, np.newaxis, :]
     return popt, pcov
+
+
+def powerlaw_fit(x, y, max_iter=50):
+    """
+    powerlaw_fit calculates a least squares power law fit of the form
+    y = a * x[0]**b[0] * x[1]**b[1] * ... The fit starts from the log linear
+    least squares solution and is refined with Gauss-Newton steps.
+
+    Parameters:
+    -----------
+    x: array_like
+        Independent variable, or sequence of independent variables.
+    y: array_like
+        Dependent variable.
+    max_iter: int, optional
+        Maximum number of refinement steps.
+
+    Returns:
+    --------
+    popt : array
+        Scale parameter a followed by the exponents.
+    pcov: array
+        Covariance of the fit.
+    """
+    X = _design_matrix(x)
+    y = np.asarray(y, dtype=float)
+    theta, JTJ, ssr = _fit_log_params(X, y, np.ones((1, len(y))), max_iter=max_iter)
+    popt, pcov = _to_popt_pcov(theta, JTJ, ssr / max(len(y) - X.shape[1], 1))
+    return popt[0], pcov[0]
+
+
+def _bootstrap_batch(X, y, theta, num_replicates, seed, refine, max_iter):
+    """ Fit one batch of bootstrap replicates, resampling with replacement.
+
+    Each replicate takes one Gauss-Newton step from the parameters theta of
+    the full sample, with the Jacobian and residuals of the full sample, so
+    the whole batch is a single matrix product of the resampling weights.
+    Optionally the replicates are then refined to convergence.
+    """
+    rng = np.random.default_rng(seed)
+    n, p = X.shape
+    samples = rng.integers(0, n, (num_replicates, n))
+    samples += n * np.arange(num_replicates)[:, np.newaxis]
+    weights = np.bincount(samples.ravel(), minlength=num_replicates * n)
+    weights = weights.reshape(num_replicates, n).astype(float)
+
+    f = np.exp(X @ theta)
+    J = f[:, np.newaxis] * X
+    terms = np.column_stack(
+        [(J[:, :, np.newaxis] * J[:, np.newaxis, :]).reshape(n, p * p), J * (y - f)[:, np.newaxis]]
+    )
+    sums = weights @ terms
+    replicates = theta + _solve(sums[:, : p * p].reshape(-1, p, p), sums[:, p * p :])
+    if refine:
+        replicates = np.stack(
+            [
+                _fit_log_params(X, y, w[np.newaxis], max_iter=max_iter, theta=r)[0][0]
+                for w, r in zip(weights, replicates)
+            ]
+        )
+    replicates[:, 0] = np.exp(replicates[:, 0])
+    return replicates
+
+
+def bootstrap_powerlaw_fit(
+    x,
+    y,
+    n_boot=1000,
+    confidence=95,
+    batch_size=None,
+    n_jobs=None,
+    random_state=None,
+    refine=False,
+    max_iter=50,
+):
+    """
+    bootstrap_powerlaw_fit calculates a power law fit like `powerlaw_fit`
+    along with bootstrap confidence intervals of its parameters. Replicates
+    are solved in batches, all the replicates of a batch as one stacked
+    linear problem, with batches spread over a thread pool.
+
+    Parameters:
+    -----------
+    x: array_like
+        Independent variable, or sequence of independent variables.
+    y: array_like
+        Dependent variable.
+    n_boot: int, optional
+        Number of bootstrap replicates.
+    confidence: float, optional
+        Confidence level of the intervals [%].
+    batch_size: int, optional
+        Number of replicates solved together. Defaults to a size bounding the
+        memory of a batch.
+    n_jobs: int, optional
+        Number of threads. Defaults to the ThreadPoolExecutor default.
+    random_state: int, optional
+        Seed for reproducible resampling.
+    refine: bool, optional
+        Iterate each replicate to convergence instead of taking a single
+        Gauss-Newton step from the full sample fit. Much slower, and only
+        differs by terms of order 1/n.
+    max_iter: int, optional
+        Maximum number of refinement steps.
+
+    Returns:
+    --------
+    popt : array
+        Scale parameter a followed by the exponents, fit on all the data.
+    pcov: array
+        Covariance of the fit.
+    ci: array
+        Lower and upper confidence limits of each parameter, shape (2, p).
+    replicates: array
+        Parameters fit to each bootstrap replicate, shape (n_boot, p).
+    """
+    X = _design_matrix(x)
+    y = np.asarray(y, dtype=float)
+    popt, pcov = powerlaw_fit(x, y, max_iter=max_iter)
+    theta = np.concatenate([np.log(popt[:1]), popt[1:]])
+
+    if batch_size is None:
+        batch_size = max(1, BOOTSTRAP_BATCH_ELEMENTS // len(y))
+    sizes = [min(batch_size, n_boot - start) for start in range(0, n_boot, batch_size)]
+    seeds = np.random.SeedSequence(random_state).spawn(len(sizes))
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        batches = executor.map(
+            lambda args: _bootstrap_batch(
+                X, y, theta, args[0], args[1], refine, max_iter
+            ),
+            zip(sizes, seeds),
+        )
+        replicates = np.concatenate(list(batches))
+
+    tail = (100.0 - confidence) / 2.0
+    ci = np.nanpercentile(replicates, [tail, 100.0 - tail], axis=0)
+    return popt, pcov, ci, replicates
+
+
+def grouped_powerlaw_fit(x, y, labels, n_jobs=None, max_iter=50):
+    """
+    grouped_powerlaw_fit calculates a power law fit like `powerlaw_fit` for
+    every group of points sharing a label. Points are sorted by label once,
+    and every group is fit together in a batched pass over the sorted points,
+    with contiguous runs of groups spread over a thread pool.
+
+    Parameters:
+    -----------
+    x: array_like
+        Independent variable, or sequence of independent variables.
+    y: array_like
+        Dependent variable.
+    labels: array_like
+        Group label of each point.
+    n_jobs: int, optional
+        Number of threads. Defaults to the number of CPUs.
+    max_iter: int, optional
+        Maximum number of refinement steps.
+
+    Returns:
+    --------
+    groups: dict
+        'label' (G,) of each group, sorted, 'popt' (G, p) scale parameter
+        followed by the exponents, 'pcov' (G, p, p) covariance of the fits and
+        'count' (G,) number of points. Groups with no more points than
+        parameters get NaN parameters.
+    """
+    X = _design_matrix(x)
+    y = np.asarray(y, dtype=float)
+    labels = np.asarray(labels)
+    p = X.shape[1]
+
+    order = np.argsort(labels, kind="stable")
+    X, y = X[order], y[order]
+    unique_labels, starts, counts = np.unique(
+        labels[order], return_index=True, return_counts=True
+    )
+
+    # Split the groups into runs holding about the same number of points.
+    num_runs = max(1, min(n_jobs or os.cpu_count() or 1, len(unique_labels)))
+    splits = np.searchsorted(
+        np.cumsum(counts), np.linspace(0, len(y), num_runs + 1)[1:-1], side="right"
+    )
+    runs = [run for run in np.split(np.arange(len(unique_labels)), splits) if len(run)]
+
+    def fit_run(run):
+        first, last = starts[run[0]], starts[run[-1]] + counts[run[-1]]
+        return _fit_log_params_segments(
+            X[first:last], y[first:last], starts[run] - first, max_iter=max_iter
+        )
+
+    with ThreadPoolExecutor(max_workers=len(runs)) as executor:
+        results = list(executor.map(fit_run, runs))
+    theta = np.concatenate([result[0] for result in results])
+    JTJ = np.concatenate([result[1] for result in results])
+    ssr = np.concatenate([result[2] for result in results])
+
+    residual_variance = ssr / np.maximum(counts - p, 1)
+    popt, pcov = _to_popt_pcov(theta, JTJ, residual_variance)
+    popt[counts <= p] = np.nan
+    pcov[counts <= p] = np.nan
+    return {"label": unique_labels, "popt": popt, "pcov": pcov, "count": counts}
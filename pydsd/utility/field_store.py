@@ -0,0 +1,239 @@
+"""
+Compact storage of the fields of a DropSizeDistribution.
+
+Fields are `Field` dictionaries, with `__slots__` and the keys of the reader
+fields ({"data", "units", "long_name", ...}). The data of every per time
+scalar field (float64, one value per time step) lives in a column of one
+Fortran ordered (numt, columns) buffer, with a matching mask buffer, so the
+data of dozens of derived fields shares two allocations. The buffer grows by
+doubling when columns are added. Other data (Nd, drop_spectrum, integer
+counts...) is stored as is.
+
+The data of a per time scalar field is a view of its column: writing into it
+writes into the store, and assigning new data copies it into the column.
+Views taken before the buffer grows no longer share its memory, the fields
+are updated with views of the new buffer.
+"""
+from collections.abc import MutableMapping
+import copy
+
+import numpy as np
+
+
+class Field(dict):
+    """
+    A field of a `FieldStore`: a dictionary of data and metadata whose data,
+    for per time scalar fields, is a view of a column of the store.
+
+    Assigning "data" goes through the store, which copies per time scalar
+    data into the column of the field.
+    """
+
+    __slots__ = ("_store", "_column")
+
+    def __init__(self, store, field):
+        super().__init__(
+            (key, value) for key, value in field.items() if key != "data"
+        )
+        self._store = store
+        self._column = None
+        store._set_data(self, field.get("data"))
+
+    def __setitem__(self, key, value):
+        if key == "data" and getattr(self, "_store", None) is not None:
+            self._store._set_data(self, value)
+        else:
+            super().__setitem__(key, value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __copy__(self):
+        """ Shallow copies are plain dictionaries, like copies of reader fields. """
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        if self._store is not None:
+            copy.deepcopy(self._store, memo)
+            if id(self) in memo:
+                return memo[id(self)]
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class FieldStore(MutableMapping):
+    """
+    Mapping of field names to `Field` records sharing one per time buffer.
+
+    Assigning a dictionary creates a record from it, assigning a record of
+    this store keeps it, so attributes aliasing fields stay identical to them.
+
+    Attributes
+    ----------
+    numt: int
+        Number of time steps, the length of the per time scalar fields.
+    """
+
+    def __init__(self, numt, fields=None, capacity=8):
+        """
+        Parameters
+        ----------
+        numt: int
+            Number of time steps.
+        fields: dict, optional
+            Initial fields, dictionaries or records.
+        capacity: int, optional
+            Initial number of columns of the per time buffer.
+        """
+        self.numt = numt
+        self._fields = {}
+        self._values = np.empty((numt, capacity), order="F")
+        self._mask = np.zeros((numt, capacity), dtype=bool, order="F")
+        self._num_columns = 0
+        self._free = []
+        if fields is not None:
+            self.update(fields)
+
+    def __getitem__(self, name):
+        return self._fields[name]
+
+    def __setitem__(self, name, field):
+        if isinstance(field, Field) and field._store is self:
+            self._fields[name] = field
+            return
+        record = Field(self, field)
+        old = self._fields.get(name)
+        self._fields[name] = record
+        if old is not None and not self._is_stored(old):
+            self._detach(old)
+
+    def __delitem__(self, name):
+        field = self._fields.pop(name)
+        if not self._is_stored(field):
+            self._detach(field)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __contains__(self, name):
+        return name in self._fields
+
+    def __repr__(self):
+        return "FieldStore({!r})".format(list(self._fields))
+
+    def __copy__(self):
+        return FieldStore(self.numt, self)
+
+    def __reduce__(self):
+        return FieldStore, (self.numt, dict(self._fields))
+
+    def __deepcopy__(self, memo):
+        store = FieldStore(self.numt, capacity=max(self._num_columns, 1))
+        memo[id(self)] = store
+        for name, field in self._fields.items():
+            if id(field) not in memo:
+                memo[id(field)] = Field(store, copy.deepcopy(dict(field), memo))
+            store._fields[name] = memo[id(field)]
+        return store
+
+    @property
+    def columns(self):
+        """ Names of the fields stored in the per time buffer. """
+        return [
+            name for name, field in self._fields.items() if field._column is not None
+        ]
+
+    def to_array(self, names=None):
+        """ (numt, fields) array of per time scalar fields, NaN where masked.
+
+        Parameters
+        ----------
+        names: list, optional
+            Fields to return. Defaults to `columns`.
+        """
+        if names is None:
+            names = self.columns
+        columns = [self._fields[name]._column for name in names]
+        if None in columns:
+            raise ValueError("Only per time scalar fields can be returned as an array")
+        return np.where(self._mask[:, columns], np.nan, self._values[:, columns])
+
+    def _is_stored(self, field):
+        """ Whether a record is stored under any name. """
+        return any(stored is field for stored in self._fields.values())
+
+    def _is_column(self, data):
+        """ Whether data is stored in the per time buffer. """
+        return (
+            isinstance(data, np.ndarray)
+            and data.ndim == 1
+            and len(data) == self.numt
+            and data.dtype == np.float64
+        )
+
+    def _column_data(self, column, masked):
+        """ View of a column of the buffer. """
+        values = self._values[:, column]
+        if masked:
+            return np.ma.masked_array(values, mask=self._mask[:, column], copy=False)
+        return values
+
+    def _set_data(self, field, data):
+        """ Store the data of a field, in a column when it is per time scalar data. """
+        if not self._is_column(data):
+            if field._column is not None:
+                self._free.append(field._column)
+                field._column = None
+            dict.__setitem__(field, "data", data)
+            return
+        if field._column is None:
+            field._column = self._allocate()
+        self._values[:, field._column] = np.ma.getdata(data)
+        self._mask[:, field._column] = np.ma.getmaskarray(data)
+        dict.__setitem__(
+            field,
+            "data",
+            self._column_data(field._column, np.ma.isMaskedArray(data)),
+        )
+
+    def _allocate(self):
+        """ Index of a free column, growing the buffer by doubling when full. """
+        if self._free:
+            return self._free.pop()
+        capacity = self._values.shape[1]
+        if self._num_columns == capacity:
+            values = np.empty((self.numt, 2 * capacity), order="F")
+            mask = np.zeros((self.numt, 2 * capacity), dtype=bool, order="F")
+            values[:, :capacity] = self._values
+            mask[:, :capacity] = self._mask
+            self._values, self._mask = values, mask
+            for field in self._fields.values():
+                if field._column is not None:
+                    dict.__setitem__(
+                        field,
+                        "data",
+                        self._column_data(
+                            field._column, np.ma.isMaskedArray(field["data"])
+                        ),
+                    )
+        self._num_columns += 1
+        return self._num_columns - 1
+
+    def _detach(self, field):
+        """ Give a field removed from the store its own copy of its data. """
+        if field._column is not None:
+            dict.__setitem__(field, "data", field["data"].copy())
+            self._free.append(field._column)
+            field._column = None
+        field._store = None
@@ -2,6 +2,150 @@ import numpy as np
 import copy
 
 
+class FilterChain(object):
+    """ Composable filters of Nd and the drop spectrum, applied lazily.
+
+    Each filter multiplies a per bin weight into the weights of the chain,
+    (diameter,) for Nd and (velocity, diameter) for drop_spectrum. Nothing is
+    computed until the filtered fields are read, then all the filters are
+    applied in a single multiplication into one new buffer, so chaining N
+    filters costs one pass over the data. The original fields are not
+    modified until `apply`.
+
+    Example
+    -------
+    chain = FilterChain(dsd).dropsize(drop_min=0.3).parsivel_matrix(0.5, 0.5)
+    chain.apply()
+    """
+
+    def __init__(self, dsd):
+        self.dsd = dsd
+        self.reset()
+
+    def reset(self):
+        """ Remove every filter from the chain. """
+        self.nd_weights = None
+        self.spectrum_weights = None
+        self.nd_history = []
+        self.spectrum_history = []
+        self._cache = {}
+
+    def weights(self, nd=None, spectrum=None, history=""):
+        """ Add per bin weights to the chain.
+
+        Parameters
+        ----------
+        nd: array_like, optional
+            Weight of each diameter bin of Nd.
+        spectrum: array_like, optional
+            Weight of each (velocity, diameter) bin of drop_spectrum.
+        history: str
+            Description of the filter, added to the history of the filtered fields.
+
+        Returns
+        -------
+        chain: `FilterChain`
+            This chain, to chain further filters.
+        """
+        if nd is not None:
+            nd = np.asarray(nd)
+            self.nd_weights = nd if self.nd_weights is None else self.nd_weights * nd
+            self.nd_history.append(history)
+            self._cache.pop("Nd", None)
+        if spectrum is not None:
+            spectrum = np.asarray(spectrum)
+            self.spectrum_weights = (
+                spectrum
+                if self.spectrum_weights is None
+                else self.spectrum_weights * spectrum
+            )
+            self.spectrum_history.append(history)
+            self._cache.pop("drop_spectrum", None)
+        return self
+
+    def dropsize(self, drop_min=None, drop_max=None):
+        """ Keep Nd between drop_min and drop_max (mm), see `filter_nd_on_dropsize`. """
+        diameter = self.dsd.diameter["data"]
+        if drop_min is None:
+            drop_min = 0
+        if drop_max is None:
+            drop_max = diameter[-1] + 100
+        return self.weights(
+            nd=np.logical_and(diameter > drop_min, diameter < drop_max),
+            history=f"Filtered between {drop_min} and {drop_max}",
+        )
+
+    def parsivel_matrix(
+        self, over_fall_speed=0.5, under_fall_speed=0.5, maintain_smallest=False
+    ):
+        """ Keep drops near terminal fall speed.
+
+        See `filter_spectrum_with_parsivel_matrix`.
+        """
+        terminal_fall_speed = np.asarray(self.dsd.velocity["data"])
+        spectra_velocity = np.asarray(self.dsd.spectrum_fall_velocity["data"])
+        pcm_matrix = np.logical_and(
+            spectra_velocity[:, np.newaxis]
+            > terminal_fall_speed * (1 - under_fall_speed),
+            spectra_velocity[:, np.newaxis]
+            < terminal_fall_speed * (1 + over_fall_speed),
+        ).astype(int)
+        if maintain_smallest:
+            dbins_under_1 = np.sum(self.dsd.diameter["data"] <= 1)
+            vbins_under_25 = np.sum(spectra_velocity < 2.5)
+            pcm_matrix[0:vbins_under_25, 0:dbins_under_1] = 1
+        return self.weights(
+            spectrum=pcm_matrix,
+            history=f"Filtered for speeds above {over_fall_speed} of Vt "
+            f"and below {under_fall_speed} of Vt",
+        )
+
+    def _filtered(self, name, weights, history):
+        """ Field dictionary of name with the weights applied, computed once. """
+        if name not in self._cache:
+            field = self.dsd.fields[name]
+            data = field["data"]
+            filtered = dict(field)
+            if weights is not None:
+                values = np.ma.getdata(data)
+                # Keep compact float32 and integer count storage, unless
+                # counts are weighted by fractions.
+                dtype = values.dtype
+                if dtype.kind != "f" and weights.dtype.kind == "f":
+                    dtype = np.result_type(dtype, weights)
+                out = np.empty(np.shape(data), dtype=dtype)
+                np.multiply(values, weights.astype(dtype), out=out)
+                if np.ma.isMaskedArray(data):
+                    out = np.ma.masked_array(out, mask=np.ma.getmask(data), copy=False)
+                filtered["data"] = out
+                filtered["history"] = "".join(
+                    [field.get("history", "")] + ["\n" + entry for entry in history]
+                )
+            self._cache[name] = filtered
+        return self._cache[name]
+
+    @property
+    def Nd(self):
+        """ Filtered Nd field dictionary. """
+        return self._filtered("Nd", self.nd_weights, self.nd_history)
+
+    @property
+    def drop_spectrum(self):
+        """ Filtered drop_spectrum field dictionary. """
+        return self._filtered(
+            "drop_spectrum", self.spectrum_weights, self.spectrum_history
+        )
+
+    def apply(self):
+        """ Replace the fields of the DSD with the filtered fields, then reset. """
+        if self.nd_weights is not None:
+            self.dsd.fields["Nd"] = self.Nd
+            self.dsd.Nd = self.dsd.fields["Nd"]
+        if self.spectrum_weights is not None:
+            self.dsd.fields["drop_spectrum"] = self.drop_spectrum
+        self.reset()
+
+
 def filter_spectrum_with_parsivel_matrix(
     dsd,
     over_fall_speed=0.5,
@@ -11,7 +155,7 @@ def filter_spectrum_with_parsivel_matrix(
 ):
     """ Filter a drop spectrum using fall speed matrix for Parsivels.  This requires that velocity is set on the object
     for both raw spectra and calculated terminal fall speed. If terminal fall speed is not available, this can be calculated
-    using pydsd.
+    using pydsd. To combine several filters in one pass use `FilterChain`.
     Parameters
     ----------
     over_fall_speed: float, default 0.5
@@ -31,35 +175,13 @@ def filter_spectrum_with_parsivel_matrix(
     -------
     filter_spectrum_with_parsivel_matrix(dsd, over_fall_speed=.5, under_fall_speed=.5, replace=True)
     """
-    terminal_fall_speed = dsd.velocity["data"]
-    spectra_velocity = dsd.spectrum_fall_velocity["data"]
-
-    pcm_matrix = np.zeros((len(terminal_fall_speed), len(spectra_velocity)))
-    for idx in np.arange(0, len(terminal_fall_speed)):
-        pcm_matrix[idx] = np.logical_and(
-            spectra_velocity > (terminal_fall_speed[idx] * (1 - under_fall_speed)),
-            spectra_velocity < (terminal_fall_speed[idx] * (1 + over_fall_speed)),
-        )
-
-    # print(pcm_matrix)
-    pcm_matrix = pcm_matrix.astype(int).T
-    if maintain_smallest:
-        dbins_under_1 = np.sum(dsd.diameter["data"] <= 1)
-        vbins_under_25 = np.sum(spectra_velocity < 2.5)
-        print(vbins_under_25, dbins_under_1)
-        pcm_matrix[0:vbins_under_25, 0:dbins_under_1] = 1
-
-
+    chain = FilterChain(dsd).parsivel_matrix(
+        over_fall_speed, under_fall_speed, maintain_smallest
+    )
     if replace:
-        dsd.fields["drop_spectrum"]["data"] = (
-            dsd.fields["drop_spectrum"]["data"] * pcm_matrix
-        )
-        dsd.fields["drop_spectrum"]["history"] = (
-            dsd.fields["drop_spectrum"].get("history", "")
-            + f"Filtered for speeds above {over_fall_speed} of Vt and below {under_fall_speed} of Vt"
-        )
+        chain.apply()
     else:
-        return dsd.fields["drop_spectrum"]["data"] * pcm_matrix
+        return chain.drop_spectrum["data"]
 
 
 def filter_nd_on_dropsize(dsd, drop_min=None, drop_max=None, replace=True):
@@ -79,31 +201,14 @@ def filter_nd_on_dropsize(dsd, drop_min=None, drop_max=None, replace=True):
     Returns
     -------
     Nd: dictionary
-        Updated Nd dictionary. Data and a history field.
+        Updated Nd dictionary. Data and a history field. The data is a new
+        array, the other entries are shared with the original field.
     """
-    diameter = dsd.diameter["data"]
-
-    if drop_min is None:
-        drop_min = 0
-    if drop_max is None:
-        drop_max = diameter[-1] + 100
-
-    mask = np.logical_and(diameter > drop_min, diameter < drop_max)
-
+    chain = FilterChain(dsd).dropsize(drop_min, drop_max)
     if replace:
-        dsd.fields["Nd"]["data"] = dsd.fields["Nd"]["data"] * mask
-        dsd.fields["Nd"]["history"] = (
-            dsd.fields["Nd"].get("history", "")
-            + f"\nFiltered between {drop_min} and {drop_max}"
-        )
+        chain.apply()
     else:
-        Nd = copy.deepcopy(dsd.fields["Nd"])
-        Nd["data"] = Nd["data"] * mask
-        Nd["history"] = (
-            dsd.fields["Nd"].get("history", "")
-            + f"Filtered between {drop_min} and {drop_max}\n"
-        )
-        return Nd
+        return chain.Nd
 
 
 def __filter_spectrum_on_dropsize(dsd, drop_min=None, drop_max=None, replace=True):
@@ -170,3 +275,274 @@ def parsivel_sampling_area(diameter):
         Effective Sampling Area
     """
     return 180 * (30 - 0.5 * diameter)
+
+
+# Quality control flags. Each check sets one bit of the uint16 `qc_flags`
+# field (one value per time step) or of the `qc_bin_flags` field (one value per
+# time step and diameter bin), see `quality_control`.
+QC_MARGIN_FALLERS = 1 << 0
+QC_SPLASHING = 1 << 1
+QC_WIND = 1 << 2
+QC_LOW_COUNT = 1 << 3
+QC_RAIN_RATE_RANGE = 1 << 4
+QC_ALL = 0xFFFF
+
+
+def _margin_faller_region(
+    spectrum_velocity, terminal_velocity, diameter, over_fall_speed=0.6
+):
+    """ Drops faster than terminal velocity, partially sampled at the beam edge. """
+    return spectrum_velocity[:, np.newaxis] > terminal_velocity * (1 + over_fall_speed)
+
+
+def _splashing_region(
+    spectrum_velocity,
+    terminal_velocity,
+    diameter,
+    under_fall_speed=0.6,
+    max_diameter=2.0,
+):
+    """ Small drops slower than terminal velocity, splashed off the instrument. """
+    slow = spectrum_velocity[:, np.newaxis] < terminal_velocity * (1 - under_fall_speed)
+    return slow & (diameter < max_diameter)
+
+
+def _wind_region(
+    spectrum_velocity,
+    terminal_velocity,
+    diameter,
+    under_fall_speed=0.6,
+    min_diameter=2.0,
+):
+    """ Large drops slower than terminal velocity, spurious counts in strong wind. """
+    slow = spectrum_velocity[:, np.newaxis] < terminal_velocity * (1 - under_fall_speed)
+    return slow & (diameter >= min_diameter)
+
+
+def _total_drops(dsd):
+    """ Number of drops counted at each time step. """
+    if "number_measured_drops" in dsd.fields:
+        return np.ma.sum(dsd.fields["number_measured_drops"]["data"], axis=1)
+    if "drop_spectrum" in dsd.fields:
+        return np.ma.sum(dsd.fields["drop_spectrum"]["data"], axis=(1, 2))
+    if "num_particles" in dsd.fields:
+        return dsd.fields["num_particles"]["data"]
+    raise ValueError(
+        "The low_count check needs number_measured_drops, drop_spectrum "
+        "or num_particles"
+    )
+
+
+def _low_count(dsd, min_drops=10):
+    """ Time steps with fewer than min_drops drops. """
+    return np.ma.filled(_total_drops(dsd) < min_drops, False)
+
+
+def _rain_rate_out_of_range(dsd, min_rain_rate=0.0, max_rain_rate=300.0):
+    """ Time steps with a rain rate [mm/h] outside [min_rain_rate, max_rain_rate]. """
+    if "rain_rate" not in dsd.fields:
+        raise ValueError("The rain_rate_range check needs rain_rate, see calculate_RR")
+    rain_rate = np.ma.filled(
+        np.ma.asarray(dsd.fields["rain_rate"]["data"], dtype=float), np.nan
+    )
+    with np.errstate(invalid="ignore"):
+        return (rain_rate < min_rain_rate) | (rain_rate > max_rain_rate)
+
+
+# Checks of the velocity diameter spectrum: name -> (flag, region). A region
+# function returns the (velocity bin, diameter bin) cells of suspect drops.
+SPECTRUM_CHECKS = {
+    "margin_fallers": (QC_MARGIN_FALLERS, _margin_faller_region),
+    "splashing": (QC_SPLASHING, _splashing_region),
+    "wind": (QC_WIND, _wind_region),
+}
+
+# Checks of whole time steps: name -> (flag, function of the dsd).
+TIME_CHECKS = {
+    "low_count": (QC_LOW_COUNT, _low_count),
+    "rain_rate_range": (QC_RAIN_RATE_RANGE, _rain_rate_out_of_range),
+}
+
+
+def _has_spectrum(dsd):
+    """ Whether dsd has the inputs of the spectrum checks. """
+    return (
+        "drop_spectrum" in dsd.fields
+        and getattr(dsd, "spectrum_fall_velocity", None) is not None
+    )
+
+
+def _available_checks(dsd):
+    """ Checks whose input fields are present on dsd. """
+    checks = []
+    if _has_spectrum(dsd):
+        checks.extend(SPECTRUM_CHECKS)
+    if any(
+        name in dsd.fields
+        for name in ("number_measured_drops", "drop_spectrum", "num_particles")
+    ):
+        checks.append("low_count")
+    if "rain_rate" in dsd.fields:
+        checks.append("rain_rate_range")
+    return checks
+
+
+def _flag_meanings(checks):
+    """ CF flag_masks and flag_meanings attributes of a set of checks. """
+    flags = sorted((checks[name][0], name) for name in checks)
+    return (
+        np.array([flag for flag, _ in flags], dtype=np.uint16),
+        " ".join(name for _, name in flags),
+    )
+
+
+def _set_flags(dsd, name, flags, ran, checks):
+    """ Replace the bits of the checks that ran in the flag field name. """
+    if name in dsd.fields:
+        old = np.asarray(dsd.fields[name]["data"], dtype=np.uint16)
+        flags = (old & np.uint16(~ran & QC_ALL)) | flags
+    dsd.fields[name] = dsd.config.fill_in_metadata(name, flags)
+    dsd.fields[name]["flag_masks"], dsd.fields[name]["flag_meanings"] = _flag_meanings(
+        checks
+    )
+
+
+def quality_control(dsd, checks=None):
+    """ Flag suspect time steps and bins with a set of vectorized checks.
+
+    Spectrum checks count the drops of the `drop_spectrum` (time, velocity,
+    diameter) cube falling in a suspect region of the velocity diameter
+    plane. The regions of all spectrum checks are stacked and applied in one
+    tensor product over the cube. A diameter bin is flagged at a time step when
+    it holds any suspect drop. Time checks flag whole time steps.
+
+    The results are bitmasks: `qc_flags` (uint16, one value per time step)
+    and, for spectrum checks, `qc_bin_flags` (uint16, one value per time step
+    and diameter bin). Rerunning a check replaces its bits and keeps the others.
+
+    Checks:
+        margin_fallers: drops faster than (1 + over_fall_speed) Vt.
+        splashing: drops below max_diameter slower than (1 - under_fall_speed) Vt.
+        wind: drops of at least min_diameter slower than (1 - under_fall_speed) Vt.
+        low_count: time steps with fewer than min_drops drops.
+        rain_rate_range: rain_rate outside [min_rain_rate, max_rain_rate].
+
+    Parameters
+    ----------
+    dsd: `DropSizeDistribution` object
+        DSD object to check. Spectrum checks need drop_spectrum and
+        spectrum_fall_velocity, rain_rate_range needs rain_rate.
+    checks: list or dict, optional
+        Names of the checks to run, or a dictionary of check names to their
+        keyword parameters. Defaults to every check whose inputs are present.
+
+    Returns
+    -------
+    qc_flags: np.ndarray
+        Bitmask of each time step.
+
+    Example
+    -------
+    quality_control(dsd, {"low_count": {"min_drops": 20}, "margin_fallers": {}})
+    """
+    if checks is None:
+        checks = _available_checks(dsd)
+    if not isinstance(checks, dict):
+        checks = {name: {} for name in checks}
+    unknown = set(checks) - set(SPECTRUM_CHECKS) - set(TIME_CHECKS)
+    if unknown:
+        raise ValueError("Unknown QC checks {}".format(sorted(unknown)))
+
+    time_flags = np.zeros(dsd.numt, dtype=np.uint16)
+    for name, (flag, check) in TIME_CHECKS.items():
+        if name in checks:
+            time_flags[np.asarray(check(dsd, **checks[name]))[: dsd.numt]] |= flag
+
+    spectrum_checks = [name for name in SPECTRUM_CHECKS if name in checks]
+    if spectrum_checks:
+        if not _has_spectrum(dsd):
+            raise ValueError(
+                "Spectrum QC checks need drop_spectrum and spectrum_fall_velocity"
+            )
+        spectrum_velocity = np.asarray(dsd.spectrum_fall_velocity["data"], dtype=float)
+        terminal_velocity = np.asarray(dsd.velocity["data"], dtype=float)
+        diameter = np.asarray(dsd.diameter["data"], dtype=float)
+        regions = np.stack(
+            [
+                SPECTRUM_CHECKS[name][1](
+                    spectrum_velocity, terminal_velocity, diameter, **checks[name]
+                )
+                & (terminal_velocity > 0)
+                for name in spectrum_checks
+            ]
+        )
+        spectrum = np.ma.filled(dsd.fields["drop_spectrum"]["data"], 0)
+        # Suspect drops of each (time, diameter, check) in one pass over the cube.
+        suspect = np.einsum("tvd,kvd->tdk", spectrum, regions.astype(spectrum.dtype))
+        bin_flags = np.zeros(suspect.shape[:2], dtype=np.uint16)
+        for index, name in enumerate(spectrum_checks):
+            bin_flags[suspect[..., index] > 0] |= SPECTRUM_CHECKS[name][0]
+        ran = np.uint16(sum(SPECTRUM_CHECKS[name][0] for name in spectrum_checks))
+        _set_flags(dsd, "qc_bin_flags", bin_flags, ran, SPECTRUM_CHECKS)
+
+    ran = sum(TIME_CHECKS[name][0] for name in checks if name in TIME_CHECKS)
+    _set_flags(dsd, "qc_flags", time_flags, np.uint16(ran), TIME_CHECKS)
+    return dsd.fields["qc_flags"]["data"]
+
+
+def unflagged(dsd, flags=QC_ALL, bins=False):
+    """ Whether each time step, or each bin of each time step, passes quality control.
+
+    Parameters
+    ----------
+    dsd: `DropSizeDistribution` object
+        DSD object checked with `quality_control`.
+    flags: int
+        Bitmask of the flags to test, e.g. QC_LOW_COUNT | QC_RAIN_RATE_RANGE.
+    bins: boolean
+        Return a (time, diameter) array that also tests `qc_bin_flags`.
+
+    Returns
+    -------
+    good: np.ndarray
+        True where none of flags is set.
+    """
+    if "qc_flags" not in dsd.fields:
+        raise ValueError("No qc_flags on the DSD, run quality_control first")
+    good = (dsd.fields["qc_flags"]["data"] & np.uint16(flags)) == 0
+    if not bins:
+        return good
+    good = np.repeat(good[:, np.newaxis], len(dsd.diameter["data"]), axis=1)
+    if "qc_bin_flags" in dsd.fields:
+        good &= (dsd.fields["qc_bin_flags"]["data"] & np.uint16(flags)) == 0
+    return good
+
+
+def mask_flagged(dsd, flags=QC_ALL, fields=("Nd",), bins=False):
+    """ Mask the flagged time steps of fields so calculations skip them.
+
+    The masked fields are views sharing the data of the original fields, only
+    the masks are new. The original data is unchanged.
+
+    Parameters
+    ----------
+    dsd: `DropSizeDistribution` object
+        DSD object checked with `quality_control`.
+    flags: int
+        Bitmask of the flags to mask.
+    fields: tuple
+        Names of the fields to mask. Their first dimension must be time.
+    bins: boolean
+        Also mask flagged bins of fields with a diameter second dimension.
+    """
+    good_rows = unflagged(dsd, flags)
+    good_bins = unflagged(dsd, flags, bins=True) if bins else None
+    for name in fields:
+        data = dsd.fields[name]["data"]
+        bad = np.zeros(np.shape(data), dtype=bool)
+        bad[: dsd.numt][~good_rows] = True
+        if bins and bad.ndim == 2 and bad.shape[1] == good_bins.shape[1]:
+            bad[: dsd.numt] |= ~good_bins
+        dsd.fields[name]["data"] = np.ma.masked_array(
+            data, mask=np.ma.getmaskarray(data) | bad, copy=False
+        )
@@ -0,0 +1,178 @@
+"""
+Time alignment of collocated instruments.
+
+Records are paired by binary search on their sorted times, so aligning
+records of n and m samples costs O((n + m) log m). Instruments can be
+matched sample to sample (nearest or as-of joins within a tolerance), or a
+finer instrument can be aggregated over the sampling windows of a coarser
+one.
+"""
+import numpy as np
+
+
+def record_times(record):
+    """ Sample times of a DropSizeDistribution or of an array of times. """
+    if hasattr(record, "time"):
+        return np.ma.getdata(record.time["data"])[: record.numt]
+    return np.ma.getdata(np.asarray(record))
+
+
+def nearest_indices(reference_times, times, tolerance=None, direction="nearest"):
+    """ Index of the sample of `times` matching each reference time.
+
+    Parameters
+    ----------
+    reference_times: array_like
+        Times to match.
+    times: array_like
+        Sorted times to search.
+    tolerance: float, optional
+        Largest time difference of a match. Defaults to no limit.
+    direction: str, optional
+        'nearest' for the closest time, 'backward' for the last time at or
+        before the reference time (an as-of join), 'forward' for the first
+        time at or after it.
+
+    Returns
+    -------
+    indices: array_like
+        Index into `times` for each reference time, -1 where nothing matches.
+    """
+    if direction not in ("nearest", "backward", "forward"):
+        raise ValueError("Unknown direction {}".format(direction))
+    reference_times = np.asarray(reference_times, dtype=float)
+    times = np.asarray(times, dtype=float)
+    n = len(times)
+    if n == 0:
+        return np.full(len(reference_times), -1)
+
+    before = np.searchsorted(times, reference_times, side="right") - 1
+    after = np.searchsorted(times, reference_times, side="left")
+    has_before = before >= 0
+    has_after = after < n
+    distance_before = np.where(
+        has_before, reference_times - times[np.clip(before, 0, None)], np.inf
+    )
+    distance_after = np.where(
+        has_after, times[np.clip(after, None, n - 1)] - reference_times, np.inf
+    )
+
+    if direction == "backward":
+        indices, distance = before, distance_before
+    elif direction == "forward":
+        indices, distance = after, distance_after
+    else:
+        use_after = distance_after < distance_before
+        indices = np.where(use_after, after, before)
+        distance = np.minimum(distance_before, distance_after)
+
+    unmatched = ~np.isfinite(distance)
+    if tolerance is not None:
+        unmatched |= distance > tolerance
+    return np.where(unmatched, -1, indices)
+
+
+def join(reference, *others, tolerance=None, direction="nearest"):
+    """ Pair the samples of several records by time.
+
+    Parameters
+    ----------
+    reference: `DropSizeDistribution` or array_like
+        Record whose samples are matched, or its sorted times.
+    others: `DropSizeDistribution` or array_like
+        Records, or sorted times, to match to the reference.
+    tolerance: float, optional
+        Largest time difference of a match, see `nearest_indices`.
+    direction: str, optional
+        'nearest', 'backward' or 'forward', see `nearest_indices`.
+
+    Returns
+    -------
+    reference_indices: array_like
+        Indices of the reference samples matched in every other record.
+    other_indices: list
+        For each other record, the indices of its matching samples, aligned
+        with `reference_indices`.
+    """
+    reference_times = record_times(reference)
+    matches = [
+        nearest_indices(reference_times, record_times(other), tolerance, direction)
+        for other in others
+    ]
+    matched = np.ones(len(reference_times), dtype=bool)
+    for indices in matches:
+        matched &= indices >= 0
+    reference_indices = np.flatnonzero(matched)
+    return reference_indices, [indices[reference_indices] for indices in matches]
+
+
+def window_indices(reference_times, times, window, label="left"):
+    """ Samples of `times` falling in the sampling window of each reference time.
+
+    Parameters
+    ----------
+    reference_times: array_like
+        Times labelling the windows.
+    times: array_like
+        Sorted times to aggregate.
+    window: float
+        Duration of the windows.
+    label: str, optional
+        'left' if reference times mark the start of their window, which then
+        covers [t, t + window), 'right' if they mark its end, (t - window, t].
+
+    Returns
+    -------
+    start, stop: array_like
+        The samples of window i are start[i] to stop[i] - 1.
+    """
+    reference_times = np.asarray(reference_times, dtype=float)
+    times = np.asarray(times, dtype=float)
+    if label == "left":
+        return (
+            np.searchsorted(times, reference_times, side="left"),
+            np.searchsorted(times, reference_times + window, side="left"),
+        )
+    if label == "right":
+        return (
+            np.searchsorted(times, reference_times - window, side="right"),
+            np.searchsorted(times, reference_times, side="right"),
+        )
+    raise ValueError("Unknown window label {}".format(label))
+
+
+def aggregate(values, start, stop, how="mean"):
+    """ Aggregate values over windows from one cumulative sum.
+
+    Windows may overlap or leave gaps. NaN and masked values are skipped.
+
+    Parameters
+    ----------
+    values: array_like
+        Values of each sample, shape (n, ...).
+    start, stop: array_like
+        Sample range of each window, see `window_indices`.
+    how: str, optional
+        'mean', 'sum' or 'count' of the valid values.
+
+    Returns
+    -------
+    aggregated: array_like
+        Aggregate of each window, shape (windows, ...). Means of windows
+        without valid values are NaN.
+    """
+    if how not in ("mean", "sum", "count"):
+        raise ValueError("Unknown aggregation {}".format(how))
+    values = np.ma.filled(np.ma.asarray(values, dtype=float), np.nan)
+    valid = np.isfinite(values)
+    zeros = np.zeros((1,) + values.shape[1:])
+    count_sums = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    count = count_sums[stop] - count_sums[start]
+    if how == "count":
+        return count
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    total = sums[stop] - sums[start]
+    if how == "sum":
+        return total
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
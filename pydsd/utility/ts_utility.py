@@ -1,3 +1,6 @@
+from collections import deque
+import operator
+
 import numpy as np
 
 
@@ -5,3 +8,195 @@ def rolling_window(a, window):
     shape = a.shape[:-1] + (a.shape[-1] - window + 1, window)
     strides = a.strides + (a.strides[-1],)
     return np.lib.stride_tricks.as_strided(a, shape=shape, strides=strides)
+
+
+def window_bounds(n, window, times=None, center=False):
+    """ Start and stop index of the rolling window at each of n samples.
+
+    Parameters
+    ----------
+    n: int
+        Number of samples.
+    window: int or float or timedelta64
+        Number of samples in each window or, if `times` is given, the duration
+        of each window in the units of `times`.
+    times: array_like, optional
+        Sorted sample times, for windows of fixed duration over irregular
+        sampling.
+    center: bool, optional
+        Center the windows on the samples instead of ending them there.
+
+    Returns
+    -------
+    start, stop: array_like
+        Sample i is summarized over samples start[i] to stop[i] - 1. Count
+        windows cover i - window + 1 to i, or i - window // 2 to
+        i - window // 2 + window - 1 when centered, truncated at the ends of
+        the series. Time windows cover times in (t_i - window, t_i], or
+        (t_i - window / 2, t_i + window / 2] when centered.
+    """
+    if times is None:
+        index = np.arange(n)
+        start = index - window // 2 if center else index - window + 1
+        stop = start + window
+        return np.clip(start, 0, n), np.clip(stop, 0, n)
+
+    times = np.asarray(times)
+    if center:
+        half_window = window / 2
+        lower, upper = times - half_window, times + half_window
+    else:
+        lower, upper = times - window, times
+    return (
+        np.searchsorted(times, lower, side="right"),
+        np.searchsorted(times, upper, side="right"),
+    )
+
+
+def _as_float(values):
+    """ Float copy of values with masked values as NaN. """
+    return np.ma.filled(np.ma.asarray(values, dtype=float), np.nan)
+
+
+def _window_sums(values, start, stop):
+    """ Sums of values over each window, from one cumulative sum. """
+    cumulative = np.concatenate([[0], np.cumsum(values)])
+    return cumulative[stop] - cumulative[start]
+
+
+def _with_min_periods(result, count, min_periods):
+    """ Set windows with fewer than min_periods valid samples to NaN. """
+    result = np.asarray(result, dtype=float)
+    result[count < max(min_periods, 1)] = np.nan
+    return result
+
+
+def rolling_count(values, window, times=None, center=False):
+    """ Number of valid (not NaN or masked) samples in each window.
+
+    See `window_bounds` for the window parameters.
+    """
+    values = _as_float(values)
+    start, stop = window_bounds(len(values), window, times, center)
+    return _window_sums(np.isfinite(values), start, stop)
+
+
+def rolling_sum(values, window, times=None, center=False, min_periods=1):
+    """ NaN-aware rolling sum in O(n) from a cumulative sum.
+
+    Parameters
+    ----------
+    values: array_like
+        Series to summarize. NaN and masked values are skipped.
+    window, times, center:
+        Window parameters, see `window_bounds`.
+    min_periods: int, optional
+        Windows with fewer valid samples are NaN.
+
+    Returns
+    -------
+    sums: array_like
+        Sum over the window of each sample.
+    """
+    values = _as_float(values)
+    valid = np.isfinite(values)
+    start, stop = window_bounds(len(values), window, times, center)
+    sums = _window_sums(np.where(valid, values, 0.0), start, stop)
+    return _with_min_periods(sums, _window_sums(valid, start, stop), min_periods)
+
+
+def rolling_mean(values, window, times=None, center=False, min_periods=1):
+    """ NaN-aware rolling mean in O(n), see `rolling_sum`. """
+    values = _as_float(values)
+    valid = np.isfinite(values)
+    start, stop = window_bounds(len(values), window, times, center)
+    count = _window_sums(valid, start, stop)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = _window_sums(np.where(valid, values, 0.0), start, stop) / count
+    return _with_min_periods(mean, count, min_periods)
+
+
+def rolling_std(values, window, times=None, center=False, min_periods=1, ddof=0):
+    """ NaN-aware rolling standard deviation in O(n), see `rolling_sum`.
+
+    Computed from cumulative sums of the values and their squares, after
+    removing the mean of the series to limit cancellation. `ddof` is the
+    delta degrees of freedom as in `numpy.std`.
+    """
+    values = _as_float(values)
+    valid = np.isfinite(values)
+    start, stop = window_bounds(len(values), window, times, center)
+    shift = np.nanmean(values) if valid.any() else 0.0
+    centered = np.where(valid, values - shift, 0.0)
+    count = _window_sums(valid, start, stop)
+    sums = _window_sums(centered, start, stop)
+    squares = _window_sums(centered ** 2, start, stop)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = (squares - sums ** 2 / count) / (count - ddof)
+        std = np.sqrt(np.maximum(variance, 0))
+    std[count <= ddof] = np.nan
+    return _with_min_periods(std, count, min_periods)
+
+
+def _rolling_extreme(values, window, times, center, min_periods, keep):
+    """ Rolling minimum or maximum in O(n) with a monotone deque.
+
+    Window starts and stops never decrease, so each sample enters and leaves
+    the deque once. The deque holds, in order, the samples that can still be
+    the extreme of a later window, and the front is the extreme of the
+    current window. `keep(a, b)` is whether a sample of value a stays ahead
+    of a newer sample of value b.
+    """
+    values = _as_float(values)
+    valid = np.isfinite(values)
+    n = len(values)
+    start, stop = window_bounds(n, window, times, center)
+    count = _window_sums(valid, start, stop)
+
+    # Python scalars, indexing numpy arrays one element at a time is slow.
+    samples, is_valid = values.tolist(), valid.tolist()
+    result = [np.nan] * n
+    queue = deque()
+    pushed = 0
+    for i, (first, last) in enumerate(zip(start.tolist(), stop.tolist())):
+        while pushed < last:
+            if is_valid[pushed]:
+                while queue and not keep(samples[queue[-1]], samples[pushed]):
+                    queue.pop()
+                queue.append(pushed)
+            pushed += 1
+        while queue and queue[0] < first:
+            queue.popleft()
+        if queue:
+            result[i] = samples[queue[0]]
+    return _with_min_periods(result, count, min_periods)
+
+
+def rolling_min(values, window, times=None, center=False, min_periods=1):
+    """ NaN-aware rolling minimum in O(n), see `rolling_sum`. """
+    return _rolling_extreme(values, window, times, center, min_periods, operator.lt)
+
+
+def rolling_max(values, window, times=None, center=False, min_periods=1):
+    """ NaN-aware rolling maximum in O(n), see `rolling_sum`. """
+    return _rolling_extreme(values, window, times, center, min_periods, operator.gt)
+
+
+def rolling_all(values, window, times=None, center=False):
+    """ Whether every valid sample in each window is true.
+
+    Windows without valid samples are true, like `numpy.all` of an empty array.
+    """
+    values = _as_float(values)
+    valid = np.isfinite(values)
+    start, stop = window_bounds(len(values), window, times, center)
+    true = _window_sums(valid & (np.where(valid, values, 0) != 0), start, stop)
+    return true == _window_sums(valid, start, stop)
+
+
+def rolling_any(values, window, times=None, center=False):
+    """ Whether any valid sample in each window is true. """
+    values = _as_float(values)
+    valid = np.isfinite(values)
+    start, stop = window_bounds(len(values), window, times, center)
+    return _window_sums(valid & (np.where(valid, values, 0) != 0), start, stop) > 0
@@ -12,7 +12,8 @@ setup(
               'pydsd.partition',
               'pydsd.plot',
               'pydsd.utility',
-              'pydsd.fit'],
+              'pydsd.fit',
+              'pydsd.scattering'],
     url='http://pypi.python.org/pypi/PyDSD/',
     license='LICENSE.txt',
     description='Python Disdrometer Processing',